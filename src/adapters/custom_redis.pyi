@@ -1,4 +1,4 @@
-from typing import Any
+from typing import Any, AsyncIterator, Awaitable, Protocol, Sequence
 
 class CustomRedis:
     def __init__(
@@ -20,15 +20,28 @@ class CustomRedis:
     async def rename(self, src: str, dst: str) -> bool: ...
     async def exists(self, name: str) -> int: ...
     async def expire(self, name: str, time: int) -> bool: ...
+    async def incr(self, name: str, amount: int = 1) -> int: ...
 
     # --- Списки ---
     async def lrange(self, name: str, start: int, end: int) -> list[str]: ...
     async def lpush(self, name: str, *values: Any) -> int: ...
     async def rpush(self, name: str, *values: Any) -> int: ...
 
+    # --- Хэши ---
+    async def hgetall(self, name: str) -> dict[str, str]: ...
+
+    # --- Стримы ---
+    async def xrange(
+        self, name: str, min: str = "-", max: str = "+", count: int | None = None
+    ) -> list[tuple[str, dict[str, str]]]: ...
+
     # --- Общие операции ---
     async def delete(self, *names: str) -> int: ...
     async def aclose(self) -> None: ...
+    def scan_iter(
+        self, match: str | None = None, count: int | None = None
+    ) -> AsyncIterator[str]: ...
+    def register_script(self, script: str) -> "CustomScript": ...
     async def flushdb(self, asynchronous: bool = False, **kwargs: Any) -> None:
         """
         Delete all keys in the current database.
@@ -48,3 +61,11 @@ class CustomPipeline:
     def get(self, name: str) -> "CustomPipeline": ...
     def lrange(self, name: str, start: int, end: int) -> "CustomPipeline": ...
     def delete(self, *names: str) -> "CustomPipeline": ...
+
+class CustomScript(Protocol):
+    def __call__(
+        self,
+        keys: Sequence[str] | None = None,
+        args: Sequence[str | int | float] | None = None,
+        client: CustomRedis | CustomPipeline | None = None,
+    ) -> Awaitable[Any]: ...
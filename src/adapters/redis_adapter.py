@@ -1,4 +1,4 @@
-from typing import cast
+from typing import Any, Sequence, cast
 
 from redis.asyncio import Redis
 
@@ -34,9 +34,24 @@ class RedisAdapter:
         result = await self.redis.set(name=pending_key, value=value, ex=ttl)
         return result
 
+    async def set_nx(self, key: str, value: str = "", ttl: int | None = None) -> bool:
+        """
+        Атомарно создает ключ, только если его нет. Без pending: ключ виден сразу, commit не нужен.
+        :return: True если ключ создан, False если уже существует
+        """
+        result = await self.redis.set(name=key, value=value, ex=ttl, nx=True)
+        return bool(result)
+
     async def get_one_or_none(self, key: str) -> str | None:
         return await self.redis.get(name=key)
 
+    async def increment(self, key: str) -> int:
+        """
+        Атомарно увеличивает счетчик на 1. Без pending: значение видно сразу, commit не нужен.
+        :return: новое значение
+        """
+        return await self.redis.incr(name=key)
+
     async def get_ttl(self, key: str) -> int:
         return await self.redis.ttl(key)
 
@@ -66,6 +81,45 @@ class RedisAdapter:
         ids = await self.redis.lrange(name=list_key_name, start=0, end=-1)
         return ids
 
+    async def run_script(
+        self, script: str, keys: Sequence[str], args: Sequence[str | int | float]
+    ) -> Any:
+        """
+        Выполняет lua скрипт атомарно, без pending: изменения видны сразу, commit не нужен.
+        Скрипт кэшируется на сервере и далее вызывается по sha (EVALSHA).
+        """
+        return await self.redis.register_script(script)(keys=keys, args=args)
+
+    async def run_script_bulk(
+        self, script: str, calls: Sequence[tuple[Sequence[str], Sequence[str | int | float]]]
+    ) -> list[Any]:
+        """
+        Выполняет lua скрипт для каждой пары (keys, args) одним pipeline.
+        Каждый вызов атомарен сам по себе, commit не нужен.
+        """
+        lua_script = self.redis.register_script(script)
+        pipeline = self.redis.pipeline()
+        for keys, args in calls:
+            await lua_script(keys=keys, args=args, client=pipeline)
+        return await pipeline.execute()
+
+    async def get_stream_entries(self, name: str, count: int) -> list[tuple[str, dict[str, str]]]:
+        """
+        :param name: ключ стрима
+        :param count: максимальное количество записей
+        :return: самые старые записи стрима [(id записи, поля записи)]
+        """
+        return await self.redis.xrange(name=name, min="-", max="+", count=count)
+
+    async def get_hash(self, name: str) -> dict[str, str]:
+        return await self.redis.hgetall(name=name)
+
+    async def scan_keys(self, match: str, count: int = 1000) -> list[str]:
+        """
+        Ищет ключи по шаблону через SCAN, не блокирует redis как KEYS
+        """
+        return [key async for key in self.redis.scan_iter(match=match, count=count)]
+
     async def commit(self):
         if self.pending_keys:
             pipeline = self._remove_prefix_bulk(*self.pending_keys, prefix="pending:")
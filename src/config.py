@@ -85,6 +85,37 @@ class Settings(BaseSettings):
     }
 
     UNIT_IMAGES_LIMIT: int = 10
+    UNITS_SEARCH_SIMILARITY_THRESHOLD: float = 0.4  # насколько слово должно быть похоже, 0..1
+    UNIT_CACHE_TTL: int = 60 * 60  # сколько хранится товар check_get_unit_by_id
+    UNITS_LIST_CACHE_TTL: int = 60 * 10  # сколько хранится страница списка товаров магазина
+    UNITS_AUTOCOMPLETE_CACHE_TTL: int = 30  # сколько хранятся подсказки названий по префиксу
+    UNITS_AUTOCOMPLETE_HTTP_MAX_AGE: int = 5  # сколько клиент не перезапрашивает подсказки
+    UNITS_CODE_CACHE_TTL: int = 60 * 60 * 24  # сколько хранится id товара по коду в redis
+    UNITS_CODE_LOCAL_CACHE_TTL: int = 60  # сколько хранится id товара по коду в памяти процесса
+    UNITS_CODE_LOCAL_CACHE_SIZE: int = 10_000  # сколько кодов хранится в памяти процесса
+
+    ACTION_IDEMPOTENCY_KEY_TTL: int = 60 * 60 * 24  # сколько хранится результат действия
+    ACTION_IDEMPOTENCY_LOCK_TTL: int = 30  # сколько держится ключ выполняемого действия
+    ACTION_IDEMPOTENCY_WAIT_SECONDS: float = 10  # сколько дубликат ждет результат
+    ACTION_DETAILS_CACHE_TTL: int = 60 * 60 * 24  # сколько хранится действие с транзакциями
+    ACTION_DETAILS_HTTP_MAX_AGE: int = 60 * 60  # сколько клиент не перезапрашивает действие
+
+    ACTIONS_PARTITIONS_AHEAD_MONTHS: int = 3  # на сколько месяцев вперед создаются партиции
+    ACTIONS_PARTITIONS_INTERVAL: float = 60 * 60 * 24  # как часто проверяются партиции, секунды
+    ACTIONS_COUNTERS_RECONCILE_INTERVAL: float = 60 * 60 * 24  # как часто сверяются счетчики
+
+    UNIT_DAILY_STATS_BACKFILL_CHUNK_DAYS: int = 7  # сколько дней пересобирает одна задача
+    UNITS_IMPORT_MAX_ROWS: int = 100_000  # сколько товаров можно импортировать одним файлом
+    UNITS_IMPORT_MAX_ERRORS: int = 100  # сколько ошибок строк возвращается при импорте
+    ACTIONS_EXPORT_BATCH_SIZE: int = 5000  # сколько строк выгрузки читается с курсора за раз
+    SALES_ANALYTICS_CACHE_TTL: int = 60 * 60 * 24  # сколько хранится результат аналитики продаж
+
+    SALES_WRITE_BEHIND: bool = False  # продажи через очередь redis, запись в базу воркером
+    SALES_QUEUE_BATCH_SIZE: int = 100  # сколько продаж воркер записывает в одной транзакции
+    SALES_QUEUE_FLUSH_INTERVAL: float = 1  # как часто воркер разбирает очередь, секунды
+    SALES_QUEUE_RECONCILE_INTERVAL: float = 60 * 5  # как часто сверяются остатки, секунды
+    SALES_QUEUE_LOCK_TTL: int = 60  # сколько держится блокировка воркера очереди
+    SALES_QUEUE_STATUS_TTL: int = 60 * 60 * 24 * 7  # сколько хранится статус продажи из очереди
 
     S3_ACCESS_KEY_ID: str
     S3_SECRET_ACCESS_KEY: str
@@ -152,3 +152,15 @@ class UnexpectedTypeException(VelvetAppException):
 
 class DeviceMismatchException(VelvetAppException):
     details = "Device ID не соответствует сессии"
+
+
+class UnitsImportFileException(VelvetAppException):
+    details = "Файл не соответствует формату CSV импорта товаров"
+
+
+class UnitsImportLimitException(VelvetAppException):
+    details = "Превышено количество строк в файле импорта"
+
+
+class InvalidCursorException(VelvetAppException):
+    details = "Неверный курсор пагинации"
@@ -19,5 +19,17 @@ class UnitBelongAnotherStoreException(ObjectConflictException):
     default_details = "Unit принадлежит другому store, ids: "
 
 
+class UnitCodeAlreadyExistsException(ObjectConflictException):
+    default_details = "Товар с таким кодом уже есть в магазине: "
+
+
 class StoreAlreadyExistsException(ObjectConflictException):
     default_details = "Магазин с таким названием уже существует"
+
+
+class IdempotencyKeyInProgressException(ObjectConflictException):
+    default_details = "Запрос с этим Idempotency-Key еще выполняется"
+
+
+class IdempotencyKeyReusedException(ObjectConflictException):
+    default_details = "Idempotency-Key уже использован с другим телом запроса"
@@ -27,6 +27,10 @@ class ActionNotFoundException(ObjectNotFoundException):
     object_name = "Действие"
 
 
+class QueuedSaleNotFoundException(ObjectNotFoundException):
+    object_name = "Продажу в очереди"
+
+
 class UserSessionNotFoundException(ObjectNotFoundException):
     object_name = "Сессия пользователя"
 
@@ -0,0 +1,29 @@
+"""empty message
+
+Revision ID: 5c1e7a2f9b43
+Revises: 2a957e5130df
+Create Date: 2026-10-17 09:00:12.184263
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5c1e7a2f9b43"
+down_revision: Union[str, None] = "2a957e5130df"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("actions", sa.Column("queue_id", sa.String(), nullable=True))
+    op.create_index(op.f("ix_actions_queue_id"), "actions", ["queue_id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_actions_queue_id"), table_name="actions")
+    op.drop_column("actions", "queue_id")
@@ -0,0 +1,212 @@
+"""empty message
+
+Revision ID: 8b3d4f0c6e21
+Revises: 5c1e7a2f9b43
+Create Date: 2026-10-17 10:00:41.732905
+
+Переводит actions и actions_transactions на помесячные партиции по created_at.
+Таблицы пересоздаются, данные копируются. Последовательности id сохраняются.
+"""
+
+from datetime import date, datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8b3d4f0c6e21"
+down_revision: Union[str, None] = "5c1e7a2f9b43"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PARTITIONS_AHEAD_MONTHS = (
+    3  # партиции на будущее, дальше их создает задача create_actions_partitions
+)
+
+action_enum = postgresql.ENUM(
+    "sales",
+    "addStock",
+    "salesReturn",
+    "writeOff",
+    "newPrice",
+    "stockReturn",
+    name="action_enum",
+    create_type=False,
+)
+
+ACTIONS_COLUMNS = "id, title, store_id, created_at, queue_id"
+ACTIONS_TRANSACTIONS_COLUMNS = (
+    "id, quantity_delta, cost_price, retail_price, previous_retail_price, discount_price, "
+    "action, created_at, unit_id, user_id, action_id, store_id"
+)
+
+
+def next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def create_month_partitions(table: str, first_month: date, last_month: date) -> None:
+    month = first_month
+    while month <= last_month:
+        op.execute(
+            f"CREATE TABLE IF NOT EXISTS {table}_y{month.year}m{month.month:02d} "
+            f"PARTITION OF {table} "
+            f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') "
+            f"TO ('{next_month(month).isoformat()} 00:00:00+00')"
+        )
+        month = next_month(month)
+    op.execute(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT")
+
+
+def create_actions_table(partitioned: bool) -> None:
+    op.create_table(
+        "actions",
+        sa.Column(
+            "id",
+            sa.Integer(),
+            server_default=sa.text("nextval('actions_id_seq'::regclass)"),
+            nullable=False,
+        ),
+        sa.Column("title", action_enum, nullable=False),
+        sa.Column("store_id", sa.Integer(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column("queue_id", sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(["store_id"], ["stores.id"]),
+        sa.PrimaryKeyConstraint(*(("id", "created_at") if partitioned else ("id",))),
+        **({"postgresql_partition_by": "RANGE (created_at)"} if partitioned else {}),
+    )
+
+
+def create_actions_transactions_table(partitioned: bool) -> None:
+    action_fk = (["action_id", "created_at"], ["actions.id", "actions.created_at"])
+    op.create_table(
+        "actions_transactions",
+        sa.Column(
+            "id",
+            sa.Integer(),
+            server_default=sa.text("nextval('actions_transactions_id_seq'::regclass)"),
+            nullable=False,
+        ),
+        sa.Column("quantity_delta", sa.Float(), nullable=True),
+        sa.Column("cost_price", sa.Float(), nullable=True),
+        sa.Column("retail_price", sa.Float(), nullable=True),
+        sa.Column("previous_retail_price", sa.Float(), nullable=True),
+        sa.Column("discount_price", sa.Float(), nullable=True),
+        sa.Column("action", action_enum, nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column("unit_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("action_id", sa.Integer(), nullable=False),
+        sa.Column("store_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(*(action_fk if partitioned else (["action_id"], ["actions.id"]))),
+        sa.ForeignKeyConstraint(["store_id"], ["stores.id"]),
+        sa.ForeignKeyConstraint(["unit_id"], ["units.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint(*(("id", "created_at") if partitioned else ("id",))),
+        **({"postgresql_partition_by": "RANGE (created_at)"} if partitioned else {}),
+    )
+
+
+def create_indexes() -> None:
+    op.create_index(op.f("ix_actions_id"), "actions", ["id"], unique=False)
+    op.create_index(op.f("ix_actions_store_id"), "actions", ["store_id"], unique=False)
+    op.create_index(op.f("ix_actions_title"), "actions", ["title"], unique=False)
+    op.create_index(op.f("ix_actions_queue_id"), "actions", ["queue_id"], unique=False)
+    for column in ("id", "action", "unit_id", "user_id", "action_id", "store_id"):
+        op.create_index(
+            op.f(f"ix_actions_transactions_{column}"),
+            "actions_transactions",
+            [column],
+            unique=False,
+        )
+
+
+def rename_to_old() -> None:
+    """Освобождает имена таблиц и индексов, последовательности id отвязываются от старых таблиц"""
+    for table in ("actions_transactions", "actions"):
+        op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY NONE")
+        op.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+        op.execute(f"ALTER INDEX {table}_pkey RENAME TO {table}_old_pkey")
+
+
+def drop_old() -> None:
+    op.drop_table("actions_transactions_old")
+    op.drop_table("actions_old")
+    for table in ("actions_transactions", "actions"):
+        op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+
+
+def upgrade() -> None:
+    rename_to_old()
+
+    create_actions_table(partitioned=True)
+    create_actions_transactions_table(partitioned=True)
+
+    first_created_at: datetime | None = (
+        op.get_bind()
+        .execute(
+            sa.text(
+                "SELECT least((SELECT min(created_at) FROM actions_old), "
+                "(SELECT min(created_at) FROM actions_transactions_old))"
+            )
+        )
+        .scalar()
+    )
+    today = datetime.now(timezone.utc).date()
+    first_month = (
+        first_created_at.astimezone(timezone.utc).date() if first_created_at else today
+    ).replace(day=1)
+    last_month = today.replace(day=1)
+    for _ in range(PARTITIONS_AHEAD_MONTHS):
+        last_month = next_month(last_month)
+    for table in ("actions", "actions_transactions"):
+        create_month_partitions(table, first_month=first_month, last_month=last_month)
+
+    # created_at действий, добавленный позже транзакций, выравнивается по их транзакциям,
+    # у новых действий он и так совпадает: обе записи вставляются одним запросом
+    op.execute(
+        f"INSERT INTO actions ({ACTIONS_COLUMNS}) "
+        "SELECT a.id, a.title, a.store_id, coalesce(t.created_at, a.created_at), a.queue_id "
+        "FROM actions_old a LEFT JOIN ("
+        "SELECT action_id, min(created_at) AS created_at "
+        "FROM actions_transactions_old GROUP BY action_id"
+        ") t ON t.action_id = a.id"
+    )
+    op.execute(
+        f"INSERT INTO actions_transactions ({ACTIONS_TRANSACTIONS_COLUMNS}) "
+        "SELECT t.id, t.quantity_delta, t.cost_price, t.retail_price, t.previous_retail_price, "
+        "t.discount_price, t.action, a.created_at, t.unit_id, t.user_id, t.action_id, t.store_id "
+        "FROM actions_transactions_old t JOIN actions a ON a.id = t.action_id"
+    )
+
+    drop_old()
+    create_indexes()
+
+
+def downgrade() -> None:
+    rename_to_old()
+
+    create_actions_table(partitioned=False)
+    create_actions_transactions_table(partitioned=False)
+    op.execute(f"INSERT INTO actions ({ACTIONS_COLUMNS}) SELECT {ACTIONS_COLUMNS} FROM actions_old")
+    op.execute(
+        f"INSERT INTO actions_transactions ({ACTIONS_TRANSACTIONS_COLUMNS}) "
+        f"SELECT {ACTIONS_TRANSACTIONS_COLUMNS} FROM actions_transactions_old"
+    )
+
+    # партиции удаляются вместе с родительскими таблицами
+    drop_old()
+    create_indexes()
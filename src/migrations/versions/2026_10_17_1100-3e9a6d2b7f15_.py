@@ -0,0 +1,58 @@
+"""empty message
+
+Revision ID: 3e9a6d2b7f15
+Revises: 8b3d4f0c6e21
+Create Date: 2026-10-17 11:00:12.504317
+
+Таблица дневных итогов unit_daily_stats. Заполняется задачей backfill_unit_daily_stats.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3e9a6d2b7f15"
+down_revision: Union[str, None] = "8b3d4f0c6e21"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+STATS_COLUMNS = (
+    "sold_quantity",
+    "revenue",
+    "retail_revenue",
+    "cogs",
+    "returned_quantity",
+    "returned_revenue",
+    "returned_cost",
+    "written_off_quantity",
+    "written_off_cost",
+)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "unit_daily_stats",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("store_id", sa.Integer(), nullable=False),
+        sa.Column("unit_id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        *(
+            sa.Column(column, sa.Float(), server_default="0", nullable=False)
+            for column in STATS_COLUMNS
+        ),
+        sa.ForeignKeyConstraint(["store_id"], ["stores.id"]),
+        sa.ForeignKeyConstraint(["unit_id"], ["units.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("unit_id", "day"),
+    )
+    op.create_index(
+        "ix_unit_daily_stats_store_id_day", "unit_daily_stats", ["store_id", "day"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_unit_daily_stats_store_id_day", table_name="unit_daily_stats")
+    op.drop_table("unit_daily_stats")
@@ -0,0 +1,34 @@
+"""empty message
+
+Revision ID: 6f2c8a4d1e93
+Revises: 3e9a6d2b7f15
+Create Date: 2026-10-17 12:00:27.118406
+
+Индекс для keyset пагинации GET /actions: (store_id, created_at DESC, id DESC).
+Создается на партиционированной таблице, поэтому и на всех ее партициях.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "6f2c8a4d1e93"
+down_revision: Union[str, None] = "3e9a6d2b7f15"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_actions_store_id_created_at_id",
+        "actions",
+        ["store_id", sa.text("created_at DESC"), sa.text("id DESC")],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_actions_store_id_created_at_id", table_name="actions")
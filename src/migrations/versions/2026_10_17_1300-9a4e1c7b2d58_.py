@@ -0,0 +1,54 @@
+"""empty message
+
+Revision ID: 9a4e1c7b2d58
+Revises: 6f2c8a4d1e93
+Create Date: 2026-10-17 13:00:48.275031
+
+Счетчики действий магазинов по типу actions_counters, заполняются из actions.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9a4e1c7b2d58"
+down_revision: Union[str, None] = "6f2c8a4d1e93"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+action_enum = postgresql.ENUM(
+    "sales",
+    "addStock",
+    "salesReturn",
+    "writeOff",
+    "newPrice",
+    "stockReturn",
+    name="action_enum",
+    create_type=False,
+)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "actions_counters",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("store_id", sa.Integer(), nullable=False),
+        sa.Column("title", action_enum, nullable=False),
+        sa.Column("slot", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("total", sa.Integer(), server_default="0", nullable=False),
+        sa.ForeignKeyConstraint(["store_id"], ["stores.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("store_id", "title", "slot"),
+    )
+    op.execute(
+        "INSERT INTO actions_counters (store_id, title, slot, total) "
+        "SELECT store_id, title, 0, count(*) FROM actions GROUP BY store_id, title"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("actions_counters")
@@ -0,0 +1,37 @@
+"""empty message
+
+Revision ID: c51d8e2f7a36
+Revises: 9a4e1c7b2d58
+Create Date: 2026-10-17 14:00:05.630184
+
+BRIN индексы по created_at у actions и actions_transactions для выборок за период.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c51d8e2f7a36"
+down_revision: Union[str, None] = "9a4e1c7b2d58"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_actions_created_at", "actions", ["created_at"], unique=False, postgresql_using="brin"
+    )
+    op.create_index(
+        "ix_actions_transactions_created_at",
+        "actions_transactions",
+        ["created_at"],
+        unique=False,
+        postgresql_using="brin",
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_actions_transactions_created_at", table_name="actions_transactions")
+    op.drop_index("ix_actions_created_at", table_name="actions")
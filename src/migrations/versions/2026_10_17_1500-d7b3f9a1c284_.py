@@ -0,0 +1,43 @@
+"""empty message
+
+Revision ID: d7b3f9a1c284
+Revises: c51d8e2f7a36
+Create Date: 2026-10-17 15:00:39.841527
+
+Покрывающий индекс истории товара для GET /units/{unit_id}/transactions.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d7b3f9a1c284"
+down_revision: Union[str, None] = "c51d8e2f7a36"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_actions_transactions_unit_id_created_at_id",
+        "actions_transactions",
+        ["unit_id", sa.text("created_at DESC"), sa.text("id DESC")],
+        unique=False,
+        postgresql_include=[
+            "action",
+            "quantity_delta",
+            "cost_price",
+            "retail_price",
+            "discount_price",
+            "action_id",
+        ],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_actions_transactions_unit_id_created_at_id", table_name="actions_transactions"
+    )
@@ -0,0 +1,37 @@
+"""empty message
+
+Revision ID: e2a8c6f4b917
+Revises: d7b3f9a1c284
+Create Date: 2026-10-17 16:00:21.904473
+
+pg_trgm GIN индексы units.title и units.description для поиска товаров.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e2a8c6f4b917"
+down_revision: Union[str, None] = "d7b3f9a1c284"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for column in ("title", "description"):
+        op.create_index(
+            f"ix_units_{column}_trgm",
+            "units",
+            [column],
+            unique=False,
+            postgresql_using="gin",
+            postgresql_ops={column: "gin_trgm_ops"},
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_units_description_trgm", table_name="units")
+    op.drop_index("ix_units_title_trgm", table_name="units")
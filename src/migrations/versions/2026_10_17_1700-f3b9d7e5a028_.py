@@ -0,0 +1,45 @@
+"""empty message
+
+Revision ID: f3b9d7e5a028
+Revises: e2a8c6f4b917
+Create Date: 2026-10-17 17:00:48.217390
+
+Индексы (store_id, поле сортировки, id) для keyset пагинации GET /units.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f3b9d7e5a028"
+down_revision: Union[str, None] = "e2a8c6f4b917"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+UNITS_SORT_COLUMNS = (
+    "title",
+    "description",
+    "quantity",
+    "average_cost_price",
+    "retail_price",
+    "created_at",
+)
+
+
+def upgrade() -> None:
+    op.create_index("ix_units_store_id_id", "units", ["store_id", "id"], unique=False)
+    for sort_column in UNITS_SORT_COLUMNS:
+        op.create_index(
+            f"ix_units_store_id_{sort_column}_id",
+            "units",
+            ["store_id", sort_column, "id"],
+            unique=False,
+        )
+
+
+def downgrade() -> None:
+    for sort_column in reversed(UNITS_SORT_COLUMNS):
+        op.drop_index(f"ix_units_store_id_{sort_column}_id", table_name="units")
+    op.drop_index("ix_units_store_id_id", table_name="units")
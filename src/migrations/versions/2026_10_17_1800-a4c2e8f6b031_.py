@@ -0,0 +1,30 @@
+"""empty message
+
+Revision ID: a4c2e8f6b031
+Revises: f3b9d7e5a028
+Create Date: 2026-10-17 18:00:12.583164
+
+Код товара units.code (артикул или штрихкод), уникален в магазине.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a4c2e8f6b031"
+down_revision: Union[str, None] = "f3b9d7e5a028"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("units", sa.Column("code", sa.String(length=64), nullable=True))
+    op.create_unique_constraint("uq_units_store_id_code", "units", ["store_id", "code"])
+
+
+def downgrade() -> None:
+    op.drop_constraint("uq_units_store_id_code", "units", type_="unique")
+    op.drop_column("units", "code")
@@ -0,0 +1,33 @@
+"""empty message
+
+Revision ID: b5d3f9a7c142
+Revises: a4c2e8f6b031
+Create Date: 2026-10-17 19:00:37.218406
+
+Индекс автодополнения названий товаров по префиксу в магазине.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b5d3f9a7c142"
+down_revision: Union[str, None] = "a4c2e8f6b031"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_units_store_id_title_prefix",
+        "units",
+        ["store_id", sa.text('lower(title) COLLATE "C"'), "id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_units_store_id_title_prefix", table_name="units")
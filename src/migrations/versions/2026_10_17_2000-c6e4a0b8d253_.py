@@ -0,0 +1,76 @@
+"""empty message
+
+Revision ID: c6e4a0b8d253
+Revises: b5d3f9a7c142
+Create Date: 2026-10-17 20:00:12.640918
+
+Счетчики товара: total_sold, total_revenue, last_sold_at, images_count.
+Заполняются из actions_transactions и unit_images, дальше их ведут действия и загрузка картинок.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c6e4a0b8d253"
+down_revision: Union[str, None] = "b5d3f9a7c142"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+UNITS_SORT_COLUMNS = (
+    "total_sold",
+    "total_revenue",
+    "images_count",
+)
+
+
+def upgrade() -> None:
+    op.add_column("units", sa.Column("total_sold", sa.Float(), server_default="0", nullable=False))
+    op.add_column(
+        "units", sa.Column("total_revenue", sa.Float(), server_default="0", nullable=False)
+    )
+    op.add_column("units", sa.Column("last_sold_at", sa.DateTime(timezone=True), nullable=True))
+    op.add_column(
+        "units", sa.Column("images_count", sa.Integer(), server_default="0", nullable=False)
+    )
+
+    # продажи прибавляются, возвраты вычитаются, как это делают действия
+    op.execute(
+        "UPDATE units SET total_sold = coalesce(t.total_sold, 0), "
+        "total_revenue = coalesce(t.total_revenue, 0), "
+        "last_sold_at = t.last_sold_at "
+        "FROM ("
+        "SELECT unit_id, "
+        "sum(CASE WHEN action = 'sales' THEN quantity_delta ELSE -quantity_delta END) "
+        "AS total_sold, "
+        "sum(CASE WHEN action = 'sales' THEN quantity_delta * discount_price "
+        "ELSE -quantity_delta * discount_price END) AS total_revenue, "
+        "max(created_at) FILTER (WHERE action = 'sales') AS last_sold_at "
+        "FROM actions_transactions WHERE action IN ('sales', 'salesReturn') GROUP BY unit_id"
+        ") t WHERE units.id = t.unit_id"
+    )
+    op.execute(
+        "UPDATE units SET images_count = i.images_count "
+        "FROM (SELECT unit_id, count(*) AS images_count FROM unit_images GROUP BY unit_id) i "
+        "WHERE units.id = i.unit_id"
+    )
+
+    for sort_column in UNITS_SORT_COLUMNS:
+        op.create_index(
+            f"ix_units_store_id_{sort_column}_id",
+            "units",
+            ["store_id", sort_column, "id"],
+            unique=False,
+        )
+
+
+def downgrade() -> None:
+    for sort_column in reversed(UNITS_SORT_COLUMNS):
+        op.drop_index(f"ix_units_store_id_{sort_column}_id", table_name="units")
+    op.drop_column("units", "images_count")
+    op.drop_column("units", "last_sold_at")
+    op.drop_column("units", "total_revenue")
+    op.drop_column("units", "total_sold")
@@ -0,0 +1,37 @@
+"""empty message
+
+Revision ID: d7f5b1c9e364
+Revises: c6e4a0b8d253
+Create Date: 2026-10-17 21:00:37.215804
+
+Уникальный индекс продаж из очереди redis вместо обычного индекса по queue_id.
+Уникальный индекс партиционированной таблицы должен включать ключ партиции, поэтому
+(queue_id, created_at): created_at продажи из очереди - время постановки в очередь,
+повторная запись той же продажи дает ту же пару.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d7f5b1c9e364"
+down_revision: Union[str, None] = "c6e4a0b8d253"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.drop_index(op.f("ix_actions_queue_id"), table_name="actions")
+    op.create_index(
+        "ix_actions_queue_id_created_at",
+        "actions",
+        ["queue_id", "created_at"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_actions_queue_id_created_at", table_name="actions")
+    op.create_index(op.f("ix_actions_queue_id"), "actions", ["queue_id"], unique=False)
@@ -1,10 +1,10 @@
 import typing
-from datetime import datetime
+from datetime import date, datetime
 from enum import Enum
 
 from sqlalchemy import Enum as SQLAlchemyEnum
-from sqlalchemy import ForeignKey
-from sqlalchemy import func, DateTime
+from sqlalchemy import ForeignKey, ForeignKeyConstraint, Index, UniqueConstraint
+from sqlalchemy import func, text, DateTime, Date
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from src.models.base import BaseModel
@@ -54,10 +54,34 @@ class ActionTransactionOrm(BaseModel):
         user_id (int): Внешний ключ на пользователя, совершившего действие.
         action_id (int): Внешний ключ на действие(нужно для привязки всех транзакций к действию).
         store_id (int): Внешний ключ на магазин(склад), в котором произошла транзакция.
+
+    Таблица разбита на помесячные партиции по created_at, первичный ключ (id, created_at).
     """
 
     __tablename__ = "actions_transactions"
-    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    __table_args__ = (
+        # транзакции создаются в одном запросе с действием, поэтому created_at у них совпадает
+        ForeignKeyConstraint(["action_id", "created_at"], ["actions.id", "actions.created_at"]),
+        # записи добавляются по времени: BRIN по created_at для выборок за период
+        Index("ix_actions_transactions_created_at", "created_at", postgresql_using="brin"),
+        # история товара: страница и итоги читаются только из индекса
+        Index(
+            "ix_actions_transactions_unit_id_created_at_id",
+            "unit_id",
+            text("created_at DESC"),
+            text("id DESC"),
+            postgresql_include=[
+                "action",
+                "quantity_delta",
+                "cost_price",
+                "retail_price",
+                "discount_price",
+                "action_id",
+            ],
+        ),
+        {"postgresql_partition_by": "RANGE (created_at)"},  # помесячные партиции
+    )
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True, index=True)
 
     quantity_delta: Mapped[float | None] = mapped_column(nullable=True)
     cost_price: Mapped[float | None] = mapped_column(nullable=True)
@@ -68,11 +92,13 @@ class ActionTransactionOrm(BaseModel):
     action: Mapped[ActionEnum] = mapped_column(
         SQLAlchemyEnum(ActionEnum, name="action_enum"), index=True
     )
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), primary_key=True
+    )
 
     unit_id: Mapped[int] = mapped_column(ForeignKey("units.id"), index=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
-    action_id: Mapped[int] = mapped_column(ForeignKey("actions.id"), index=True)
+    action_id: Mapped[int] = mapped_column(index=True)
     store_id: Mapped[int] = mapped_column(ForeignKey("stores.id"), index=True)
 
     unit: Mapped["UnitORM"] = relationship(back_populates="transactions")
@@ -83,12 +109,94 @@ class ActionOrm(BaseModel):
     __tablename__ = "actions"
     """
     Действие, нужно для привязки транзакций к одному действия например: sales нескольких товаров в одном действии.
+    Таблица разбита на помесячные партиции по created_at, первичный ключ (id, created_at).
     """
-    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    __table_args__ = (
+        # keyset пагинация списка действий магазина: WHERE (created_at, id) < курсор
+        Index(
+            "ix_actions_store_id_created_at_id",
+            "store_id",
+            text("created_at DESC"),
+            text("id DESC"),
+        ),
+        # записи добавляются по времени: BRIN по created_at для выборок за период
+        Index("ix_actions_created_at", "created_at", postgresql_using="brin"),
+        # продажа из очереди записывается один раз: created_at у нее время постановки в очередь,
+        # уникальный индекс партиционированной таблицы обязан включать ключ партиции
+        Index("ix_actions_queue_id_created_at", "queue_id", "created_at", unique=True),
+        {"postgresql_partition_by": "RANGE (created_at)"},  # помесячные партиции
+    )
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True, index=True)
     title: Mapped[ActionEnum] = mapped_column(
         SQLAlchemyEnum(ActionEnum, name="action_enum"), index=True
     )
     store_id: Mapped[int] = mapped_column(ForeignKey("stores.id"), index=True)
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), primary_key=True
+    )
+    # id продажи из очереди redis, по нему воркер не записывает продажу повторно
+    queue_id: Mapped[str | None] = mapped_column(nullable=True)
 
     transactions: Mapped[list["ActionTransactionOrm"]] = relationship(back_populates="action_")
+
+
+class UnitDailyStatsORM(BaseModel):
+    """
+    Дневные итоги по товару: продажи, возвраты и списания за день (UTC).
+    Обновляется в том же запросе, что и транзакции действия (_add_action_transactions),
+    полностью пересобирается из actions_transactions задачей backfill_unit_daily_stats.
+
+    Атрибуты:
+        day (date): День (UTC) транзакций.
+        sold_quantity (float): Продано товара.
+        revenue (float): Выручка по ценам продажи (discount_price).
+        retail_revenue (float): Выручка по розничным ценам, разница с revenue - глубина скидок.
+        cogs (float): Себестоимость проданного.
+        returned_quantity (float): Возвращено покупателями.
+        returned_revenue (float): Сумма возвратов по ценам возврата.
+        returned_cost (float): Себестоимость возвращенного.
+        written_off_quantity (float): Списано товара.
+        written_off_cost (float): Себестоимость списанного.
+    """
+
+    __tablename__ = "unit_daily_stats"
+    __table_args__ = (
+        UniqueConstraint("unit_id", "day"),  # цель ON CONFLICT при обновлении итогов
+        Index("ix_unit_daily_stats_store_id_day", "store_id", "day"),
+    )
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+
+    store_id: Mapped[int] = mapped_column(ForeignKey("stores.id"))
+    unit_id: Mapped[int] = mapped_column(ForeignKey("units.id"))
+    day: Mapped[date] = mapped_column(Date)
+
+    sold_quantity: Mapped[float] = mapped_column(server_default="0")
+    revenue: Mapped[float] = mapped_column(server_default="0")
+    retail_revenue: Mapped[float] = mapped_column(server_default="0")
+    cogs: Mapped[float] = mapped_column(server_default="0")
+    returned_quantity: Mapped[float] = mapped_column(server_default="0")
+    returned_revenue: Mapped[float] = mapped_column(server_default="0")
+    returned_cost: Mapped[float] = mapped_column(server_default="0")
+    written_off_quantity: Mapped[float] = mapped_column(server_default="0")
+    written_off_cost: Mapped[float] = mapped_column(server_default="0")
+
+
+class ActionsCounterORM(BaseModel):
+    """
+    Количество действий магазина по типу - total пагинации GET /actions без count(*) по actions.
+    Прибавляется тем же запросом, что вставляет действие, поэтому откатывается вместе с ним.
+    Счетчик разбит на slot строк (id действия % ACTIONS_COUNTERS_SLOTS): параллельные действия
+    одного типа в магазине не ждут блокировку одной строки. Итог - сумма по slot.
+    Сверяется с actions задачей reconcile_actions_counters, поправки сверки - в отдельном slot.
+    """
+
+    __tablename__ = "actions_counters"
+    __table_args__ = (
+        UniqueConstraint("store_id", "title", "slot"),  # цель ON CONFLICT при прибавлении
+    )
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+
+    store_id: Mapped[int] = mapped_column(ForeignKey("stores.id"))
+    title: Mapped[ActionEnum] = mapped_column(SQLAlchemyEnum(ActionEnum, name="action_enum"))
+    slot: Mapped[int] = mapped_column(server_default="0")
+    total: Mapped[int] = mapped_column(server_default="0")
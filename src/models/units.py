@@ -1,9 +1,9 @@
 import typing
 
-from sqlalchemy import Enum as SQLAlchemyEnum, ForeignKey
+from sqlalchemy import Enum as SQLAlchemyEnum, ForeignKey, Index, UniqueConstraint
 from enum import Enum
 
-from sqlalchemy import String, func, DateTime
+from sqlalchemy import String, func, DateTime, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from datetime import datetime
 from src.models.base import BaseModel
@@ -20,6 +20,20 @@ class UnitOfMeasurementEnum(str, Enum):
     meters = "meters"
 
 
+# Колонки сортировки каталога кроме id, совпадают со значениями SortUnitBy
+UNITS_SORT_COLUMNS = (
+    "title",
+    "description",
+    "quantity",
+    "average_cost_price",
+    "retail_price",
+    "created_at",
+    "total_sold",
+    "total_revenue",
+    "images_count",
+)
+
+
 class UnitORM(BaseModel):
     """
     Модель SQLAlchemy для представления товарной единицы (unit) на складе или в магазине.
@@ -34,9 +48,45 @@ class UnitORM(BaseModel):
         retail_price (float): Розничная цена товара. По умолчанию — 0.
         keys_image (list[str]): Список ключей/идентификаторов изображений товара. По умолчанию пустой список.
         created_at (datetime): Дата и время создания записи (UTC). Устанавливается автоматически на уровне БД.
+        code (str | None): Артикул или штрихкод, уникален в магазине. Необязательный.
+        total_sold (float): Продано товара за вычетом возвратов. Обновляется действиями.
+        total_revenue (float): Выручка по ценам продаж за вычетом возвратов. Обновляется действиями.
+        last_sold_at (datetime | None): Время последней продажи, None если товар не продавался.
+        images_count (int): Количество изображений товара, ограничивает загрузку новых.
     """
 
     __tablename__ = "units"
+    __table_args__ = (
+        # pg_trgm: поиск подстроки (ILIKE) и похожих слов (<%) по индексу
+        Index(
+            "ix_units_title_trgm",
+            "title",
+            postgresql_using="gin",
+            postgresql_ops={"title": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_units_description_trgm",
+            "description",
+            postgresql_using="gin",
+            postgresql_ops={"description": "gin_trgm_ops"},
+        ),
+        # автодополнение названия по префиксу в магазине: LIKE 'префикс%' и сортировка по одному
+        # индексу, collation "C" сравнивает байты как text_pattern_ops
+        Index(
+            "ix_units_store_id_title_prefix",
+            "store_id",
+            text('lower(title) COLLATE "C"'),
+            "id",
+        ),
+        # код товара уникален в магазине, по этому индексу товар ищется сканером
+        UniqueConstraint("store_id", "code", name="uq_units_store_id_code"),
+        # keyset пагинация каталога магазина: (store_id, поле сортировки, id), в обе стороны
+        Index("ix_units_store_id_id", "store_id", "id"),
+        *(
+            Index(f"ix_units_store_id_{sort_column}_id", "store_id", sort_column, "id")
+            for sort_column in UNITS_SORT_COLUMNS
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     title: Mapped[str] = mapped_column(String(100), index=True)
@@ -50,6 +100,11 @@ class UnitORM(BaseModel):
     average_cost_price: Mapped[float] = mapped_column(default=0)
     retail_price: Mapped[float] = mapped_column(default=0)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    code: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    total_sold: Mapped[float] = mapped_column(default=0, server_default="0")
+    total_revenue: Mapped[float] = mapped_column(default=0, server_default="0")
+    last_sold_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    images_count: Mapped[int] = mapped_column(default=0, server_default="0")
 
     store_id: Mapped[int] = mapped_column(ForeignKey("stores.id"), index=True)
 
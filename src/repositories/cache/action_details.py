@@ -0,0 +1,112 @@
+from typing import Sequence
+
+from src.repositories.cache.base import BaseRepository
+from src.repositories.cache.mappers.mappers import ActionWithTransactionsMapper
+from src.repositories.cache.space_name import (
+    space_name_action_details,
+    space_name_action_details_by_unit,
+    space_name_action_details_unit_version,
+)
+from src.schemas.actions import ActionWithTransactionsDTO
+
+"""
+Кэш GET /actions/{action_id}:
+    actions:details:{action_id} - действие с транзакциями и товарами
+    actions:details_by_unit:{unit_id} - множество id закэшированных действий с этим товаром
+    actions:details_unit_version:{unit_id} - версия товара, растет при каждом удалении по товару
+Действия и транзакции не меняются после создания, устаревает только товар в них: название,
+описание, главная картинка. Изменение товара удаляет действия из его множества.
+Действие записывается, только если версии его товаров не изменились с чтения из базы данных:
+изменение товара между чтением и записью не оставит в кэше старое действие.
+"""
+
+# KEYS: details, by_unit_1..by_unit_n, version_1..version_n
+# ARGV: details, ttl, action_id, версии товаров до чтения из базы ('' - ключа версии не было)
+ADD_ACTION_DETAILS_SCRIPT = """
+local units_count = (#KEYS - 1) / 2
+for i = 1, units_count do
+    if (redis.call('GET', KEYS[1 + units_count + i]) or '') ~= ARGV[3 + i] then
+        return 0
+    end
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+for i = 2, units_count + 1 do
+    redis.call('SADD', KEYS[i], ARGV[3])
+    redis.call('EXPIRE', KEYS[i], ARGV[2])
+end
+return 1
+"""
+
+# KEYS: by_unit, version
+# ARGV: префикс ключа действия, ttl версии
+DELETE_ACTION_DETAILS_BY_UNIT_SCRIPT = """
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+local action_ids = redis.call('SMEMBERS', KEYS[1])
+for _, action_id in ipairs(action_ids) do
+    redis.call('DEL', ARGV[1] .. action_id)
+end
+redis.call('DEL', KEYS[1])
+return #action_ids
+"""
+
+
+class ActionDetailsRepository(BaseRepository[ActionWithTransactionsDTO]):
+    mapper = ActionWithTransactionsMapper
+
+    async def get_action_or_none(self, action_id: int) -> ActionWithTransactionsDTO | None:
+        result = await self.adapter.get_one_or_none(key=space_name_action_details(action_id))
+        if result is None:
+            return None
+        return self.mapper.to_domain(result)
+
+    async def get_units_versions(self, *unit_ids: int) -> list[str]:
+        """Версии товаров для `add_action`, читать до чтения действия из базы данных"""
+        versions = await self.adapter.get_all(
+            *(space_name_action_details_unit_version(unit_id) for unit_id in unit_ids)
+        )
+        return [version or "" for version in versions]
+
+    async def add_action(
+        self,
+        dto: ActionWithTransactionsDTO,
+        unit_ids: Sequence[int],
+        versions: Sequence[str],
+        ttl: int,
+    ) -> bool:
+        """
+        Сохраняет действие и привязывает его к товарам транзакций, commit не нужен.
+        :param unit_ids: товары действия
+        :param versions: версии unit_ids из `get_units_versions`, прочитанные до базы данных
+        :return: False если товар изменился после чтения версий и действие не сохранено
+        """
+        result = await self.adapter.run_script(
+            ADD_ACTION_DETAILS_SCRIPT,
+            keys=[
+                space_name_action_details(dto.id),
+                *(space_name_action_details_by_unit(unit_id) for unit_id in unit_ids),
+                *(space_name_action_details_unit_version(unit_id) for unit_id in unit_ids),
+            ],
+            args=[self.mapper.to_cache(dto), ttl, dto.id, *versions],
+        )
+        return bool(result)
+
+    async def delete_by_units(self, *unit_ids: int, ttl: int) -> None:
+        """
+        Удаляет закэшированные действия с этими товарами и увеличивает версии товаров,
+        commit не нужен. Вызывать после commit изменения товара.
+        :param ttl: сколько хранится версия, не меньше времени чтения действия из базы данных
+        """
+        await self.adapter.run_script_bulk(
+            DELETE_ACTION_DETAILS_BY_UNIT_SCRIPT,
+            calls=[
+                (
+                    [
+                        space_name_action_details_by_unit(unit_id),
+                        space_name_action_details_unit_version(unit_id),
+                    ],
+                    [space_name_action_details(""), ttl],
+                )
+                for unit_id in set(unit_ids)
+            ],
+        )
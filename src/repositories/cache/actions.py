@@ -0,0 +1,70 @@
+from src.repositories.cache.base import BaseRepository
+from src.repositories.cache.mappers.mappers import IdempotentActionMapper
+from src.repositories.cache.space_name import space_name_action_idempotency_key
+from src.schemas.actions import IdempotentActionDTO
+
+# Продлевает ключ, только если в нем все еще лежит занятый этим запросом ключ без результата
+# KEYS: idempotency_key ; ARGV: значение ключа, ttl
+EXTEND_IDEMPOTENCY_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+class ActionsRepository(BaseRepository[IdempotentActionDTO]):
+    mapper = IdempotentActionMapper
+
+    async def get_idempotent_action_or_none(
+        self, user_id: int, idempotency_key: str
+    ) -> IdempotentActionDTO | None:
+        result = await self.adapter.get_one_or_none(
+            key=space_name_action_idempotency_key(user_id, idempotency_key)
+        )
+        if result is None:
+            return None
+        return self.mapper.to_domain(result)
+
+    async def lock_idempotent_action(
+        self, user_id: int, idempotency_key: str, dto: IdempotentActionDTO, ttl: int
+    ) -> bool:
+        """
+        Атомарно занимает ключ идемпотентности под выполняемое действие (dto.action = None).
+        :return: True если ключ занят этим запросом, False если ключ уже существует.
+        """
+        return await self.adapter.set_nx(
+            key=space_name_action_idempotency_key(user_id, idempotency_key),
+            value=self.mapper.to_cache(dto),
+            ttl=ttl,
+        )
+
+    async def extend_idempotent_action_lock(
+        self, user_id: int, idempotency_key: str, dto: IdempotentActionDTO, ttl: int
+    ) -> bool:
+        """
+        Продлевает ключ, занятый `lock_idempotent_action` с тем же dto, commit не нужен.
+        :return: False если ключа нет или в нем уже результат действия.
+        """
+        result = await self.adapter.run_script(
+            EXTEND_IDEMPOTENCY_LOCK_SCRIPT,
+            keys=[space_name_action_idempotency_key(user_id, idempotency_key)],
+            args=[self.mapper.to_cache(dto), ttl],
+        )
+        return bool(result)
+
+    async def add_idempotent_action(
+        self, user_id: int, idempotency_key: str, dto: IdempotentActionDTO, ttl: int
+    ) -> None:
+        """Сохраняет результат действия по ключу, применяется после commit"""
+        await self.adapter.set(
+            key=space_name_action_idempotency_key(user_id, idempotency_key),
+            value=self.mapper.to_cache(dto),
+            ttl=ttl,
+        )
+
+    async def delete_idempotent_action(self, user_id: int, idempotency_key: str) -> None:
+        """Освобождает ключ, применяется после commit"""
+        await self.adapter.delete_one(
+            key=space_name_action_idempotency_key(user_id, idempotency_key)
+        )
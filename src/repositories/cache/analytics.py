@@ -0,0 +1,88 @@
+from datetime import date
+
+from src.repositories.cache.base import BaseRepository
+from src.repositories.cache.mappers.mappers import SalesAnalyticsMapper
+from src.repositories.cache.space_name import (
+    space_name_sales_analytics,
+    space_name_sales_analytics_version,
+    space_name_sales_analytics_rebuild_version,
+)
+from src.schemas.actions import SalesAnalyticsDTO
+
+"""
+Кэш аналитики продаж:
+    analytics:sales:{store_id}:{bucket}:{date_from}:{date_to}:{by_unit}:{rebuild_version}:{version}
+        - результат запроса
+    analytics:sales_version:{store_id} - версия текущих периодов магазина
+    analytics:sales_rebuild_version - версия пересборки unit_daily_stats, входит во все ключи
+Действия меняют только итоги текущего дня, поэтому версия входит в ключ только у диапазонов,
+включающих текущий день. Новое действие увеличивает версию магазина: устаревают только такие
+диапазоны, закрытые диапазоны остаются в кэше. Пересборка итогов меняет и прошлые дни, поэтому
+увеличивает версию пересборки: устаревают все диапазоны. Старые версии удаляются по ttl.
+"""
+
+
+class AnalyticsRepository(BaseRepository[SalesAnalyticsDTO]):
+    mapper = SalesAnalyticsMapper
+
+    async def get_sales_version(self, store_id: int) -> int:
+        result = await self.adapter.get_one_or_none(
+            key=space_name_sales_analytics_version(store_id)
+        )
+        return int(result) if result else 0
+
+    async def get_rebuild_version(self) -> int:
+        result = await self.adapter.get_one_or_none(key=space_name_sales_analytics_rebuild_version)
+        return int(result) if result else 0
+
+    async def bump_rebuild_version(self) -> None:
+        """Устаревают все закэшированные диапазоны, в том числе закрытые, commit не нужен"""
+        await self.adapter.increment(key=space_name_sales_analytics_rebuild_version)
+
+    async def bump_sales_version(self, *store_ids: int) -> None:
+        """Устаревают закэшированные диапазоны магазинов, включающие текущий день"""
+        for store_id in set(store_ids):
+            await self.adapter.increment(key=space_name_sales_analytics_version(store_id))
+
+    async def get_sales_or_none(
+        self,
+        store_id: int,
+        bucket: str,
+        date_from: date,
+        date_to: date,
+        by_unit: bool,
+        rebuild_version: int,
+        version: int,
+    ) -> SalesAnalyticsDTO | None:
+        result = await self.adapter.get_one_or_none(
+            key=space_name_sales_analytics(
+                store_id,
+                bucket,
+                date_from.isoformat(),
+                date_to.isoformat(),
+                by_unit,
+                rebuild_version,
+                version,
+            )
+        )
+        if result is None:
+            return None
+        return self.mapper.to_domain(result)
+
+    async def add_sales(
+        self, dto: SalesAnalyticsDTO, by_unit: bool, rebuild_version: int, version: int, ttl: int
+    ) -> None:
+        """Применяется после commit"""
+        await self.adapter.set(
+            key=space_name_sales_analytics(
+                dto.store_id,
+                dto.bucket.value,
+                dto.date_from.isoformat(),
+                dto.date_to.isoformat(),
+                by_unit,
+                rebuild_version,
+                version,
+            ),
+            value=self.mapper.to_cache(dto),
+            ttl=ttl,
+        )
@@ -1,5 +1,13 @@
 from src.repositories.cache.mappers.base import DataMapper
+from src.schemas.actions import (
+    IdempotentActionDTO,
+    QueuedSaleDTO,
+    QueuedSaleEntryDTO,
+    SalesAnalyticsDTO,
+    ActionWithTransactionsDTO,
+)
 from src.schemas.auths import UnconfirmedRegistrationDTO, ForgotPasswordDTO
+from src.schemas.units import UnitsPageDTO, UnitsAutocompleteDTO
 from src.schemas.users import UserDTO
 
 
@@ -13,3 +21,31 @@ class ForgotPasswordMapper(DataMapper[ForgotPasswordDTO]):
 
 class UsersMapper(DataMapper[UserDTO]):
     schema = UserDTO
+
+
+class IdempotentActionMapper(DataMapper[IdempotentActionDTO]):
+    schema = IdempotentActionDTO
+
+
+class QueuedSaleMapper(DataMapper[QueuedSaleDTO]):
+    schema = QueuedSaleDTO
+
+
+class QueuedSaleEntryMapper(DataMapper[QueuedSaleEntryDTO]):
+    schema = QueuedSaleEntryDTO
+
+
+class SalesAnalyticsMapper(DataMapper[SalesAnalyticsDTO]):
+    schema = SalesAnalyticsDTO
+
+
+class ActionWithTransactionsMapper(DataMapper[ActionWithTransactionsDTO]):
+    schema = ActionWithTransactionsDTO
+
+
+class UnitsPageMapper(DataMapper[UnitsPageDTO]):
+    schema = UnitsPageDTO
+
+
+class UnitsAutocompleteMapper(DataMapper[UnitsAutocompleteDTO]):
+    schema = UnitsAutocompleteDTO
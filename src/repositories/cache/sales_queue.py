@@ -0,0 +1,278 @@
+from typing import cast
+
+from src.exceptions.base import UnitOutOfStockException
+from src.repositories.cache.base import BaseRepository
+from src.repositories.cache.mappers.mappers import QueuedSaleMapper, QueuedSaleEntryMapper
+from src.repositories.cache.space_name import (
+    space_name_sales_queue_stock,
+    space_name_sales_queue_status,
+    space_name_sales_queue_stream,
+    space_name_sales_queue_pending,
+    space_name_sales_queue_lock,
+    space_name_sales_queue_stock_pattern,
+)
+from src.schemas.actions import QueuedSaleDTO, QueuedSaleEntryDTO, SalesTransaction
+
+"""
+Очередь продаж в redis (write-behind):
+    sales_queue:stock:{store_id}:{unit_id} - доступный остаток товара с учетом продаж в очереди
+    sales_queue:pending - хэш {unit_id: количество в очереди, еще не записанное в базу}
+    sales_queue:stream - стрим продаж, разбирается воркером пачками
+    sales_queue:status:{queue_id} - статус продажи для чтения клиентом
+Инвариант: stock = units.quantity - pending. Все изменения ключей выполняются lua скриптами атомарно.
+"""
+
+# KEYS: stream, pending, status, stock_1..stock_n
+# ARGV: entry, status, status_ttl, quantity_1..quantity_n, unit_id_1..unit_id_n
+ENQUEUE_SALE_SCRIPT = """
+local n = #KEYS - 3
+local missing = {}
+for i = 1, n do
+    if redis.call('EXISTS', KEYS[3 + i]) == 0 then
+        missing[#missing + 1] = i
+    end
+end
+if #missing > 0 then
+    return {'missing', unpack(missing)}
+end
+local out_of_stock = {}
+for i = 1, n do
+    if tonumber(redis.call('GET', KEYS[3 + i])) < tonumber(ARGV[3 + i]) - 1e-9 then
+        out_of_stock[#out_of_stock + 1] = i
+    end
+end
+if #out_of_stock > 0 then
+    return {'out_of_stock', unpack(out_of_stock)}
+end
+for i = 1, n do
+    redis.call('INCRBYFLOAT', KEYS[3 + i], -tonumber(ARGV[3 + i]))
+    redis.call('HINCRBYFLOAT', KEYS[2], ARGV[3 + n + i], ARGV[3 + i])
+end
+redis.call('XADD', KEYS[1], '*', 'entry', ARGV[1])
+redis.call('SET', KEYS[3], ARGV[2], 'EX', ARGV[3])
+return {'ok'}
+"""
+
+# KEYS: pending, stock_1..stock_n
+# ARGV: quantity_1..quantity_n (из базы), unit_id_1..unit_id_n
+SEED_STOCK_SCRIPT = """
+local n = #KEYS - 1
+for i = 1, n do
+    local pending = tonumber(redis.call('HGET', KEYS[1], ARGV[n + i])) or 0
+    redis.call('SET', KEYS[1 + i], tonumber(ARGV[i]) - pending, 'NX')
+end
+return n
+"""
+
+# KEYS: stream, pending, status, stock_1..stock_n
+# ARGV: stream_id, status, status_ttl, is_rejected, quantity_1..quantity_n, unit_id_1..unit_id_n
+COMPLETE_SALE_SCRIPT = """
+local n = #KEYS - 3
+for i = 1, n do
+    local left = redis.call('HINCRBYFLOAT', KEYS[2], ARGV[4 + n + i], -tonumber(ARGV[4 + i]))
+    if tonumber(left) <= 1e-9 then
+        redis.call('HDEL', KEYS[2], ARGV[4 + n + i])
+    end
+    if ARGV[4] == '1' then
+        redis.call('DEL', KEYS[3 + i])
+    end
+end
+redis.call('SET', KEYS[3], ARGV[2], 'EX', ARGV[3])
+redis.call('XDEL', KEYS[1], ARGV[1])
+return 1
+"""
+
+# KEYS: pending, stock
+# ARGV: quantity (из базы), unit_id
+RECONCILE_STOCK_SCRIPT = """
+local current = redis.call('GET', KEYS[2])
+if not current then
+    return false
+end
+local expected = tonumber(ARGV[1]) - (tonumber(redis.call('HGET', KEYS[1], ARGV[2])) or 0)
+local drift = tonumber(current) - expected
+if math.abs(drift) <= 1e-9 then
+    return '0'
+end
+redis.call('SET', KEYS[2], expected)
+return tostring(drift)
+"""
+
+# KEYS: lock ; ARGV: token, ttl (0 - удалить)
+RELEASE_OR_EXTEND_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+if tonumber(ARGV[2]) > 0 then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return redis.call('DEL', KEYS[1])
+"""
+
+
+class SalesQueueRepository(BaseRepository[QueuedSaleDTO]):
+    mapper = QueuedSaleMapper
+
+    async def enqueue_sale(
+        self, entry: QueuedSaleEntryDTO, status: QueuedSaleDTO, status_ttl: int
+    ) -> list[int]:
+        """
+        Атомарно проверяет и уменьшает остатки, ставит продажу в стрим и сохраняет статус.
+        :return: id товаров без остатка в redis, продажа не поставлена. Пустой список - поставлена.
+        :raise UnitOutOfStockException: Если остатка хотя бы одного товара не хватает.
+        """
+        transactions = cast(list[SalesTransaction], entry.action.transactions)
+        result: list[str | int] = await self.adapter.run_script(
+            ENQUEUE_SALE_SCRIPT,
+            keys=[
+                space_name_sales_queue_stream,
+                space_name_sales_queue_pending,
+                space_name_sales_queue_status(entry.queue_id),
+                *(
+                    space_name_sales_queue_stock(entry.action.store_id, tx.unit_id)
+                    for tx in transactions
+                ),
+            ],
+            args=[
+                QueuedSaleEntryMapper.to_cache(entry),
+                self.mapper.to_cache(status),
+                status_ttl,
+                *(tx.quantity_delta for tx in transactions),
+                *(tx.unit_id for tx in transactions),
+            ],
+        )
+        state, *indexes = result
+        unit_ids = [transactions[int(i) - 1].unit_id for i in indexes]
+        if state == "out_of_stock":
+            raise UnitOutOfStockException(
+                f"{UnitOutOfStockException.details}(ids: {', '.join(map(str, unit_ids))})"
+            )
+        return unit_ids
+
+    async def seed_stock(self, store_id: int, quantities: dict[int, float]) -> None:
+        """
+        Заводит остатки товаров, которых нет в redis: остаток из базы минус продажи в очереди.
+        Существующие остатки не перезаписывает.
+        :param quantities: {unit_id: units.quantity}
+        """
+        await self.adapter.run_script(
+            SEED_STOCK_SCRIPT,
+            keys=[
+                space_name_sales_queue_pending,
+                *(space_name_sales_queue_stock(store_id, unit_id) for unit_id in quantities),
+            ],
+            args=[*quantities.values(), *quantities.keys()],
+        )
+
+    async def get_status_or_none(self, queue_id: str) -> QueuedSaleDTO | None:
+        result = await self.adapter.get_one_or_none(key=space_name_sales_queue_status(queue_id))
+        if result is None:
+            return None
+        return self.mapper.to_domain(result)
+
+    async def get_entries(self, count: int) -> list[tuple[str, QueuedSaleEntryDTO]]:
+        """
+        :return: самые старые продажи из стрима [(id записи стрима, продажа)]
+        """
+        entries = await self.adapter.get_stream_entries(
+            name=space_name_sales_queue_stream, count=count
+        )
+        return [
+            (stream_id, QueuedSaleEntryMapper.to_domain(fields["entry"]))
+            for stream_id, fields in entries
+        ]
+
+    async def complete_entries(
+        self, completed: list[tuple[str, QueuedSaleEntryDTO, QueuedSaleDTO]], status_ttl: int
+    ) -> None:
+        """
+        Убирает записанные в базу продажи из стрима и pending, сохраняет их итоговый статус.
+        Для отклоненных продаж удаляет остатки товаров: они заведутся заново из базы.
+        :param completed: [(id записи стрима, продажа, итоговый статус)]
+        """
+        calls: list[tuple[list[str], list[str | int | float]]] = []
+        for stream_id, entry, status in completed:
+            transactions = cast(list[SalesTransaction], entry.action.transactions)
+            keys = [
+                space_name_sales_queue_stream,
+                space_name_sales_queue_pending,
+                space_name_sales_queue_status(entry.queue_id),
+                *(
+                    space_name_sales_queue_stock(entry.action.store_id, tx.unit_id)
+                    for tx in transactions
+                ),
+            ]
+            args: list[str | int | float] = [
+                stream_id,
+                self.mapper.to_cache(status),
+                status_ttl,
+                int(status.error is not None),
+                *(tx.quantity_delta for tx in transactions),
+                *(tx.unit_id for tx in transactions),
+            ]
+            calls.append((keys, args))
+        await self.adapter.run_script_bulk(COMPLETE_SALE_SCRIPT, calls=calls)
+
+    async def get_stock_keys(self) -> list[tuple[int, int]]:
+        """
+        :return: [(store_id, unit_id)] всех остатков в redis
+        """
+        keys = await self.adapter.scan_keys(match=space_name_sales_queue_stock_pattern)
+        result: list[tuple[int, int]] = []
+        for key in keys:
+            store_id, unit_id = key.rsplit(":", 2)[-2:]
+            result.append((int(store_id), int(unit_id)))
+        return result
+
+    async def reconcile_stock(
+        self, store_id: int, quantities: dict[int, float]
+    ) -> dict[int, float]:
+        """
+        Приводит остатки к units.quantity - pending. Вызывать под блокировкой воркера очереди,
+        иначе pending может не совпасть с базой.
+        :param quantities: {unit_id: units.quantity}
+        :return: {unit_id: расхождение} исправленных остатков
+        """
+        units = list(quantities.items())
+        result: list[str | None] = await self.adapter.run_script_bulk(
+            RECONCILE_STOCK_SCRIPT,
+            calls=[
+                (
+                    [
+                        space_name_sales_queue_pending,
+                        space_name_sales_queue_stock(store_id, unit_id),
+                    ],
+                    [quantity, unit_id],
+                )
+                for unit_id, quantity in units
+            ],
+        )
+        return {
+            unit_id: float(drift)
+            for (unit_id, _), drift in zip(units, result)
+            if drift is not None and float(drift) != 0
+        }
+
+    async def delete_stock(self, store_id: int, *unit_ids: int) -> None:
+        """Удаляет остатки товаров, применяется после commit"""
+        for unit_id in unit_ids:
+            await self.adapter.delete_one(key=space_name_sales_queue_stock(store_id, unit_id))
+
+    async def lock(self, token: str, ttl: int) -> bool:
+        """
+        Блокировка воркера очереди: разбор и сверка не выполняются параллельно.
+        :return: True если блокировка получена
+        """
+        return await self.adapter.set_nx(key=space_name_sales_queue_lock, value=token, ttl=ttl)
+
+    async def extend_lock(self, token: str, ttl: int) -> bool:
+        return bool(
+            await self.adapter.run_script(
+                RELEASE_OR_EXTEND_LOCK_SCRIPT, keys=[space_name_sales_queue_lock], args=[token, ttl]
+            )
+        )
+
+    async def unlock(self, token: str) -> None:
+        await self.adapter.run_script(
+            RELEASE_OR_EXTEND_LOCK_SCRIPT, keys=[space_name_sales_queue_lock], args=[token, 0]
+        )
@@ -14,4 +14,81 @@ def space_name_cooldown_forgot_password(email: str) -> str:
     return f"auth:forgot_password:{email}"
 
 
+def space_name_action_idempotency_key(user_id: int, idempotency_key: str) -> str:
+    return f"actions:idempotency:{user_id}:{idempotency_key}"
+
+
+def space_name_action_details(action_id: int | str) -> str:
+    return f"actions:details:{action_id}"
+
+
+def space_name_action_details_by_unit(unit_id: int) -> str:
+    return f"actions:details_by_unit:{unit_id}"
+
+
+def space_name_action_details_unit_version(unit_id: int) -> str:
+    return f"actions:details_unit_version:{unit_id}"
+
+
+def space_name_sales_queue_stock(store_id: int, unit_id: int) -> str:
+    return f"sales_queue:stock:{store_id}:{unit_id}"
+
+
+def space_name_sales_queue_status(queue_id: str) -> str:
+    return f"sales_queue:status:{queue_id}"
+
+
+def space_name_sales_analytics_version(store_id: int) -> str:
+    return f"analytics:sales_version:{store_id}"
+
+
+def space_name_sales_analytics(
+    store_id: int,
+    bucket: str,
+    date_from: str,
+    date_to: str,
+    by_unit: bool,
+    rebuild_version: int,
+    version: int,
+) -> str:
+    return (
+        f"analytics:sales:{store_id}:{bucket}:{date_from}:{date_to}:{int(by_unit)}"
+        f":{rebuild_version}:{version}"
+    )
+
+
+def space_name_units_list_version(store_id: int) -> str:
+    return f"units:list_version:{store_id}"
+
+
+def space_name_units_list(store_id: int, version: int, params_hash: str) -> str:
+    return f"units:list:{store_id}:{version}:{params_hash}"
+
+
+def space_name_units_autocomplete(store_id: int, version: int, limit: int, prefix: str) -> str:
+    return f"units:autocomplete:{store_id}:{version}:{limit}:{prefix}"
+
+
+def space_name_cached_method(name: str, id_: int | str) -> str:
+    return f"cached_method:{name}:{id_}"
+
+
+def space_name_cached_method_version(name: str, id_: int | str) -> str:
+    return f"cached_method_version:{name}:{id_}"
+
+
+def space_name_unit_id_by_code(store_id: int, code: str) -> str:
+    return f"units:code:{store_id}:{code}"
+
+
+space_name_sales_queue_stream = "sales_queue:stream"
+space_name_sales_queue_pending = "sales_queue:pending"
+space_name_sales_queue_lock = "sales_queue:lock"
+space_name_sales_queue_stock_pattern = "sales_queue:stock:*"
+space_name_sales_analytics_rebuild_version = "analytics:sales_rebuild_version"
+space_name_units_list_hits = "units:list_cache:hits"
+space_name_units_list_misses = "units:list_cache:misses"
+
+space_name_cached_unit = "unit"  # UnitsService.check_get_unit_by_id
+
 space_name_users = "users:"
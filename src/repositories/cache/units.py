@@ -0,0 +1,128 @@
+from src.repositories.cache.base import BaseRepository
+from src.repositories.cache.mappers.mappers import UnitsPageMapper, UnitsAutocompleteMapper
+from src.repositories.cache.space_name import (
+    space_name_units_list,
+    space_name_units_list_version,
+    space_name_units_list_hits,
+    space_name_units_list_misses,
+    space_name_unit_id_by_code,
+    space_name_units_autocomplete,
+    space_name_cached_method,
+    space_name_cached_method_version,
+    space_name_cached_unit,
+)
+from src.schemas.units import UnitsPageDTO, UnitsAutocompleteDTO
+
+"""
+Кэш списка товаров магазина (GET /units):
+    units:list:{store_id}:{version}:{params_hash} - страница списка для параметров запроса
+    units:list_version:{store_id} - версия товаров магазина
+    units:list_cache:hits, units:list_cache:misses - счетчики попаданий и промахов
+    units:autocomplete:{store_id}:{version}:{limit}:{prefix} - подсказки названий по префиксу
+    units:code:{store_id}:{code} - id товара по коду (артикул, штрихкод)
+    cached_method:unit:{unit_id} - товар UnitsService.check_get_unit_by_id, см. delete_cached_units
+Любое изменение товаров, картинок или остатков магазина увеличивает его версию: страницы
+старой версии больше не читаются и удаляются по ttl, перебирать ключи не нужно.
+"""
+
+# KEYS: version_1, value_1, ..., version_n, value_n ; ARGV: ttl версии
+DELETE_CACHED_METHOD_SCRIPT = """
+for i = 1, #KEYS, 2 do
+    redis.call('INCR', KEYS[i])
+    redis.call('EXPIRE', KEYS[i], ARGV[1])
+    redis.call('DEL', KEYS[i + 1])
+end
+return #KEYS / 2
+"""
+
+
+class UnitsRepository(BaseRepository[UnitsPageDTO]):
+    mapper = UnitsPageMapper
+
+    async def get_list_version(self, store_id: int) -> int:
+        result = await self.adapter.get_one_or_none(key=space_name_units_list_version(store_id))
+        return int(result) if result else 0
+
+    async def bump_list_version(self, *store_ids: int) -> None:
+        """Устаревают все закэшированные страницы списка товаров магазинов"""
+        for store_id in set(store_ids):
+            await self.adapter.increment(key=space_name_units_list_version(store_id))
+
+    async def get_page_or_none(
+        self, store_id: int, version: int, params_hash: str
+    ) -> UnitsPageDTO | None:
+        """Учитывает попадание или промах в счетчиках кэша"""
+        result = await self.adapter.get_one_or_none(
+            key=space_name_units_list(store_id, version, params_hash)
+        )
+        if result is None:
+            await self.adapter.increment(key=space_name_units_list_misses)
+            return None
+        await self.adapter.increment(key=space_name_units_list_hits)
+        return self.mapper.to_domain(result)
+
+    async def add_page(
+        self, dto: UnitsPageDTO, store_id: int, version: int, params_hash: str, ttl: int
+    ) -> None:
+        """Применяется после commit"""
+        await self.adapter.set(
+            key=space_name_units_list(store_id, version, params_hash),
+            value=self.mapper.to_cache(dto),
+            ttl=ttl,
+        )
+
+    async def get_autocomplete_or_none(
+        self, store_id: int, version: int, limit: int, prefix: str
+    ) -> UnitsAutocompleteDTO | None:
+        result = await self.adapter.get_one_or_none(
+            key=space_name_units_autocomplete(store_id, version, limit, prefix)
+        )
+        if result is None:
+            return None
+        return UnitsAutocompleteMapper.to_domain(result)
+
+    async def add_autocomplete(
+        self,
+        dto: UnitsAutocompleteDTO,
+        store_id: int,
+        version: int,
+        limit: int,
+        prefix: str,
+        ttl: int,
+    ) -> None:
+        """Применяется после commit"""
+        await self.adapter.set(
+            key=space_name_units_autocomplete(store_id, version, limit, prefix),
+            value=UnitsAutocompleteMapper.to_cache(dto),
+            ttl=ttl,
+        )
+
+    async def get_unit_id_by_code(self, store_id: int, code: str) -> int | None:
+        result = await self.adapter.get_one_or_none(key=space_name_unit_id_by_code(store_id, code))
+        return int(result) if result else None
+
+    async def add_unit_id_by_code(self, store_id: int, code: str, unit_id: int, ttl: int) -> None:
+        """Применяется после commit"""
+        await self.adapter.set(
+            key=space_name_unit_id_by_code(store_id, code), value=str(unit_id), ttl=ttl
+        )
+
+    async def delete_unit_id_by_code(self, store_id: int, *codes: str) -> None:
+        """Применяется после commit"""
+        for code in set(codes):
+            await self.adapter.delete_one(key=space_name_unit_id_by_code(store_id, code))
+
+    async def delete_cached_units(self, *unit_ids: int, ttl: int) -> None:
+        """
+        Удаляет товары из кэша check_get_unit_by_id сразу, commit не нужен. Вызывать после commit
+        базы данных. Версия товара увеличивается: чтение из базы, начатое до инвалидации,
+        не запишет в кэш устаревший товар.
+        :param ttl: время жизни версии, не меньше ttl закэшированного товара
+        """
+        if not unit_ids:
+            return
+        keys: list[str] = []
+        for unit_id in set(unit_ids):
+            keys.append(space_name_cached_method_version(space_name_cached_unit, unit_id))
+            keys.append(space_name_cached_method(space_name_cached_unit, unit_id))
+        await self.adapter.run_script(DELETE_CACHED_METHOD_SCRIPT, keys=keys, args=[ttl])
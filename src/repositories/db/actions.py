@@ -1,41 +1,99 @@
-from collections import defaultdict
-from typing import Any
+import logging
+from datetime import date, datetime, time, timezone
+from typing import Any, AsyncIterator, Sequence
 
+from asyncpg import (  # type: ignore reportMissingTypeStubs
+    ForeignKeyViolationError,
+    UniqueViolationError,
+)
+from pydantic import TypeAdapter
 from sqlalchemy import (
     select,
     literal,
+    delete,
     insert,
-    union_all,
     update,
     cast,
+    func,
+    bindparam,
     Float,
+    Integer,
     CTE,
     join,
     ColumnElement,
-    Select,
+    text,
+    Date,
+    DateTime,
+    String,
+    Row,
+    Text,
+    tuple_,
 )
-from sqlalchemy.orm import joinedload
+from sqlalchemy.dialects.postgresql import ARRAY, JSON, aggregate_order_by, insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import InstrumentedAttribute, joinedload
+from sqlalchemy.types import TypeEngine
 
+from src.exceptions.base import ObjectAlreadyExistsException
+from src.exceptions.not_found import ForeignKeyNotFoundException
 from src.logging_config import logger
-from src.models.actions import ActionTransactionOrm, ActionOrm, ActionEnum
+from src.models.actions import (
+    ActionTransactionOrm,
+    ActionOrm,
+    ActionEnum,
+    UnitDailyStatsORM,
+    ActionsCounterORM,
+)
 from src.models.units import UnitORM, StoreORM
+from src.schemas.types import AnalyticsBucket
+from src.schemas.units import (
+    UnitTransactionDTO,
+    UnitTransactionsCursorDTO,
+    UnitTransactionsSummaryDTO,
+)
 from src.repositories.db.base import BaseRepository
 from src.repositories.db.mappers.mappers import (
     ActionsDataMapper,
     ActionsTransactionsDataMapper,
-    ActionWithUnitsTransactionsDataMapper,
     ActionsTransactionsWithUnitDataMapper,
+    UnitDailyStatsDataMapper,
+    ActionsCounterDataMapper,
 )
 from src.schemas.actions import (
-    ActionIdDTO,
+    AddActionResultDTO,
+    ActionUnitCheckDTO,
     AddActionDTO,
     ActionWithUnitsTransactionsDTO,
     ActionDTO,
     ActionTransactionDTO,
     SalesTransaction,
     ActionTransactionWithUnitDTO,
+    TransactionUnion,
+    UnitDailyStatsDTO,
+    SalesAnalyticsRowDTO,
+    ActionTransactionExportDTO,
+    ActionsCursorDTO,
+    ActionsCounterDTO,
 )
+from src.utils.exceptions import is_raise
 from src.utils.sql import sql_debag
+from src.utils.time_manager import add_months, get_utc_now
+
+# Типы колонок виртуальной таблицы unit_ops, каждая колонка передается в запрос массивом
+UNIT_OPS_COLUMNS_TYPES: dict[str, type[TypeEngine[Any]]] = {
+    "unit_id": Integer,
+    "quantity_delta": Float,
+    "cost_price": Float,
+    "retail_price": Float,
+    "discount_price": Float,
+}
+
+ActionsWithUnitsTransactionsAdapter = TypeAdapter(list[ActionWithUnitsTransactionsDTO])
+
+# На сколько строк разбит счетчик действий магазина одного типа, см. ActionsCounterORM
+ACTIONS_COUNTERS_SLOTS = 8
+# slot поправок reconcile: id % ACTIONS_COUNTERS_SLOTS его не дает, вставка действия его не блокирует
+ACTIONS_COUNTERS_RECONCILE_SLOT = ACTIONS_COUNTERS_SLOTS
 
 
 class ActionsRepository(BaseRepository[ActionOrm, ActionDTO]):
@@ -43,19 +101,40 @@ class ActionsRepository(BaseRepository[ActionOrm, ActionDTO]):
     mapper = ActionsDataMapper
 
     async def get_actions_with_units(
-        self, store_id: int | None, offset: int, limit: int, search_term: str | None
+        self,
+        store_id: int | None,
+        offset: int,
+        limit: int,
+        search_term: str | None,
+        created_from: datetime | None = None,
+        created_to: datetime | None = None,
+        cursor: ActionsCursorDTO | None = None,
     ) -> list[ActionWithUnitsTransactionsDTO]:
         """
         Почему не простым способом?
         Потому что бы хочется вытянуть только определенные поля, что бы снизить нагрузку.
+        Страница собирается в json одним запросом: действия с товарами транзакций,
+        без группировки транзакций по действиям в python.
+        created_from, created_to - диапазон created_at (включительно), отсекает лишние партиции.
+        Действия отсортированы от новых к старым по (created_at, id).
+        cursor - последнее действие предыдущей страницы, offset тогда не применяется:
+        страница читается по индексу (store_id, created_at DESC, id DESC) с нужного места.
         """
-        # получаем actions
         filters: list[ColumnElement[bool]] = []
         if search_term:
             filters.append(self.model.title == search_term)
         if store_id:
             filters.append(self.model.store_id == store_id)
-        actions_query = (
+        if created_from:
+            filters.append(self.model.created_at >= created_from)
+        if created_to:
+            filters.append(self.model.created_at <= created_to)
+        if cursor:
+            filters.append(
+                tuple_(self.model.created_at, self.model.id) < (cursor.created_at, cursor.id)
+            )
+            offset = 0
+        page = (
             select(
                 self.model.id,
                 self.model.title,
@@ -67,25 +146,25 @@ class ActionsRepository(BaseRepository[ActionOrm, ActionDTO]):
                 join(left=self.model, right=StoreORM, onclause=self.model.store_id == StoreORM.id)
             )
             .filter(*filters)
+            .order_by(self.model.created_at.desc(), self.model.id.desc())
             .offset(offset)
             .limit(limit)
+            .subquery("page")
         )
-        actions_result = await self.session.execute(actions_query)
-        actions_map: defaultdict[int, Any] = defaultdict(dict)
-        actions_ids: list[int] = list()
-        for row in actions_result.mappings().all():  # создаем map по ключам action_id
-            action_dict = dict(row)
-            action_dict["transactions"] = []
-            actions_map[action_dict["id"]] = action_dict
-            actions_ids.append(action_dict["id"])  # собираем id для запроса transactions_query
-
-        # получаем транзакции с именами товара
-        transactions_query = (
+
+        # товары транзакций действия массивом [{unit_id, title}],
+        # created_at транзакций совпадает с действием: читается только партиция действия
+        transactions = (
             select(
-                ActionTransactionOrm.id.label("transaction_id"),
-                ActionTransactionOrm.action_id,
-                UnitORM.id.label("unit_id"),
-                UnitORM.title,
+                func.coalesce(
+                    func.json_agg(
+                        aggregate_order_by(
+                            func.json_build_object("unit_id", UnitORM.id, "title", UnitORM.title),
+                            ActionTransactionOrm.id,
+                        )
+                    ),
+                    cast(literal("[]"), JSON),
+                )
             )
             .select_from(
                 join(
@@ -94,45 +173,113 @@ class ActionsRepository(BaseRepository[ActionOrm, ActionDTO]):
                     onclause=ActionTransactionOrm.unit_id == UnitORM.id,
                 )
             )
-            .filter(ActionTransactionOrm.action_id.in_(actions_ids))
+            .filter(
+                ActionTransactionOrm.action_id == page.c.id,
+                ActionTransactionOrm.created_at == page.c.created_at,
+            )
+            .scalar_subquery()
+        )
+        action = func.json_build_object(
+            "id",
+            page.c.id,
+            "title",
+            page.c.title,
+            "created_at",
+            page.c.created_at,
+            "store_id",
+            page.c.store_id,
+            "store_title",
+            page.c.store_title,
+            "transactions",
+            transactions,
+        )
+        # вся страница одним json массивом, pydantic разбирает его без промежуточных dict
+        actions_query = select(
+            func.coalesce(
+                cast(
+                    func.json_agg(
+                        aggregate_order_by(action, page.c.created_at.desc(), page.c.id.desc())
+                    ),
+                    Text,
+                ),
+                "[]",
+            )
         )
-        transactions_result = await self.session.execute(transactions_query)
-        for row in transactions_result.mappings().all():  # расфасовываем транзакции в map по ключам
-            transaction_dict = dict(row)
-            actions_map[transaction_dict["action_id"]]["transactions"].append(transaction_dict)
+        result = await self.session.execute(actions_query)
+        return ActionsWithUnitsTransactionsAdapter.validate_json(result.scalar_one())
 
-        return [
-            ActionWithUnitsTransactionsDataMapper.to_domain(action)
-            for action in actions_map.values()
-        ]
+    async def get_actions_total(
+        self,
+        store_id: int | None,
+        title: ActionEnum | None,
+        created_from: datetime | None,
+        created_to: datetime | None,
+    ) -> int:
+        """
+        count(*) действий за период, для фильтров по дате, которых нет у actions_counters.
+        Диапазон created_at отсекает лишние партиции и блоки индекса ix_actions_created_at.
+        """
+        filters: list[ColumnElement[bool]] = []
+        if store_id:
+            filters.append(self.model.store_id == store_id)
+        if title:
+            filters.append(self.model.title == title)
+        if created_from:
+            filters.append(self.model.created_at >= created_from)
+        if created_to:
+            filters.append(self.model.created_at <= created_to)
+        return await self.get_total(*filters)
+
+    async def create_month_partitions(self, first_month: date, months: int) -> list[str]:
+        """
+        Создает помесячные партиции actions и actions_transactions, если их еще нет.
+        Партиции создаются парами: транзакции лежат в партиции того же месяца, что и действие.
+        :param first_month: первое число первого месяца
+        :param months: сколько месяцев создать
+        :return: названия партиций
+        """
+        partitions: list[str] = []
+        for index in range(months):
+            month_start = add_months(first_month, index)
+            month_end = add_months(first_month, index + 1)
+            for table in (ActionOrm.__tablename__, ActionTransactionOrm.__tablename__):
+                partition = f"{table}_y{month_start.year}m{month_start.month:02d}"
+                await self.session.execute(
+                    text(
+                        f"CREATE TABLE IF NOT EXISTS {partition} PARTITION OF {table} "
+                        f"FOR VALUES FROM ('{month_start.isoformat()} 00:00:00+00') "
+                        f"TO ('{month_end.isoformat()} 00:00:00+00')"
+                    )
+                )
+                partitions.append(partition)
+        return partitions
+
+    async def get_action_ids_by_queue_ids(self, *queue_ids: str) -> dict[str, int]:
+        """
+        :return: {queue_id: id действия} для продаж из очереди, которые уже записаны в базу
+        """
+        query = select(self.model.queue_id, self.model.id).filter(
+            self.model.queue_id.in_(queue_ids)
+        )
+        result = await self.session.execute(query)
+        return {queue_id: action_id for queue_id, action_id in result.tuples().all() if queue_id}
 
 
 class ActionsTransactionsRepository(BaseRepository[ActionTransactionOrm, ActionTransactionDTO]):
     model = ActionTransactionOrm
     mapper = ActionsTransactionsDataMapper
 
-    async def add_stock(self, user_id: int, data: AddActionDTO) -> ActionIdDTO:
+    async def add_stock(self, user_id: int, data: AddActionDTO) -> AddActionResultDTO:
         """
         1. Выполнить unit_ops_cte → сформировать виртуальную таблицу из data, согласно логики действия(addStock)
         2. Выполнить updated_unit_cte → обновить товары, согласно логики действия(addStock) и вернуть новые значения
         3. Выполнить add_action_cte → вставить в таблицу новую запись действия(addStock)
         4. Выполнить SELECT с JOIN → собрать все данные, согласно логики действия(addStock), для вставки в actions_transactions
         """
-        # Создаем поля для виртуальной таблицы unit_ops_cte
-        ops_values: list[Select[tuple[int, float | None, float | None, float | None, int]]] = [
-            select(
-                literal(transaction.unit_id).label("unit_id"),
-                literal(getattr(transaction, "quantity_delta", None)).label("quantity_delta"),
-                literal(getattr(transaction, "cost_price", None)).label("cost_price"),
-                literal(getattr(transaction, "retail_price", None)).label("retail_price"),
-                literal(i).label(
-                    "row_num"
-                ),  # поле для order_by, что бы сохранился порядок от пользователя
-            )
-            for i, transaction in enumerate(data.transactions)
-        ]
-
-        unit_ops_cte = union_all(*ops_values).cte("unit_ops")
+        # Создаем виртуальную таблицу unit_ops_cte
+        unit_ops_cte = self._unit_ops_cte(
+            data.transactions, "unit_id", "quantity_delta", "cost_price", "retail_price"
+        )
 
         # обновляем поля, используем математические вычисления
         updated_unit_values = dict(
@@ -148,7 +295,9 @@ class ActionsTransactionsRepository(BaseRepository[ActionTransactionOrm, ActionT
             retail_price=unit_ops_cte.c.retail_price,
         )
         edit_unit_cte = self._updated_unit_cte(
-            UnitORM.id == unit_ops_cte.c.unit_id, **updated_unit_values
+            UnitORM.id == unit_ops_cte.c.unit_id,
+            UnitORM.store_id == data.store_id,  # товар обновится только в своем магазине
+            **updated_unit_values,
         )
 
         # создаем action, нужен его id в дальнейшем
@@ -163,7 +312,7 @@ class ActionsTransactionsRepository(BaseRepository[ActionTransactionOrm, ActionT
             discount_price=None,  # Реальная цена продажи
             action=add_action_cte.c.title,
             unit_id=edit_unit_cte.c.id,
-            user_id=user_id,
+            user_id=literal(user_id),
             action_id=add_action_cte.c.id,
             store_id=edit_unit_cte.c.store_id,
         )
@@ -178,8 +327,13 @@ class ActionsTransactionsRepository(BaseRepository[ActionTransactionOrm, ActionT
         store_id: int,
         action: ActionEnum,
         sales_transactions: list[SalesTransaction],
-    ) -> ActionIdDTO:
+        queue_id: str | None = None,
+        created_at: datetime | None = None,
+    ) -> AddActionResultDTO:
         """
+        queue_id - id продажи из очереди redis, сохраняется в action.
+        created_at - время продажи из очереди: действие, транзакции и итоги дня записываются
+        с ним, а не с временем записи в базу. Без него используется now().
         1. Выполнить unit_ops_cte → сформировать виртуальную таблицу из data, согласно логики действия(sales)
         2. Выполнить updated_unit_cte → обновить товары, согласно логики действия(sales) и вернуть новые значения
         3. Выполнить add_action_cte → вставить в таблицу новую запись действия(sales)
@@ -188,32 +342,35 @@ class ActionsTransactionsRepository(BaseRepository[ActionTransactionOrm, ActionT
         Raises:
             Exception
         """
-        # Создаем поля для виртуальной таблицы unit_ops_cte
-        ops_values = [
-            select(
-                literal(transaction.unit_id).label("unit_id"),
-                literal(transaction.quantity_delta).label("quantity_delta"),
-                literal(transaction.discount_price).label("discount_price"),
-                literal(i).label(
-                    "row_num"
-                ),  # поле для order_by, что бы сохранился порядок от пользователя
-            )
-            for i, transaction in enumerate(sales_transactions)
-        ]
-
-        unit_ops_cte = union_all(*ops_values).cte("unit_ops")
+        # Создаем виртуальную таблицу unit_ops_cte
+        unit_ops_cte = self._unit_ops_cte(
+            sales_transactions, "unit_id", "quantity_delta", "discount_price"
+        )
 
         # обновляем поля, используем математические вычисления
         updated_unit_values = dict(
             quantity=UnitORM.quantity
             - unit_ops_cte.c.quantity_delta,  # отнимает количество товара при продаже
+            # счетчики продаж товара для сортировки каталога без агрегации транзакций
+            total_sold=UnitORM.total_sold + unit_ops_cte.c.quantity_delta,
+            total_revenue=UnitORM.total_revenue
+            + unit_ops_cte.c.quantity_delta * unit_ops_cte.c.discount_price,
+            last_sold_at=func.now()
+            if created_at is None
+            else func.greatest(UnitORM.last_sold_at, literal(created_at, DateTime(timezone=True))),
         )
         edit_unit_cte = self._updated_unit_cte(
-            UnitORM.id == unit_ops_cte.c.unit_id, **updated_unit_values
+            UnitORM.id == unit_ops_cte.c.unit_id,
+            UnitORM.store_id == store_id,  # товар обновится только в своем магазине
+            # обновится только если товара хватает, перепроверяется после блокировки строки
+            UnitORM.quantity >= unit_ops_cte.c.quantity_delta,
+            **updated_unit_values,
         )
 
         # создаем action, нужен его id в дальнейшем
-        add_action_cte = self._insert_action_cte(title=action, store_id=store_id)
+        add_action_cte = self._insert_action_cte(
+            title=action, store_id=store_id, queue_id=queue_id, created_at=created_at
+        )
 
         # Значения полей которые вставляем в таблицу actions_transactions
         select_values_map = self._create_select_values(
@@ -226,16 +383,31 @@ class ActionsTransactionsRepository(BaseRepository[ActionTransactionOrm, ActionT
             discount_price=unit_ops_cte.c.discount_price,  # Реальная цена продажи
             action=add_action_cte.c.title,
             unit_id=edit_unit_cte.c.id,
-            user_id=user_id,
+            user_id=literal(user_id),
             action_id=add_action_cte.c.id,
             store_id=edit_unit_cte.c.store_id,
         )
+        if created_at is not None:  # created_at транзакций совпадает с действием
+            select_values_map["created_at"] = add_action_cte.c.created_at
+
+        # Прибавки к дневным итогам товара
+        daily_stats_values = dict(
+            sold_quantity=unit_ops_cte.c.quantity_delta,
+            revenue=unit_ops_cte.c.quantity_delta * unit_ops_cte.c.discount_price,
+            retail_revenue=unit_ops_cte.c.quantity_delta * edit_unit_cte.c.retail_price,
+            cogs=unit_ops_cte.c.quantity_delta * edit_unit_cte.c.average_cost_price,
+        )
 
         return await self._add_action_transactions(
-            unit_ops_cte, edit_unit_cte, add_action_cte, select_values_map
+            unit_ops_cte,
+            edit_unit_cte,
+            add_action_cte,
+            select_values_map,
+            daily_stats_values,
+            created_at=created_at,
         )
 
-    async def sales_return(self, user_id: int, data: AddActionDTO) -> ActionIdDTO:
+    async def sales_return(self, user_id: int, data: AddActionDTO) -> AddActionResultDTO:
         """
         1. Выполнить unit_ops_cte → сформировать виртуальную таблицу из data, согласно логики действия(sales_return)
         2. Выполнить updated_unit_cte → обновить товары, согласно логики действия(sales_return) и вернуть новые значения
@@ -245,28 +417,24 @@ class ActionsTransactionsRepository(BaseRepository[ActionTransactionOrm, ActionT
         Raises:
             Exception
         """
-        # Создаем поля для виртуальной таблицы unit_ops_cte
-        ops_values: list[Select[tuple[int, float | None, float | None, int]]] = [
-            select(
-                literal(transaction.unit_id).label("unit_id"),
-                literal(getattr(transaction, "quantity_delta", None)).label("quantity_delta"),
-                literal(getattr(transaction, "discount_price", None)).label("discount_price"),
-                literal(i).label(
-                    "row_num"
-                ),  # поле для order_by, что бы сохранился порядок от пользователя
-            )
-            for i, transaction in enumerate(data.transactions)
-        ]
-
-        unit_ops_cte = union_all(*ops_values).cte("unit_ops")
+        # Создаем виртуальную таблицу unit_ops_cte
+        unit_ops_cte = self._unit_ops_cte(
+            data.transactions, "unit_id", "quantity_delta", "discount_price"
+        )
 
         # обновляем поля, используем математические вычисления
         updated_unit_values = dict(
             quantity=UnitORM.quantity + unit_ops_cte.c.quantity_delta,
             # Прибавлять количество товара при возврате отвара
+            # счетчики продаж уменьшаются на возврат, last_sold_at не меняется
+            total_sold=UnitORM.total_sold - unit_ops_cte.c.quantity_delta,
+            total_revenue=UnitORM.total_revenue
+            - unit_ops_cte.c.quantity_delta * unit_ops_cte.c.discount_price,
         )
         edit_unit_cte = self._updated_unit_cte(
-            UnitORM.id == unit_ops_cte.c.unit_id, **updated_unit_values
+            UnitORM.id == unit_ops_cte.c.unit_id,
+            UnitORM.store_id == data.store_id,  # товар обновится только в своем магазине
+            **updated_unit_values,
         )
 
         # создаем action, нужен его id в дальнейшем
@@ -285,16 +453,23 @@ class ActionsTransactionsRepository(BaseRepository[ActionTransactionOrm, ActionT
             discount_price=unit_ops_cte.c.discount_price,  # Реальная цена продажи для возврата
             action=add_action_cte.c.title,
             unit_id=edit_unit_cte.c.id,
-            user_id=user_id,
+            user_id=literal(user_id),
             action_id=add_action_cte.c.id,
             store_id=edit_unit_cte.c.store_id,
         )
 
+        # Прибавки к дневным итогам товара
+        daily_stats_values = dict(
+            returned_quantity=unit_ops_cte.c.quantity_delta,
+            returned_revenue=unit_ops_cte.c.quantity_delta * unit_ops_cte.c.discount_price,
+            returned_cost=unit_ops_cte.c.quantity_delta * edit_unit_cte.c.average_cost_price,
+        )
+
         return await self._add_action_transactions(
-            unit_ops_cte, edit_unit_cte, add_action_cte, select_values_map
+            unit_ops_cte, edit_unit_cte, add_action_cte, select_values_map, daily_stats_values
         )
 
-    async def write_off(self, user_id: int, data: AddActionDTO) -> ActionIdDTO:
+    async def write_off(self, user_id: int, data: AddActionDTO) -> AddActionResultDTO:
         """
         1. Выполнить unit_ops_cte → сформировать виртуальную таблицу из data, согласно логики действия(write_off)
         2. Выполнить updated_unit_cte → обновить товары, согласно логики действия(write_off) и вернуть новые значения
@@ -304,18 +479,8 @@ class ActionsTransactionsRepository(BaseRepository[ActionTransactionOrm, ActionT
         Raises:
             Exception
         """
-        # Создаем поля для виртуальной таблицы unit_ops_cte
-        ops_values: list[Select[tuple[int, float | None, int]]] = [
-            select(
-                literal(transaction.unit_id).label("unit_id"),
-                literal(getattr(transaction, "quantity_delta", None)).label("quantity_delta"),
-                literal(i).label(
-                    "row_num"
-                ),  # поле для order_by, что бы сохранился порядок от пользователя
-            )
-            for i, transaction in enumerate(data.transactions)
-        ]
-        unit_ops_cte = union_all(*ops_values).cte("unit_ops")
+        # Создаем виртуальную таблицу unit_ops_cte
+        unit_ops_cte = self._unit_ops_cte(data.transactions, "unit_id", "quantity_delta")
 
         # обновляем поля, используем математические вычисления
         updated_unit_values = dict(
@@ -323,7 +488,11 @@ class ActionsTransactionsRepository(BaseRepository[ActionTransactionOrm, ActionT
             - unit_ops_cte.c.quantity_delta,  # отнимает количество товара.
         )
         edit_unit_cte = self._updated_unit_cte(
-            UnitORM.id == unit_ops_cte.c.unit_id, **updated_unit_values
+            UnitORM.id == unit_ops_cte.c.unit_id,
+            UnitORM.store_id == data.store_id,  # товар обновится только в своем магазине
+            # обновится только если товара хватает, перепроверяется после блокировки строки
+            UnitORM.quantity >= unit_ops_cte.c.quantity_delta,
+            **updated_unit_values,
         )
 
         # создаем action, нужен его id в дальнейшем
@@ -338,16 +507,22 @@ class ActionsTransactionsRepository(BaseRepository[ActionTransactionOrm, ActionT
             discount_price=None,
             action=add_action_cte.c.title,
             unit_id=edit_unit_cte.c.id,
-            user_id=user_id,
+            user_id=literal(user_id),
             action_id=add_action_cte.c.id,
             store_id=edit_unit_cte.c.store_id,
         )
 
+        # Прибавки к дневным итогам товара
+        daily_stats_values = dict(
+            written_off_quantity=unit_ops_cte.c.quantity_delta,
+            written_off_cost=unit_ops_cte.c.quantity_delta * edit_unit_cte.c.average_cost_price,
+        )
+
         return await self._add_action_transactions(
-            unit_ops_cte, edit_unit_cte, add_action_cte, select_values_map
+            unit_ops_cte, edit_unit_cte, add_action_cte, select_values_map, daily_stats_values
         )
 
-    async def new_price(self, user_id: int, data: AddActionDTO) -> ActionIdDTO:
+    async def new_price(self, user_id: int, data: AddActionDTO) -> AddActionResultDTO:
         """
         1. Выполнить unit_ops_cte → сформировать виртуальную таблицу из data, согласно логики действия(new_price)
         2. Выполнить updated_unit_cte → обновить товары, согласно логики действия(new_price) и вернуть новые значения
@@ -357,16 +532,8 @@ class ActionsTransactionsRepository(BaseRepository[ActionTransactionOrm, ActionT
         Raises:
             Exception
         """
-        # Создаем поля для виртуальной таблицы unit_ops_cte
-        ops_values: list[Select[tuple[int, float | None, int]]] = [
-            select(
-                literal(transaction.unit_id).label("unit_id"),
-                literal(getattr(transaction, "retail_price", None)).label("retail_price"),
-                literal(i).label("row_num"),
-            )
-            for i, transaction in enumerate(data.transactions)
-        ]
-        unit_ops_cte = union_all(*ops_values).cte("unit_ops")
+        # Создаем виртуальную таблицу unit_ops_cte
+        unit_ops_cte = self._unit_ops_cte(data.transactions, "unit_id", "retail_price")
 
         # запрос к unit до изменения
         unit_cte = (
@@ -380,7 +547,9 @@ class ActionsTransactionsRepository(BaseRepository[ActionTransactionOrm, ActionT
             retail_price=unit_ops_cte.c.retail_price,  # Выставляет новую цену
         )
         edit_unit_cte = self._updated_unit_cte(
-            UnitORM.id == unit_ops_cte.c.unit_id, **updated_unit_values
+            UnitORM.id == unit_ops_cte.c.unit_id,
+            UnitORM.store_id == data.store_id,  # товар обновится только в своем магазине
+            **updated_unit_values,
         )
 
         # создаем action, нужен его id в дальнейшем
@@ -395,7 +564,7 @@ class ActionsTransactionsRepository(BaseRepository[ActionTransactionOrm, ActionT
             discount_price=None,
             action=add_action_cte.c.title,
             unit_id=edit_unit_cte.c.id,
-            user_id=user_id,
+            user_id=literal(user_id),
             action_id=add_action_cte.c.id,
             store_id=edit_unit_cte.c.store_id,
         )
@@ -404,7 +573,7 @@ class ActionsTransactionsRepository(BaseRepository[ActionTransactionOrm, ActionT
             unit_ops_cte, edit_unit_cte, add_action_cte, select_values_map
         )
 
-    async def stock_return(self, user_id: int, data: AddActionDTO) -> ActionIdDTO:
+    async def stock_return(self, user_id: int, data: AddActionDTO) -> AddActionResultDTO:
         """
         1. Выполнить unit_ops_cte → сформировать виртуальную таблицу из data, согласно логики действия(stock_return)
         2. Выполнить updated_unit_cte → обновить товары, согласно логики действия(stock_return) и вернуть новые значения
@@ -414,18 +583,10 @@ class ActionsTransactionsRepository(BaseRepository[ActionTransactionOrm, ActionT
         Raises:
             Exception
         """
-        # Создаем поля для виртуальной таблицы unit_ops_cte
-        ops_values: list[Select[tuple[int, float | None, float | None, int]]] = [
-            select(
-                literal(transaction.unit_id).label("unit_id"),
-                literal(getattr(transaction, "quantity_delta", None)).label("quantity_delta"),
-                literal(getattr(transaction, "cost_price", None)).label("cost_price"),
-                literal(i).label("row_num"),
-            )
-            for i, transaction in enumerate(data.transactions)
-        ]
-
-        unit_ops_cte = union_all(*ops_values).cte("unit_ops")
+        # Создаем виртуальную таблицу unit_ops_cte
+        unit_ops_cte = self._unit_ops_cte(
+            data.transactions, "unit_id", "quantity_delta", "cost_price"
+        )
 
         # обновляем поля, используем математические вычисления
         updated_unit_values = dict(
@@ -433,7 +594,11 @@ class ActionsTransactionsRepository(BaseRepository[ActionTransactionOrm, ActionT
             - unit_ops_cte.c.quantity_delta,  # Отнимаем из запаса количество товара.
         )
         edit_unit_cte = self._updated_unit_cte(
-            UnitORM.id == unit_ops_cte.c.unit_id, **updated_unit_values
+            UnitORM.id == unit_ops_cte.c.unit_id,
+            UnitORM.store_id == data.store_id,  # товар обновится только в своем магазине
+            # обновится только если товара хватает, перепроверяется после блокировки строки
+            UnitORM.quantity >= unit_ops_cte.c.quantity_delta,
+            **updated_unit_values,
         )
 
         # создаем action, нужен его id в дальнейшем
@@ -449,7 +614,7 @@ class ActionsTransactionsRepository(BaseRepository[ActionTransactionOrm, ActionT
             discount_price=None,
             action=add_action_cte.c.title,
             unit_id=edit_unit_cte.c.id,
-            user_id=user_id,
+            user_id=literal(user_id),
             action_id=add_action_cte.c.id,
             store_id=edit_unit_cte.c.store_id,
         )
@@ -458,6 +623,27 @@ class ActionsTransactionsRepository(BaseRepository[ActionTransactionOrm, ActionT
             unit_ops_cte, edit_unit_cte, add_action_cte, select_values_map
         )
 
+    def _unit_ops_cte(self, transactions: Sequence[TransactionUnion], *columns: str) -> CTE:
+        """
+        Создает виртуальную таблицу unit_ops из data: unnest(массивы) WITH ORDINALITY.
+
+        Каждая колонка передается одним типизированным массивом-параметром, поэтому текст запроса
+        не зависит от количества транзакций и их значений: кэш компиляции SQLAlchemy и
+        prepared statement asyncpg переиспользуются для любого размера корзины.
+        row_num - поле для order_by, что бы сохранился порядок от пользователя.
+        """
+        arrays = [
+            bindparam(
+                f"unit_ops_{column}",
+                [getattr(transaction, column, None) for transaction in transactions],
+                type_=ARRAY(UNIT_OPS_COLUMNS_TYPES[column]),
+            )
+            for column in columns
+        ]
+        return select(
+            func.unnest(*arrays).table_valued(*columns, with_ordinality="row_num").render_derived()
+        ).cte("unit_ops")
+
     def _create_select_values(
         self,
         quantity_delta: Any,
@@ -495,7 +681,19 @@ class ActionsTransactionsRepository(BaseRepository[ActionTransactionOrm, ActionT
         edit_unit_cte: CTE,
         add_action_cte: CTE,
         select_values_map: dict[str, Any],
-    ) -> ActionIdDTO:
+        daily_stats_values: dict[str, ColumnElement[Any]] | None = None,
+        created_at: datetime | None = None,
+    ) -> AddActionResultDTO:
+        """
+        Вставляет транзакции и возвращает id действия с результатом проверки товаров.
+        Товары, не прошедшие проверку в updated_unit, не обновляются и не попадают в транзакции,
+        сервис должен откатить такое действие.
+        daily_stats_values - прибавки к полям unit_daily_stats, итоги дня обновляются тем же запросом.
+        created_at - время действия, если оно не now(): от него считается день итогов.
+        Счетчик действий магазина (actions_counters) прибавляется тем же запросом.
+        :raise ForeignKeyNotFoundException: Если магазин действия не существует.
+        :raise ObjectAlreadyExistsException: Если продажа из очереди уже записана (queue_id, created_at).
+        """
         insert_columns = list(select_values_map.keys())
 
         select_values = [select_values_map[column] for column in insert_columns]
@@ -516,30 +714,107 @@ class ActionsTransactionsRepository(BaseRepository[ActionTransactionOrm, ActionT
             .cte("add_action_transactions")
         )
 
+        # Результат проверки каждого товара из data: существует ли, в каком магазине, обновлен ли.
+        # Основной запрос видит units до обновления, поэтому store_id берется из снимка.
         create_action = (
-            select(add_action_cte.c.id, add_action_cte.c.title).add_cte(
-                add_action_transactions
-            )  # регистрируем зависимость
+            select(
+                add_action_cte.c.id.label("action_id"),
+                unit_ops_cte.c.unit_id,
+                UnitORM.store_id,
+                edit_unit_cte.c.id.is_not(None).label("is_applied"),
+            )
+            .select_from(
+                unit_ops_cte.outerjoin(UnitORM, UnitORM.id == unit_ops_cte.c.unit_id)
+                .outerjoin(edit_unit_cte, edit_unit_cte.c.id == unit_ops_cte.c.unit_id)
+                .join(add_action_cte, literal(True))
+            )
+            .order_by(unit_ops_cte.c.row_num)
+            .add_cte(add_action_transactions)  # регистрируем зависимость
+            .add_cte(ActionsCountersRepository.increment_cte(add_action_cte))
         )
-        logger.debug(sql_debag(create_action))
+        if daily_stats_values:
+            create_action = create_action.add_cte(
+                self._upsert_daily_stats_cte(
+                    unit_ops_cte, edit_unit_cte, daily_stats_values, created_at=created_at
+                )
+            )
+        if logger.isEnabledFor(logging.DEBUG):  # literal_binds компилирует запрос заново
+            logger.debug(sql_debag(create_action))
         try:
             result = await self.session.execute(create_action)
-            action_id = result.scalar_one()
-            return ActionIdDTO(id=action_id)
-        except:
-            raise
+        except IntegrityError as exc:
+            is_raise(exc, ForeignKeyViolationError, ForeignKeyNotFoundException)
+            is_raise(exc, UniqueViolationError, ObjectAlreadyExistsException)
+            raise exc
 
-    def _insert_action_cte(self, title: ActionEnum, store_id: int) -> CTE:
+        rows = result.mappings().all()
+        return AddActionResultDTO(
+            id=rows[0]["action_id"],
+            units=[ActionUnitCheckDTO.model_validate(row) for row in rows],
+        )
+
+    def _upsert_daily_stats_cte(
+        self,
+        unit_ops_cte: CTE,
+        edit_unit_cte: CTE,
+        daily_stats_values: dict[str, ColumnElement[Any]],
+        created_at: datetime | None = None,
+    ) -> CTE:
         """
-        Добавляет action в базу
+        Прибавляет значения к итогам товара за день (UTC), строка дня создается при первой
+        транзакции. День берется из created_at или now() - того же времени, что и created_at
+        транзакций.
         """
-        return (
-            insert(ActionOrm)
-            .values(title=title, store_id=store_id)
-            .returning(ActionOrm.id, ActionOrm.title)
-            .cte("add_action")
+        stats_columns = list(daily_stats_values.keys())
+        day = (
+            cast(func.timezone("UTC", func.now()), Date)
+            if created_at is None
+            else literal(created_at.astimezone(timezone.utc).date(), Date)
+        )
+        stats_query = select(
+            edit_unit_cte.c.store_id,
+            edit_unit_cte.c.id,
+            day,
+            *(daily_stats_values[column] for column in stats_columns),
+        ).select_from(
+            edit_unit_cte.join(unit_ops_cte, edit_unit_cte.c.id == unit_ops_cte.c.unit_id)
         )
 
+        upsert = pg_insert(UnitDailyStatsORM).from_select(
+            names=["store_id", "unit_id", "day", *stats_columns], select=stats_query
+        )
+        return upsert.on_conflict_do_update(
+            index_elements=[UnitDailyStatsORM.unit_id, UnitDailyStatsORM.day],
+            set_={
+                column: getattr(UnitDailyStatsORM, column) + getattr(upsert.excluded, column)
+                for column in stats_columns
+            },
+        ).cte("upsert_unit_daily_stats")
+
+    def _insert_action_cte(
+        self,
+        title: ActionEnum,
+        store_id: int,
+        queue_id: str | None = None,
+        created_at: datetime | None = None,
+    ) -> CTE:
+        """
+        Добавляет action в базу, created_at возвращается только если передан
+        """
+        values: dict[str, Any] = dict(title=title, store_id=store_id)
+        returning: list[InstrumentedAttribute[Any]] = [
+            ActionOrm.id,
+            ActionOrm.title,
+            ActionOrm.store_id,
+        ]
+        # без queue_id и created_at текст запроса остается прежним
+        if queue_id is not None:
+            values["queue_id"] = queue_id
+        if created_at is not None:
+            values["created_at"] = created_at
+            returning.append(ActionOrm.created_at)
+        return insert(ActionOrm).values(**values).returning(*returning).cte("add_action")
+
     def _updated_unit_cte(self, *filter_: ColumnElement[Any], **values: ColumnElement[Any]) -> CTE:
         """
         Обновляет переданные поля у товара
@@ -573,19 +848,389 @@ class ActionsTransactionsRepository(BaseRepository[ActionTransactionOrm, ActionT
             .cte("updated_unit")
         )
 
+    async def stream_transactions_for_export(
+        self,
+        store_id: int | None,
+        created_from: datetime | None,
+        created_to: datetime | None,
+        batch_size: int,
+    ) -> AsyncIterator[Sequence[Row[Any]]]:
+        """
+        Читает транзакции с названиями товаров и магазинов серверным курсором, пачками по batch_size:
+        в памяти одновременно только одна пачка.
+        Колонки строк в порядке полей ActionTransactionExportDTO.
+        created_from, created_to - диапазон created_at (включительно), отсекает лишние партиции.
+        """
+        tx = self.model
+        columns: dict[str, ColumnElement[Any] | InstrumentedAttribute[Any]] = dict(
+            id=tx.id,
+            action_id=tx.action_id,
+            action=cast(tx.action, String),
+            created_at=tx.created_at,
+            store_id=tx.store_id,
+            store_title=StoreORM.title,
+            unit_id=tx.unit_id,
+            unit_title=UnitORM.title,
+            user_id=tx.user_id,
+            quantity_delta=tx.quantity_delta,
+            cost_price=tx.cost_price,
+            retail_price=tx.retail_price,
+            previous_retail_price=tx.previous_retail_price,
+            discount_price=tx.discount_price,
+        )
+        filters: list[ColumnElement[bool]] = []
+        if store_id:
+            filters.append(tx.store_id == store_id)
+        if created_from:
+            filters.append(tx.created_at >= created_from)
+        if created_to:
+            filters.append(tx.created_at <= created_to)
+        query = (
+            select(*(columns[field] for field in ActionTransactionExportDTO.model_fields))
+            .join(UnitORM, UnitORM.id == tx.unit_id)
+            .join(StoreORM, StoreORM.id == tx.store_id)
+            .filter(*filters)
+            .order_by(tx.created_at, tx.id)
+            .execution_options(yield_per=batch_size)
+        )
+
+        result = await self.session.stream(query)
+        async for rows in result.partitions():
+            yield rows
+
     async def get_transactions_with_units(
-        self, action_id: int
+        self,
+        action_id: int,
+        created_at: datetime | None = None,
+        created_from: datetime | None = None,
+        created_to: datetime | None = None,
     ) -> list[ActionTransactionWithUnitDTO]:
         """
         Получает все транзакции со связанными товарами.
+        created_at - время создания действия, совпадает с транзакциями: читается одна партиция.
+        created_from, created_to - диапазон created_at (включительно), отсекает лишние партиции.
         """
+        filters: list[ColumnElement[bool]] = []
+        if created_at:
+            filters.append(self.model.created_at == created_at)
+        if created_from:
+            filters.append(self.model.created_at >= created_from)
+        if created_to:
+            filters.append(self.model.created_at <= created_to)
         query = (
             select(self.model)
             .select_from(self.model)
             .filter_by(action_id=action_id)
+            .filter(*filters)
             .options(joinedload(self.model.unit).joinedload(UnitORM.main_image))
         )
 
         result = await self.session.execute(query)
         models = result.scalars().all()
         return [ActionsTransactionsWithUnitDataMapper.to_domain(model) for model in models]
+
+    async def get_transactions_unit_ids(self, action_id: int, created_at: datetime) -> list[int]:
+        """Товары транзакций действия, created_at - время создания действия"""
+        query = select(self.model.unit_id).filter_by(action_id=action_id, created_at=created_at)
+        result = await self.session.execute(query)
+        return list(result.scalars().all())
+
+    async def get_unit_transactions(
+        self,
+        unit_id: int,
+        limit: int,
+        cursor: UnitTransactionsCursorDTO | None = None,
+        action: ActionEnum | None = None,
+        created_from: datetime | None = None,
+        created_to: datetime | None = None,
+    ) -> list[UnitTransactionDTO]:
+        """
+        Транзакции товара от новых к старым по (created_at, id).
+        Читаются только из индекса ix_actions_transactions_unit_id_created_at_id (index only scan),
+        cursor - последняя транзакция предыдущей страницы.
+        """
+        filters = self._unit_transactions_filters(unit_id, created_from, created_to)
+        if action:
+            filters.append(self.model.action == action)
+        if cursor:
+            filters.append(
+                tuple_(self.model.created_at, self.model.id) < (cursor.created_at, cursor.id)
+            )
+        query = (
+            select(
+                self.model.id,
+                self.model.quantity_delta,
+                self.model.cost_price,
+                self.model.retail_price,
+                self.model.discount_price,
+                self.model.action,
+                self.model.created_at,
+                self.model.action_id,
+            )
+            .filter(*filters)
+            .order_by(self.model.created_at.desc(), self.model.id.desc())
+            .limit(limit)
+        )
+        result = await self.session.execute(query)
+        return [UnitTransactionDTO.model_validate(row) for row in result.mappings().all()]
+
+    async def get_unit_transactions_summary(
+        self,
+        unit_id: int,
+        action: ActionEnum | None = None,
+        created_from: datetime | None = None,
+        created_to: datetime | None = None,
+    ) -> UnitTransactionsSummaryDTO:
+        """
+        Итоги транзакций товара одним проходом по индексу товара.
+        action учитывается только в transactions_count, итоги продаж и возвратов считаются всегда.
+        """
+        sold_filter = self.model.action == ActionEnum.sales
+        returned_filter = self.model.action == ActionEnum.salesReturn
+        count = func.count()
+        if action:
+            count = count.filter(self.model.action == action)
+        query = select(
+            count.label("transactions_count"),
+            func.coalesce(func.sum(self.model.quantity_delta).filter(sold_filter), 0).label(
+                "total_sold"
+            ),
+            func.coalesce(func.sum(self.model.quantity_delta).filter(returned_filter), 0).label(
+                "total_returned"
+            ),
+            func.max(self.model.created_at).filter(sold_filter).label("last_sold_at"),
+        ).filter(*self._unit_transactions_filters(unit_id, created_from, created_to))
+        result = await self.session.execute(query)
+        return UnitTransactionsSummaryDTO.model_validate(result.mappings().one())
+
+    def _unit_transactions_filters(
+        self, unit_id: int, created_from: datetime | None, created_to: datetime | None
+    ) -> list[ColumnElement[bool]]:
+        filters: list[ColumnElement[bool]] = [self.model.unit_id == unit_id]
+        if created_from:
+            filters.append(self.model.created_at >= created_from)
+        if created_to:
+            filters.append(self.model.created_at <= created_to)
+        return filters
+
+
+class UnitDailyStatsRepository(BaseRepository[UnitDailyStatsORM, UnitDailyStatsDTO]):
+    model = UnitDailyStatsORM
+    mapper = UnitDailyStatsDataMapper
+
+    async def get_transactions_days_range(self) -> tuple[date, date] | None:
+        """
+        :return: первый и последний день (UTC) транзакций, None если транзакций нет
+        """
+        day = cast(func.timezone("UTC", ActionTransactionOrm.created_at), Date)
+        result = await self.session.execute(select(func.min(day), func.max(day)))
+        first_day, last_day = result.one()
+        if first_day is None:
+            return None
+        return first_day, last_day
+
+    async def rebuild(self, day_from: date, day_to: date) -> int:
+        """
+        Пересобирает итоги дней [day_from, day_to) из actions_transactions: удаляет и вставляет заново.
+        Диапазон created_at отсекает лишние партиции транзакций.
+        Если диапазон включает текущий день, таблица блокируется от записи до commit, иначе
+        действия, выполненные во время пересборки, могут потеряться.
+        :return: количество вставленных строк
+        """
+        if day_to > get_utc_now().date():
+            await self.session.execute(
+                text(f"LOCK TABLE {self.model.__tablename__} IN SHARE ROW EXCLUSIVE MODE")
+            )
+        await self.session.execute(
+            delete(self.model).filter(self.model.day >= day_from, self.model.day < day_to)
+        )
+
+        tx = ActionTransactionOrm
+
+        def total(
+            value: ColumnElement[Any] | InstrumentedAttribute[Any], action: ActionEnum
+        ) -> ColumnElement[Any]:
+            return func.coalesce(func.sum(value).filter(tx.action == action), 0)
+
+        stats_values: dict[str, ColumnElement[Any]] = dict(
+            sold_quantity=total(tx.quantity_delta, ActionEnum.sales),
+            revenue=total(tx.quantity_delta * tx.discount_price, ActionEnum.sales),
+            retail_revenue=total(tx.quantity_delta * tx.retail_price, ActionEnum.sales),
+            cogs=total(tx.quantity_delta * tx.cost_price, ActionEnum.sales),
+            returned_quantity=total(tx.quantity_delta, ActionEnum.salesReturn),
+            returned_revenue=total(tx.quantity_delta * tx.discount_price, ActionEnum.salesReturn),
+            returned_cost=total(tx.quantity_delta * tx.cost_price, ActionEnum.salesReturn),
+            written_off_quantity=total(tx.quantity_delta, ActionEnum.writeOff),
+            written_off_cost=total(tx.quantity_delta * tx.cost_price, ActionEnum.writeOff),
+        )
+        day = cast(func.timezone("UTC", tx.created_at), Date)
+        stats_query = (
+            select(tx.store_id, tx.unit_id, day, *stats_values.values())
+            .filter(
+                tx.created_at >= datetime.combine(day_from, time(), tzinfo=timezone.utc),
+                tx.created_at < datetime.combine(day_to, time(), tzinfo=timezone.utc),
+                tx.action.in_((ActionEnum.sales, ActionEnum.salesReturn, ActionEnum.writeOff)),
+            )
+            .group_by(tx.store_id, tx.unit_id, day)
+        )
+        result = await self.session.execute(
+            insert(self.model).from_select(
+                names=["store_id", "unit_id", "day", *stats_values.keys()], select=stats_query
+            )
+        )
+        return result.rowcount  # type: ignore reportAttributeAccessIssue
+
+    async def get_sales_analytics(
+        self,
+        store_id: int,
+        bucket: AnalyticsBucket,
+        day_from: date,
+        day_to: date,
+        by_unit: bool = False,
+    ) -> list[SalesAnalyticsRowDTO]:
+        """
+        Итоги магазина по периодам bucket за дни [day_from, day_to], при by_unit - по товарам.
+        Читает дневные итоги по индексу (store_id, day): год магазина - сотни строк на товар
+        вместо всех транзакций. Нарастающие итоги считаются оконными функциями.
+        """
+        stats = self.model
+        bucket_column = cast(func.date_trunc(bucket.value, cast(stats.day, DateTime)), Date)
+        group_columns: list[ColumnElement[Any] | InstrumentedAttribute[Any]] = [
+            bucket_column.label("bucket")
+        ]
+        if by_unit:
+            group_columns.append(stats.unit_id)
+
+        totals = (
+            select(
+                *group_columns,
+                func.sum(stats.sold_quantity).label("sold_quantity"),
+                func.sum(stats.returned_quantity).label("returned_quantity"),
+                func.sum(stats.revenue - stats.returned_revenue).label("revenue"),
+                func.sum(stats.returned_revenue).label("returns"),
+                func.sum(stats.cogs - stats.returned_cost).label("cogs"),
+                func.sum(stats.retail_revenue).label("retail_revenue"),
+                func.sum(stats.retail_revenue - stats.revenue).label("discount"),
+                func.sum(stats.written_off_cost).label("written_off_cost"),
+            )
+            .filter(stats.store_id == store_id, stats.day.between(day_from, day_to))
+            .group_by(*group_columns)
+            .subquery("totals")
+        )
+
+        partition_by = [totals.c.unit_id] if by_unit else None
+        gross_margin = totals.c.revenue - totals.c.cogs
+        query = select(
+            *totals.c,
+            gross_margin.label("gross_margin"),
+            totals.c.discount.op("/")(func.nullif(totals.c.retail_revenue, 0)).label(
+                "discount_depth"
+            ),
+            func.sum(totals.c.revenue)
+            .over(partition_by=partition_by, order_by=totals.c.bucket)
+            .label("cumulative_revenue"),
+            func.sum(gross_margin)
+            .over(partition_by=partition_by, order_by=totals.c.bucket)
+            .label("cumulative_gross_margin"),
+        ).order_by(totals.c.bucket, *([totals.c.unit_id] if by_unit else []))
+
+        result = await self.session.execute(query)
+        return [SalesAnalyticsRowDTO.model_validate(row) for row in result.mappings().all()]
+
+
+class ActionsCountersRepository(BaseRepository[ActionsCounterORM, ActionsCounterDTO]):
+    model = ActionsCounterORM
+    mapper = ActionsCounterDataMapper
+
+    @classmethod
+    def increment_cte(cls, add_action_cte: CTE) -> CTE:
+        """
+        Прибавляет 1 к счетчику магазина и типа действия из add_action_cte,
+        выполняется в запросе, который вставляет действие.
+        :param add_action_cte: INSERT INTO actions ... RETURNING id, title, store_id
+        """
+        increment = pg_insert(cls.model).from_select(
+            names=["store_id", "title", "slot", "total"],
+            select=select(
+                add_action_cte.c.store_id,
+                add_action_cte.c.title,
+                add_action_cte.c.id % ACTIONS_COUNTERS_SLOTS,
+                literal(1),
+            ),
+        )
+        return increment.on_conflict_do_update(
+            index_elements=[cls.model.store_id, cls.model.title, cls.model.slot],
+            set_={"total": cls.model.total + increment.excluded.total},
+        ).cte("increment_actions_counter")
+
+    async def get_actions_total(self, store_id: int | None, title: ActionEnum | None) -> int:
+        """
+        :return: количество действий с учетом фильтров списка действий
+        """
+        filters: list[ColumnElement[bool]] = []
+        if store_id:
+            filters.append(self.model.store_id == store_id)
+        if title:
+            filters.append(self.model.title == title)
+        result = await self.session.execute(
+            select(func.coalesce(func.sum(self.model.total), 0)).filter(*filters)
+        )
+        return int(result.scalar_one())
+
+    async def get_store_ids(self) -> list[int]:
+        result = await self.session.execute(select(StoreORM.id).order_by(StoreORM.id))
+        return list(result.scalars().all())
+
+    async def reconcile(self, store_id: int) -> dict[ActionEnum, int]:
+        """
+        Сверяет счетчики магазина с actions, расхождение записывается поправкой
+        в ACTIONS_COUNTERS_RECONCILE_SLOT.
+        Блокируется только строка магазина: FOR UPDATE конфликтует с FOR KEY SHARE, который берут
+        внешние ключи при вставке действия и счетчика, поэтому до commit ждут только действия
+        этого магазина, а начатые раньше успевают закоммитить до подсчета.
+        Вставка, которая ждет магазин, уже держит свою строку счетчика, поэтому строки slot
+        действий не изменяются: поправка в отдельном slot не ждет их и не дает deadlock.
+        :return: {тип действия: расхождение счетчика} для неверных счетчиков
+        """
+        await self.session.execute(
+            select(StoreORM.id).filter(StoreORM.id == store_id).with_for_update()
+        )
+        counters_result = await self.session.execute(
+            select(self.model.title, func.sum(self.model.total))
+            .filter(self.model.store_id == store_id)
+            .group_by(self.model.title)
+        )
+        counters: dict[ActionEnum, int] = {
+            title: int(total) for title, total in counters_result.tuples().all()
+        }
+        actions_result = await self.session.execute(
+            select(ActionOrm.title, func.count())
+            .filter(ActionOrm.store_id == store_id)
+            .group_by(ActionOrm.title)
+        )
+        totals: dict[ActionEnum, int] = dict(actions_result.tuples().all())
+
+        drifts = {
+            title: counters.get(title, 0) - totals.get(title, 0)
+            for title in counters.keys() | totals.keys()
+            if counters.get(title, 0) != totals.get(title, 0)
+        }
+        if drifts:
+            correction = pg_insert(self.model).values(
+                [
+                    dict(
+                        store_id=store_id,
+                        title=title,
+                        slot=ACTIONS_COUNTERS_RECONCILE_SLOT,
+                        total=-drift,
+                    )
+                    for title, drift in drifts.items()
+                ]
+            )
+            await self.session.execute(
+                correction.on_conflict_do_update(
+                    index_elements=[self.model.store_id, self.model.title, self.model.slot],
+                    set_={"total": self.model.total + correction.excluded.total},
+                )
+            )
+        return drifts
@@ -125,6 +125,7 @@ class BaseRepository(Generic[ModelType, SchemaType]):
     ) -> SchemaType:
         """
         :raise ForeignKeyNotFoundException: Если не найден внешний ключ при создании строки.
+        :raise ObjectAlreadyExistsException: Если нарушена уникальность.
         :raise ObjectNotFoundException: Если ни одного не найдено.
         :raise ObjectNotUniqueException: Если больше одного найдено
         """
@@ -140,6 +141,7 @@ class BaseRepository(Generic[ModelType, SchemaType]):
             return self.mapper.to_domain(model)
         except IntegrityError as exc:
             is_raise(exc, ForeignKeyViolationError, ForeignKeyNotFoundException)
+            is_raise(exc, UniqueViolationError, ObjectAlreadyExistsException)
             raise exc
         except NoResultFound as exc:
             raise ObjectNotFoundException from exc
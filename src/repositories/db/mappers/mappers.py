@@ -1,4 +1,9 @@
-from src.models.actions import ActionTransactionOrm, ActionOrm
+from src.models.actions import (
+    ActionTransactionOrm,
+    ActionOrm,
+    UnitDailyStatsORM,
+    ActionsCounterORM,
+)
 from src.models.notifications import NotificationORM
 from src.models.units import UnitORM, StoreORM, UnitImageORM
 from src.models.users import UserORM, SessionORM, RoleUserInStoreORM
@@ -8,6 +13,8 @@ from src.schemas.actions import (
     ActionWithUnitsTransactionsDTO,
     ActionDTO,
     ActionTransactionWithUnitDTO,
+    UnitDailyStatsDTO,
+    ActionsCounterDTO,
 )
 from src.schemas.stores import StoreDTO, RoleUserInStoreDTO, StoreWithRoleUsersDTO
 from src.schemas.units import UnitDTO, UnitWithFieldsDTO, UnitWithMainImageDTO
@@ -69,6 +76,16 @@ class ActionsTransactionsWithUnitDataMapper(
     schema = ActionTransactionWithUnitDTO
 
 
+class UnitDailyStatsDataMapper(DataMapper[UnitDailyStatsORM, UnitDailyStatsDTO]):
+    model = UnitDailyStatsORM
+    schema = UnitDailyStatsDTO
+
+
+class ActionsCounterDataMapper(DataMapper[ActionsCounterORM, ActionsCounterDTO]):
+    model = ActionsCounterORM
+    schema = ActionsCounterDTO
+
+
 class UnitWithActionsDataMapper(DataMapper[UnitORM, UnitWithFieldsDTO]):
     model = UnitORM
     schema = UnitWithFieldsDTO
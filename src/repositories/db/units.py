@@ -1,18 +1,90 @@
-from sqlalchemy import select, func, or_, desc, ColumnElement
-from sqlalchemy.exc import NoResultFound, MultipleResultsFound
+import re
+from typing import Any
+
+from asyncpg import (  # type: ignore reportMissingTypeStubs
+    DataError,
+    BadCopyFileFormatError,
+    ForeignKeyViolationError,
+    UniqueViolationError,
+)
+from sqlalchemy import (
+    select,
+    func,
+    or_,
+    desc,
+    ColumnElement,
+    table,
+    column,
+    text,
+    case,
+    cast,
+    insert,
+    literal,
+    Float,
+    Integer,
+    String,
+    update,
+    literal_column,
+    tuple_,
+    Select,
+    JSON,
+    null,
+    values,
+    Boolean,
+)
+from sqlalchemy.exc import IntegrityError, NoResultFound, MultipleResultsFound
 from sqlalchemy.orm import selectinload, joinedload
 
-from src.exceptions.base import ObjectNotUniqueException
-from src.exceptions.not_found import ObjectNotFoundException
-from src.models.units import UnitORM
+from src.exceptions.base import (
+    ObjectNotUniqueException,
+    UnitsImportFileException,
+    ObjectAlreadyExistsException,
+)
+from src.exceptions.not_found import ObjectNotFoundException, ForeignKeyNotFoundException
+from src.models.actions import ActionOrm, ActionTransactionOrm, ActionEnum
+from src.models.units import UnitORM, UnitOfMeasurementEnum, UnitImageORM
+from src.repositories.db.actions import ActionsCountersRepository
 from src.repositories.db.base import BaseRepository
 from src.repositories.db.mappers.mappers import (
     UnitsDataMapper,
     UnitWithActionsDataMapper,
     UnitWithMainImageDataMapper,
 )
-from src.schemas.types import SortUnitBy, SortOrder, UnitField
-from src.schemas.units import UnitDTO, UnitWithFieldsDTO, EditUnitDTO, UnitWithMainImageDTO
+from src.schemas.types import SortUnitBy, SortOrder, UnitField, UnitSearchMode, UnitSparseField
+from src.schemas.units import (
+    UnitDTO,
+    UnitWithFieldsDTO,
+    EditUnitDTO,
+    UnitWithMainImageDTO,
+    UnitsImportErrorDTO,
+    UnitsCursorDTO,
+    UnitPartialDTO,
+    UnitWithFieldsPartialDTO,
+    EditUnitBulkItemDTO,
+    UnitTitleDTO,
+)
+from src.utils.exceptions import is_raise
+from src.utils.files import BytesReader
+
+# Колонки CSV импорта товаров в порядке файла
+UNITS_IMPORT_COLUMNS = (
+    "title",
+    "description",
+    "measurement",
+    "quantity",
+    "cost_price",
+    "retail_price",
+)
+# Временная таблица импорта: строки файла как есть (text), номер строки и заранее выданный id товара
+units_import_table = table(
+    "units_import",
+    column("row_num", Integer),
+    column("unit_id", Integer),
+    *(column(name, String) for name in UNITS_IMPORT_COLUMNS),
+)
+NUMBER_PATTERN = r"^\s*[0-9]+(\.[0-9]+)?\s*$"
+# Спецсимволы LIKE в поисковой строке, экранируются символом /
+LIKE_ESCAPE_PATTERN = re.compile(r"[/%_]")
 
 
 class UnitsRepository(BaseRepository[UnitORM, UnitDTO]):
@@ -27,39 +99,174 @@ class UnitsRepository(BaseRepository[UnitORM, UnitDTO]):
         store_id: int | None = None,
         sort_order: SortOrder = SortOrder.desc,
         sort_unit_by: SortUnitBy = SortUnitBy.id,
+        search_mode: UnitSearchMode = UnitSearchMode.contains,
+        similarity_threshold: float | None = None,
+        cursor: UnitsCursorDTO | None = None,
     ) -> list[UnitWithMainImageDTO]:
         """
         получить список товаров, отфильтровать по search_term и store_id
+        Поиск идет по trigram индексам title и description:
+        contains - ILIKE '%search_term%',
+        similar - word_similarity не меньше similarity_threshold (опечатки), сортировка по похожести.
+        Товары отсортированы по (sort_unit_by, id) в порядке sort_order.
+        cursor - последний товар предыдущей страницы, offset тогда не применяется:
+        страница читается по индексу (store_id, sort_unit_by, id) с нужного места.
         """
+        query = await self._filter_units_page(
+            select(self.model).options(joinedload(self.model.main_image)),
+            offset=offset,
+            limit=limit,
+            search_term=search_term,
+            store_id=store_id,
+            sort_order=sort_order,
+            sort_unit_by=sort_unit_by,
+            search_mode=search_mode,
+            similarity_threshold=similarity_threshold,
+            cursor=cursor,
+        )
+        result = await self.session.execute(query)
+        models = result.scalars().all()
+        return [UnitWithMainImageDataMapper.to_domain(model) for model in models]
+
+    async def get_units_fields(
+        self,
+        fields: tuple[UnitSparseField, ...],
+        offset: int,
+        limit: int,
+        search_term: str | None = None,
+        store_id: int | None = None,
+        sort_order: SortOrder = SortOrder.desc,
+        sort_unit_by: SortUnitBy = SortUnitBy.id,
+        search_mode: UnitSearchMode = UnitSearchMode.contains,
+        similarity_threshold: float | None = None,
+        cursor: UnitsCursorDTO | None = None,
+    ) -> list[UnitPartialDTO]:
+        """
+        Как get_units, но читает только колонки fields без загрузки орм моделей,
+        main_image присоединяется только если запрошена.
+        id и поле сортировки читаются всегда: по ним строится курсор.
+        """
+        fields = (UnitSparseField.id, UnitSparseField(sort_unit_by.value), *fields)
+        query = await self._filter_units_page(
+            self._select_unit_fields(fields),
+            offset=offset,
+            limit=limit,
+            search_term=search_term,
+            store_id=store_id,
+            sort_order=sort_order,
+            sort_unit_by=sort_unit_by,
+            search_mode=search_mode,
+            similarity_threshold=similarity_threshold,
+            cursor=cursor,
+        )
+        result = await self.session.execute(query)
+        return [UnitPartialDTO.model_validate(dict(row)) for row in result.mappings()]
+
+    async def get_unit_fields(
+        self, unit_id: int, fields: tuple[UnitSparseField, ...]
+    ) -> UnitWithFieldsPartialDTO:
+        """
+        Товар только с колонками fields, id и store_id читаются всегда.
+        :raise ObjectNotFoundException: Если товар не найден.
+        """
+        fields = (UnitSparseField.id, UnitSparseField.store_id, *fields)
+        result = await self.session.execute(
+            self._select_unit_fields(fields).filter(self.model.id == unit_id)
+        )
+        row = result.mappings().one_or_none()
+        if row is None:
+            raise ObjectNotFoundException
+        return UnitWithFieldsPartialDTO.model_validate(dict(row))
+
+    def _select_unit_fields(self, fields: tuple[UnitSparseField, ...]) -> Select[Any]:
+        """SELECT только колонок fields, main_image собирается в json через LEFT JOIN"""
+        columns: list[ColumnElement[Any]] = []
+        for field in dict.fromkeys(fields):
+            if field != UnitSparseField.main_image:
+                columns.append(getattr(self.model, field.value))
+        query = select(*columns).select_from(self.model)
+
+        if UnitSparseField.main_image in fields:
+            main_image = func.json_build_object(
+                *(
+                    item
+                    for image_column in UnitImageORM.__table__.columns
+                    for item in (image_column.name, image_column)
+                ),
+                type_=JSON,
+            )
+            main_image_or_null = case((UnitImageORM.id.is_(None), null()), else_=main_image)
+            query = query.add_columns(main_image_or_null.label("main_image")).outerjoin(
+                UnitImageORM, UnitImageORM.id == self.model.main_image_id
+            )
+        return query
+
+    async def _filter_units_page(
+        self,
+        query: Select[Any],
+        offset: int,
+        limit: int,
+        search_term: str | None,
+        store_id: int | None,
+        sort_order: SortOrder,
+        sort_unit_by: SortUnitBy,
+        search_mode: UnitSearchMode,
+        similarity_threshold: float | None,
+        cursor: UnitsCursorDTO | None,
+    ) -> Select[Any]:
+        """Фильтры, сортировка и страница списка товаров, см. get_units"""
         filters: list[ColumnElement[bool]] = []
+        rank: ColumnElement[Any] | None = None
 
         if search_term:
-            st = search_term.strip().lower()
-            filters.append(
-                or_(
-                    func.lower(self.model.title).contains(st),
-                    func.lower(self.model.description).contains(st),
+            st = search_term.strip()
+            if search_mode == UnitSearchMode.similar:
+                if similarity_threshold is not None:
+                    await self.session.execute(
+                        select(
+                            func.set_config(
+                                "pg_trgm.word_similarity_threshold", str(similarity_threshold), True
+                            )
+                        )
+                    )
+                filters.append(
+                    or_(
+                        literal(st).op("<%")(self.model.title),
+                        literal(st).op("<%")(self.model.description),
+                    )
+                )
+                rank = func.greatest(
+                    func.word_similarity(st, self.model.title),
+                    func.word_similarity(st, self.model.description),
+                )
+            else:
+                pattern = "%" + LIKE_ESCAPE_PATTERN.sub(r"/\g<0>", st) + "%"
+                filters.append(
+                    or_(
+                        self.model.title.ilike(pattern, escape="/"),
+                        self.model.description.ilike(pattern, escape="/"),
+                    )
                 )
-            )
 
         if store_id:
             filters.append(self.model.store_id == store_id)
 
-        query = (
-            select(self.model)
-            .select_from(self.model)
-            .filter(*filters)
-            .offset(offset)
-            .limit(limit)
-            .options(joinedload(self.model.main_image))
-        )
-
         order_column = getattr(self.model, sort_unit_by)
-        query = query.order_by(desc(order_column) if sort_order == SortOrder.desc else order_column)
+        if cursor:
+            row = tuple_(order_column, self.model.id)
+            after = tuple_(cast(literal(cursor.value), order_column.type), literal(cursor.id))
+            filters.append(row < after if sort_order == SortOrder.desc else row > after)
+            offset = 0
 
-        result = await self.session.execute(query)
-        models = result.scalars().all()
-        return [UnitWithMainImageDataMapper.to_domain(model) for model in models]
+        query = query.filter(*filters).offset(offset).limit(limit)
+
+        if rank is not None:
+            query = query.order_by(rank.desc())
+        if sort_order == SortOrder.desc:
+            query = query.order_by(desc(order_column), desc(self.model.id))
+        else:
+            query = query.order_by(order_column, self.model.id)
+        return query
 
     async def get_unit_with_fields(
         self, unit_id: int, fields: tuple[UnitField, ...] | None = None
@@ -88,3 +295,294 @@ class UnitsRepository(BaseRepository[UnitORM, UnitDTO]):
 
     async def edit_unit(self, unit_id: int, dto: EditUnitDTO) -> UnitDTO:
         return await self.edit(dto=dto, exclude_unset=True, id=unit_id)
+
+    async def get_titles_by_prefix(
+        self, store_id: int, prefix: str, limit: int
+    ) -> list[UnitTitleDTO]:
+        """
+        Названия товаров магазина, начинающиеся с prefix без учета регистра, по алфавиту.
+        Фильтр и сортировка по одному индексу ix_units_store_id_title_prefix.
+        """
+        title_key = func.lower(self.model.title).collate("C")
+        pattern = LIKE_ESCAPE_PATTERN.sub(r"/\g<0>", prefix.lower()) + "%"
+        query = (
+            select(self.model.id, self.model.title)
+            .filter(self.model.store_id == store_id, title_key.like(pattern, escape="/"))
+            .order_by(title_key, self.model.id)
+            .limit(limit)
+        )
+        result = await self.session.execute(query)
+        return [UnitTitleDTO(id=unit_id, title=title) for unit_id, title in result.all()]
+
+    async def get_ids_by_codes(self, store_id: int, *codes: str) -> dict[str, int]:
+        """
+        :return: {code: unit_id} найденных товаров магазина по уникальному индексу (store_id, code)
+        """
+        query = select(self.model.code, self.model.id).filter(
+            self.model.store_id == store_id, self.model.code.in_(codes)
+        )
+        result = await self.session.execute(query)
+        return {code: unit_id for code, unit_id in result.all()}
+
+    async def change_images_count(
+        self, unit_id: int, delta: int, limit: int | None = None
+    ) -> int | None:
+        """
+        Атомарно изменяет units.images_count на delta, строка товара блокируется до commit:
+        параллельные загрузки не превысят limit.
+        :return: новое количество изображений, None если товара нет или limit превышен
+        """
+        stmt = (
+            update(self.model)
+            .filter(self.model.id == unit_id)
+            .values(images_count=self.model.images_count + delta)
+            .returning(self.model.images_count)
+        )
+        if limit is not None:
+            stmt = stmt.filter(self.model.images_count + delta <= limit)
+        result = await self.session.execute(stmt)
+        return result.scalar_one_or_none()
+
+    async def get_units_by_ids(self, *unit_ids: int) -> list[UnitWithMainImageDTO]:
+        """Товары с главной картинкой одним запросом, отсутствующие id пропускаются"""
+        query = (
+            select(self.model)
+            .filter(self.model.id.in_(unit_ids))
+            .options(joinedload(self.model.main_image))
+            .order_by(self.model.id)
+        )
+        result = await self.session.execute(query)
+        return [UnitWithMainImageDataMapper.to_domain(model) for model in result.scalars().all()]
+
+    async def edit_units_bulk(self, dtos: list[EditUnitBulkItemDTO]) -> list[UnitDTO]:
+        """
+        Изменяет товары одним UPDATE ... FROM (VALUES ...): у каждого товара свой набор полей.
+        NULL в title, description, measurement - поле не передано, они не бывают пустыми.
+        main_image_id и code могут стать NULL, поэтому для них передаются признаки *_set.
+        :raise ForeignKeyNotFoundException: Если картинка не найдена.
+        :raise ObjectAlreadyExistsException: Если код товара уже есть в магазине.
+        """
+        edits = values(
+            column("id", Integer),
+            column("title", String),
+            column("description", String),
+            column("measurement", self.model.measurement.type),
+            column("main_image_id", Integer),
+            column("main_image_id_set", Boolean),
+            column("code", String),
+            column("code_set", Boolean),
+            name="edits",
+        ).data(
+            [
+                (
+                    dto.id,
+                    dto.title,
+                    dto.description,
+                    dto.measurement,
+                    dto.main_image_id,
+                    "main_image_id" in dto.model_fields_set,
+                    dto.code,
+                    "code" in dto.model_fields_set,
+                )
+                for dto in dtos
+            ]
+        )
+        stmt = (
+            update(self.model)
+            .where(self.model.id == edits.c.id)
+            .values(
+                # колонка VALUES, где во всех строках NULL, получает тип text: приводится явно
+                title=func.coalesce(cast(edits.c.title, String), self.model.title),
+                description=func.coalesce(
+                    cast(edits.c.description, String), self.model.description
+                ),
+                measurement=func.coalesce(
+                    cast(edits.c.measurement, self.model.measurement.type), self.model.measurement
+                ),
+                main_image_id=case(
+                    (edits.c.main_image_id_set, cast(edits.c.main_image_id, Integer)),
+                    else_=self.model.main_image_id,
+                ),
+                code=case(
+                    (edits.c.code_set, cast(edits.c.code, String)),
+                    else_=self.model.code,
+                ),
+            )
+            .returning(self.model)
+        )
+        try:
+            result = await self.session.execute(stmt)
+        except IntegrityError as exc:
+            is_raise(exc, ForeignKeyViolationError, ForeignKeyNotFoundException)
+            is_raise(exc, UniqueViolationError, ObjectAlreadyExistsException)
+            raise exc
+        return [self.mapper.to_domain(model) for model in result.scalars().all()]
+
+    async def create_import_table(self) -> None:
+        """Временная таблица импорта, удаляется при завершении транзакции"""
+        columns = ", ".join(f"{name} text" for name in UNITS_IMPORT_COLUMNS)
+        await self.session.execute(
+            text(
+                "CREATE TEMP TABLE units_import ("
+                "row_num bigint GENERATED ALWAYS AS IDENTITY, unit_id integer, "
+                f"{columns}) ON COMMIT DROP"
+            )
+        )
+
+    async def copy_import_rows(self, source: BytesReader) -> int:
+        """
+        Загружает CSV во временную таблицу через COPY: строки нумеруются в порядке файла.
+        :param source: CSV с заголовком, колонки UNITS_IMPORT_COLUMNS
+        :return: количество строк
+        :raise UnitsImportFileException: Если файл не разбирается как CSV с этими колонками.
+        """
+        connection = await self.session.connection()
+        raw_connection = await connection.get_raw_connection()
+        try:
+            status: str = await raw_connection.driver_connection.copy_to_table(  # type: ignore
+                "units_import",
+                source=source,
+                columns=UNITS_IMPORT_COLUMNS,
+                format="csv",
+                header=True,
+            )
+        except (DataError, BadCopyFileFormatError) as exc:
+            raise UnitsImportFileException(f"{UnitsImportFileException.details}: {exc}") from exc
+        return int(status.split()[-1])
+
+    async def get_import_errors(self, limit: int) -> list[UnitsImportErrorDTO]:
+        """
+        Проверяет строки импорта одним запросом.
+        :return: первые limit строк с ошибками, номер строки файла с учетом заголовка
+        """
+        t = units_import_table.c
+
+        def check_number(value: ColumnElement[Any], name: str) -> ColumnElement[Any]:
+            return case(
+                (~func.coalesce(value, "").regexp_match(NUMBER_PATTERN), f"{name}: не число"),
+                (cast(value, Float) < 0.01, f"{name}: не меньше 0.01"),
+            )
+
+        measurements = [measurement.value for measurement in UnitOfMeasurementEnum]
+        error = func.concat_ws(
+            "; ",
+            case(
+                (
+                    ~func.length(func.coalesce(t.title, "")).between(3, 100),
+                    "title: от 3 до 100 символов",
+                )
+            ),
+            case(
+                (
+                    func.length(func.coalesce(t.description, "")) > 100,
+                    "description: не больше 100 символов",
+                )
+            ),
+            case(
+                (
+                    func.coalesce(t.measurement, "").not_in(measurements),
+                    f"measurement: одно из {', '.join(measurements)}",
+                )
+            ),
+            check_number(t.quantity, "quantity"),
+            check_number(t.cost_price, "cost_price"),
+            check_number(t.retail_price, "retail_price"),
+        )
+        checks = select(t.row_num, error.label("error")).subquery("checks")
+        query = (
+            select((checks.c.row_num + 1).label("line"), checks.c.error)
+            .filter(checks.c.error != "")
+            .order_by(checks.c.row_num)
+            .limit(limit)
+        )
+        result = await self.session.execute(query)
+        return [UnitsImportErrorDTO.model_validate(row) for row in result.mappings().all()]
+
+    async def insert_imported_units(self, store_id: int, user_id: int) -> int:
+        """
+        Вставляет проверенные строки импорта товарами магазина с остатком и одним действием
+        addStock со всеми транзакциями, одним запросом.
+        :return: id действия
+        """
+        t = units_import_table.c
+        # id товаров выдаются заранее, что бы связать строки импорта с транзакциями
+        await self.session.execute(
+            update(units_import_table).values(
+                unit_id=literal_column(f"nextval('{self.model.__tablename__}_id_seq')")
+            )
+        )
+
+        insert_units = (
+            insert(self.model)
+            .from_select(
+                names=[
+                    "id",
+                    "title",
+                    "description",
+                    "measurement",
+                    "store_id",
+                    "quantity",
+                    "average_cost_price",
+                    "retail_price",
+                ],
+                select=select(
+                    t.unit_id,
+                    t.title,
+                    func.coalesce(t.description, ""),
+                    cast(t.measurement, self.model.measurement.type),
+                    literal(store_id),
+                    cast(t.quantity, Float()),
+                    cast(t.cost_price, Float()),
+                    cast(t.retail_price, Float()),
+                ).order_by(t.row_num),
+            )
+            .returning(self.model.id)
+            .cte("insert_units")
+        )
+        add_action = (
+            insert(ActionOrm)
+            .values(title=ActionEnum.addStock, store_id=store_id)
+            .returning(ActionOrm.id, ActionOrm.title, ActionOrm.store_id)
+            .cte("add_action")
+        )
+        add_transactions = (
+            insert(ActionTransactionOrm)
+            .from_select(
+                names=[
+                    "quantity_delta",
+                    "cost_price",
+                    "retail_price",
+                    "previous_retail_price",
+                    "discount_price",
+                    "action",
+                    "unit_id",
+                    "user_id",
+                    "action_id",
+                    "store_id",
+                ],
+                select=select(
+                    cast(t.quantity, Float()),
+                    cast(t.cost_price, Float()),
+                    cast(t.retail_price, Float()),
+                    literal(0.0),  # у нового товара розничной цены не было
+                    null(),
+                    add_action.c.title,
+                    insert_units.c.id,
+                    literal(user_id),
+                    add_action.c.id,
+                    literal(store_id),
+                )
+                .select_from(
+                    insert_units.join(units_import_table, t.unit_id == insert_units.c.id).join(
+                        add_action, literal(True)
+                    )
+                )
+                .order_by(t.row_num),
+            )
+            .cte("add_transactions")
+        )
+        query = select(add_action.c.id).add_cte(
+            insert_units, add_transactions, ActionsCountersRepository.increment_cte(add_action)
+        )
+        result = await self.session.execute(query)
+        return result.scalar_one()
@@ -1,9 +1,15 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Path, Query, Body
+from fastapi import APIRouter, Path, Query, Body, Header, Response, status
+from fastapi.responses import StreamingResponse
 
-from src.exceptions.base import UnitOutOfStockException
-from src.exceptions.conflict import UnitBelongAnotherStoreException
+from src.config import settings
+from src.exceptions.base import UnitOutOfStockException, InvalidCursorException
+from src.exceptions.conflict import (
+    UnitBelongAnotherStoreException,
+    IdempotencyKeyInProgressException,
+    IdempotencyKeyReusedException,
+)
 from src.exceptions.forbidden import (
     ActionAccessForbiddenException,
     StoreAccessForbiddenException,
@@ -13,11 +19,20 @@ from src.exceptions.not_found import (
     ActionNotFoundException,
     StoreNotFoundException,
     UnitNotFoundException,
+    QueuedSaleNotFoundException,
 )
 from src.models.actions import ActionEnum
-from src.routers.dependencies import DepDB, DepAccess, DepCache
+from src.routers.dependencies import DepDB, DepAccess, DepCache, DepDBStream
+from src.routers.http_exceptions.base import (
+    ActionsStoreMismatchHTTPException,
+    InvalidCursorHTTPException,
+)
 from src.routers.http_exceptions.bad_request import UnitBelongAnotherStoreHTTPException
-from src.routers.http_exceptions.conflict import UnitOutOfStockHTTPException
+from src.routers.http_exceptions.conflict import (
+    UnitOutOfStockHTTPException,
+    IdempotencyKeyInProgressHTTPException,
+    IdempotencyKeyReusedHTTPException,
+)
 from src.routers.http_exceptions.forbidden import (
     ActionAccessForbiddenHTTPException,
     StoreAccessForbiddenHTTPException,
@@ -27,18 +42,26 @@ from src.routers.http_exceptions.not_found import (
     ActionNotFoundHTTPException,
     StoreNotFoundHTTPException,
     UnitNotFoundHTTPException,
+    QueuedSaleNotFoundHTTPException,
 )
 from src.routers.openapi_exemples import openapi_add_action_examples
 from src.schemas.actions import (
     ActionsWithUnitsResponse,
     ActionWithUnitsResponse,
     ActionsQuery,
-    AddActionDTO,
+    AddActionRequestDTO,
+    AddActionsBulkDTO,
     ActionResponse,
+    ActionsBulkResponse,
     ActionWithUnitsTransactionsDTO,
+    QueuedSaleDTO,
+    QueuedSaleResponse,
+    SalesAnalyticsQuery,
+    ActionsExportQuery,
+    SalesAnalyticsResponse,
 )
 from src.schemas.base import StandardResponse, PaginationItems
-from src.schemas.types import IDInt
+from src.schemas.types import IDInt, ExportFormat
 from src.services.actions import ActionsService
 from src.services.helpers.access_roles import (
     roles_is_administrations,
@@ -51,6 +74,7 @@ from src.services.helpers.access_roles import (
     roles_can_read_action_in_store,
 )
 from src.utils.files import get_md
+from src.utils.http_cache import make_etag, is_etag_match
 from src.utils.swagger_exceptions import exceptions_to_openapi
 
 actions_router = APIRouter(prefix="/actions", tags=["Действия с товаром"])
@@ -73,23 +97,96 @@ actions_router = APIRouter(prefix="/actions", tags=["Действия с тов
         roles_can_5=", ".join(role.value for role in roles_can_new_price),
         action_6=ActionEnum.stockReturn.value,
         roles_can_6=", ".join(role.value for role in roles_can_stock_return),
+        idempotency_ttl_hours=str(round(settings.ACTION_IDEMPOTENCY_KEY_TTL / 60 / 60)),
     ),
-    response_model=StandardResponse[ActionResponse],
+    response_model=StandardResponse[ActionResponse] | StandardResponse[QueuedSaleResponse],
     responses=exceptions_to_openapi(
         StoreNotFoundHTTPException,
         ActionAccessForbiddenHTTPException,
         UnitNotFoundHTTPException,
         UnitBelongAnotherStoreHTTPException,
         UnitOutOfStockHTTPException,
+        IdempotencyKeyInProgressHTTPException,
+        IdempotencyKeyReusedHTTPException,
     ),
 )
 async def add_action(
     db: DepDB,
+    cache: DepCache,
     payload: DepAccess,
-    body: AddActionDTO = Body(openapi_examples=openapi_add_action_examples),
-) -> StandardResponse[ActionResponse]:
+    response: Response,
+    body: AddActionRequestDTO = Body(openapi_examples=openapi_add_action_examples),
+    idempotency_key: Annotated[
+        str | None,
+        Header(
+            alias="Idempotency-Key",
+            min_length=1,
+            max_length=255,
+            description="Ключ для безопасного повтора запроса",
+        ),
+    ] = None,
+) -> StandardResponse[ActionResponse] | StandardResponse[QueuedSaleResponse]:
     try:
-        action = await ActionsService(db).add_action(
+        if idempotency_key:
+            action = await ActionsService(db=db, cache=cache).add_action_with_idempotency_key(
+                idempotency_key=idempotency_key,
+                user_id=payload.user_id,
+                dto=body,
+                user_roles_in_stores=payload.stores_roles,
+                user_role_in_company=payload.company_role,
+            )
+        else:
+            action = await ActionsService(db=db, cache=cache).add_action(
+                user_id=payload.user_id,
+                dto=body,
+                user_roles_in_stores=payload.stores_roles,
+                user_role_in_company=payload.company_role,
+            )
+    except IdempotencyKeyReusedException:
+        raise IdempotencyKeyReusedHTTPException
+    except IdempotencyKeyInProgressException:
+        raise IdempotencyKeyInProgressHTTPException
+    except StoreNotFoundException:
+        raise StoreNotFoundHTTPException
+    except ActionAccessForbiddenException:
+        raise ActionAccessForbiddenHTTPException
+    except UnitNotFoundException as exc:
+        raise UnitNotFoundHTTPException(exc)
+    except UnitBelongAnotherStoreException as exc:
+        raise UnitBelongAnotherStoreHTTPException(detail=exc.details)
+    except UnitOutOfStockException as exc:
+        raise UnitOutOfStockHTTPException(detail=exc.details)
+    if isinstance(action, QueuedSaleDTO):
+        response.status_code = status.HTTP_202_ACCEPTED
+        return StandardResponse(
+            data=QueuedSaleResponse(queued_sale=action), message="Продажа поставлена в очередь"
+        )
+    return StandardResponse(
+        data=ActionResponse(action=action), message="Успех: транзакция исполнена"
+    )
+
+
+@actions_router.post(
+    "/bulk",
+    description=get_md(
+        path_to_md_file="docs/add_actions_bulk_description.md",
+        admin_roles=", ".join(role.value for role in roles_is_administrations),
+    ),
+    response_model=StandardResponse[ActionsBulkResponse],
+    responses=exceptions_to_openapi(
+        ActionsStoreMismatchHTTPException,
+        StoreNotFoundHTTPException,
+        ActionAccessForbiddenHTTPException,
+    ),
+)
+async def add_actions_bulk(
+    db: DepDB,
+    cache: DepCache,
+    payload: DepAccess,
+    body: AddActionsBulkDTO,
+) -> StandardResponse[ActionsBulkResponse]:
+    try:
+        results = await ActionsService(db=db, cache=cache).add_actions_bulk(
             user_id=payload.user_id,
             dto=body,
             user_roles_in_stores=payload.stores_roles,
@@ -99,14 +196,120 @@ async def add_action(
         raise StoreNotFoundHTTPException
     except ActionAccessForbiddenException:
         raise ActionAccessForbiddenHTTPException
-    except UnitNotFoundException:
-        raise UnitNotFoundHTTPException
-    except UnitBelongAnotherStoreException:
-        raise UnitBelongAnotherStoreHTTPException
-    except UnitOutOfStockException:
-        raise UnitOutOfStockHTTPException
     return StandardResponse(
-        data=ActionResponse(action=action), message="Успех: транзакция исполнена"
+        data=ActionsBulkResponse(actions=results), message="Пакет действий обработан"
+    )
+
+
+@actions_router.get(
+    "/queue/{queue_id}",
+    description=get_md(
+        path_to_md_file="docs/get_queued_sale_description.md",
+        admin_roles=", ".join(role.value for role in roles_is_administrations),
+        can_get_actions=", ".join(role.value for role in roles_can_read_action_in_store),
+    ),
+    response_model=StandardResponse[QueuedSaleResponse],
+    responses=exceptions_to_openapi(
+        QueuedSaleNotFoundHTTPException, StoreAccessForbiddenHTTPException
+    ),
+)
+async def get_queued_sale(
+    cache: DepCache,
+    payload: DepAccess,
+    queue_id: Annotated[str, Path(min_length=1, max_length=64)],
+) -> StandardResponse[QueuedSaleResponse]:
+    try:
+        queued_sale = await ActionsService(cache=cache).get_queued_sale(
+            queue_id=queue_id,
+            user_roles_in_stores=payload.stores_roles,
+            user_role_in_company=payload.company_role,
+        )
+    except QueuedSaleNotFoundException:
+        raise QueuedSaleNotFoundHTTPException
+    except StoreAccessForbiddenException:
+        raise StoreAccessForbiddenHTTPException
+    return StandardResponse(data=QueuedSaleResponse(queued_sale=queued_sale))
+
+
+@actions_router.get(
+    "/analytics",
+    description=get_md(
+        path_to_md_file="docs/get_sales_analytics_description.md",
+        admin_roles=", ".join(role.value for role in roles_is_administrations),
+        can_get_actions=", ".join(role.value for role in roles_can_read_action_in_store),
+    ),
+    response_model=StandardResponse[SalesAnalyticsResponse],
+    responses=exceptions_to_openapi(StoreNotFoundHTTPException, StoreAccessForbiddenHTTPException),
+)
+async def get_sales_analytics(
+    db: DepDB,
+    cache: DepCache,
+    payload: DepAccess,
+    query: Annotated[SalesAnalyticsQuery, Query()],
+) -> StandardResponse[SalesAnalyticsResponse]:
+    try:
+        analytics = await ActionsService(db=db, cache=cache).get_sales_analytics(
+            store_id=query.store_id,
+            bucket=query.bucket,
+            date_from=query.date_from,
+            date_to=query.date_to,
+            by_unit=query.by_unit,
+            user_roles_in_stores=payload.stores_roles,
+            user_role_in_company=payload.company_role,
+        )
+    except StoreNotFoundException:
+        raise StoreNotFoundHTTPException
+    except StoreAccessForbiddenException:
+        raise StoreAccessForbiddenHTTPException
+    return StandardResponse(data=SalesAnalyticsResponse(analytics=analytics))
+
+
+@actions_router.get(
+    "/export",
+    description=get_md(
+        path_to_md_file="docs/export_transactions_description.md",
+        admin_roles=", ".join(role.value for role in roles_is_administrations),
+        can_get_actions=", ".join(role.value for role in roles_can_read_action_in_store),
+    ),
+    response_class=StreamingResponse,
+    responses=exceptions_to_openapi(
+        StoreNotFoundHTTPException,
+        AllStoresAccessForbiddenHTTPException,
+        StoreAccessForbiddenHTTPException,
+    ),
+)
+async def export_transactions(
+    db: DepDB,
+    db_stream: DepDBStream,
+    cache: DepCache,
+    payload: DepAccess,
+    query: Annotated[ActionsExportQuery, Query()],
+) -> StreamingResponse:
+    try:
+        await ActionsService(db=db, cache=cache).check_read_actions_access(
+            store_id=query.store_id,
+            user_role_in_company=payload.company_role,
+            user_roles_in_stores=payload.stores_roles,
+        )
+    except StoreNotFoundException:
+        raise StoreNotFoundHTTPException
+    except AllStoresAccessForbiddenException:
+        raise AllStoresAccessForbiddenHTTPException
+    except StoreAccessForbiddenException:
+        raise StoreAccessForbiddenHTTPException
+
+    media_types = {ExportFormat.ndjson: "application/x-ndjson", ExportFormat.csv: "text/csv"}
+    return StreamingResponse(
+        ActionsService(db=db_stream).export_transactions(
+            export_format=query.format,
+            store_id=query.store_id,
+            created_from=query.created_from,
+            created_to=query.created_to,
+        ),
+        media_type=media_types[query.format],
+        headers={
+            "Content-Disposition": f'attachment; filename="transactions.{query.format.value}"'
+        },
     )
 
 
@@ -123,6 +326,7 @@ async def add_action(
         AllStoresAccessForbiddenHTTPException,
         StoreAccessForbiddenHTTPException,
         ActionNotFoundHTTPException,
+        InvalidCursorHTTPException,
     ),
 )
 async def get_actions(
@@ -140,7 +344,12 @@ async def get_actions(
             store_id=query.store_id,
             user_role_in_company=payload.company_role,
             user_roles_in_stores=payload.stores_roles,
+            cursor=query.cursor,
+            created_from=query.created_from,
+            created_to=query.created_to,
         )
+    except InvalidCursorException:
+        raise InvalidCursorHTTPException
     except StoreNotFoundException:
         raise StoreNotFoundHTTPException
     except AllStoresAccessForbiddenException:
@@ -170,8 +379,16 @@ async def get_actions(
     responses=exceptions_to_openapi(ActionNotFoundHTTPException, StoreAccessForbiddenHTTPException),
 )
 async def get_action(
-    db: DepDB, cache: DepCache, payload: DepAccess, action_id: Annotated[IDInt, Path()]
-) -> StandardResponse[ActionWithUnitsResponse]:
+    db: DepDB,
+    cache: DepCache,
+    payload: DepAccess,
+    response: Response,
+    action_id: Annotated[IDInt, Path()],
+    if_none_match: Annotated[
+        str | None,
+        Header(alias="If-None-Match", description="ETag из прошлого ответа"),
+    ] = None,
+) -> StandardResponse[ActionWithUnitsResponse] | Response:
     try:
         action_with_units = await ActionsService(db=db, cache=cache).get_action(
             action_id=action_id,
@@ -182,4 +399,14 @@ async def get_action(
         raise ActionNotFoundHTTPException
     except StoreAccessForbiddenException:
         raise StoreAccessForbiddenHTTPException
+
+    # meta ответа меняется при каждом запросе, поэтому ETag считается только по действию
+    etag = make_etag(action_with_units.model_dump_json())
+    cache_headers = {
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={settings.ACTION_DETAILS_HTTP_MAX_AGE}, immutable",
+    }
+    if is_etag_match(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+    response.headers.update(cache_headers)
     return StandardResponse(data=ActionWithUnitsResponse(action=action_with_units))
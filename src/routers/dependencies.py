@@ -43,6 +43,17 @@ async def get_db_manager():
 DepDB = Annotated[DBAsyncManager, Depends(get_db_manager)]
 
 
+def get_db_manager_for_stream() -> DBAsyncManager:
+    """
+    Менеджер для StreamingResponse без открытой сессии: зависимости с yield закрываются
+    до отправки тела ответа, поэтому сессию открывает генератор ответа (`async with db`).
+    """
+    return DBAsyncManager(new_async_session)
+
+
+DepDBStream = Annotated[DBAsyncManager, Depends(get_db_manager_for_stream)]
+
+
 async def get_cache_manager():
     async with CacheManager(RedisAdapter(redis_client)) as cache:
         yield cache
@@ -8,3 +8,11 @@ class BadRequestHTTPException(VelvetHTTPException):
 
 class UnitBelongAnotherStoreHTTPException(BadRequestHTTPException):
     details = "Some unit_ids belong to another store"
+
+
+class UnitsImportFileHTTPException(BadRequestHTTPException):
+    details = "Файл не соответствует формату CSV импорта товаров"
+
+
+class UnitsImportLimitHTTPException(BadRequestHTTPException):
+    details = "Превышено количество строк в файле импорта"
@@ -111,6 +111,11 @@ class InvalidPaginationHTTPException(VelvetHTTPException):
     details = "Неверные данные пагинации"
 
 
+class InvalidCursorHTTPException(VelvetHTTPException):
+    status_code = 422
+    details = "Неверный курсор пагинации"
+
+
 # todo скорее всего этот класс не понадобится в будущем
 class PydanticValidationErrorHTTPException(VelvetHTTPException):
     status_code = 422
@@ -143,5 +148,33 @@ class SalesValidationHTTPException(PydanticValidationErrorHTTPException):
     details = "Не все поля для sales переданы верно"
 
 
+class SalesUnitIdOrCodeHTTPException(PydanticValidationErrorHTTPException):
+    details = "У товара продажи должен быть передан unitId или code"
+
+
+class SalesUnitIdCodeMixHTTPException(PydanticValidationErrorHTTPException):
+    details = "Товары продажи передаются либо все по unitId, либо все по code"
+
+
 class UnitIdsDuplicateHTTPException(PydanticValidationErrorHTTPException):
     details = "unitId имеет дубликаты"
+
+
+class UnitsIdsDuplicateHTTPException(PydanticValidationErrorHTTPException):
+    details = "id товаров имеют дубликаты"
+
+
+class ActionsStoreMismatchHTTPException(PydanticValidationErrorHTTPException):
+    details = "Все действия должны быть одного магазина"
+
+
+class AnalyticsRangeHTTPException(PydanticValidationErrorHTTPException):
+    details = "date_from должен быть не позже date_to, диапазон не больше двух лет"
+
+
+class CreatedRangeHTTPException(PydanticValidationErrorHTTPException):
+    details = "created_from должен быть не позже created_to"
+
+
+class UnitsCursorSearchModeHTTPException(PydanticValidationErrorHTTPException):
+    details = "cursor не поддерживается с search_mode=similar, используйте offset"
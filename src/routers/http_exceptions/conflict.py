@@ -46,6 +46,21 @@ class StoreAlreadyExistsHTTPException(VelvetHTTPException):
     details = "Магазин с таким названием уже существует"
 
 
+class UnitCodeAlreadyExistsHTTPException(VelvetHTTPException):
+    status_code = 409
+    details = "Товар с таким кодом уже есть в магазине"
+
+
 class UnitImageIsMainHTTPException(VelvetHTTPException):
     status_code = 409
     details = "Изображение является главным для товара"
+
+
+class IdempotencyKeyInProgressHTTPException(VelvetHTTPException):
+    status_code = 409
+    details = "Запрос с этим Idempotency-Key еще выполняется, повторите позже"
+
+
+class IdempotencyKeyReusedHTTPException(VelvetHTTPException):
+    status_code = 409
+    details = "Idempotency-Key уже использован с другим телом запроса"
@@ -31,6 +31,10 @@ class ActionNotFoundHTTPException(ObjectNotFoundHTTPException):
     details = "Действие не найдено"
 
 
+class QueuedSaleNotFoundHTTPException(ObjectNotFoundHTTPException):
+    details = "Продажа в очереди не найдена"
+
+
 class StoreNotFoundHTTPException(ObjectNotFoundHTTPException):
     details = "Store не найдена"
 
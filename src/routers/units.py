@@ -1,14 +1,19 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Path, Query, Body
+from fastapi import APIRouter, Path, Query, Body, File, UploadFile, Response, Header, status
 
 from src.config import settings
 from src.exceptions.base import (
     UnitHaveTransactionsException,
     UnitImagesLimitException,
     UnitImageIsMainException,
+    UnitsImportFileException,
+    UnitsImportLimitException,
+    InvalidCursorException,
 )
+from src.exceptions.conflict import UnitCodeAlreadyExistsException
 from src.exceptions.forbidden import (
+    ActionAccessForbiddenException,
     UnitModificationInStoreForbiddenException,
     UnitReadInStoreForbiddenException,
     UnitReadInAllStoresForbiddenException,
@@ -26,15 +31,22 @@ from src.routers.dependencies import (
     DepGetUnitQuery,
     DepCache,
 )
+from src.routers.http_exceptions.bad_request import (
+    UnitsImportFileHTTPException,
+    UnitsImportLimitHTTPException,
+)
 from src.routers.http_exceptions.base import (
     UnsupportedImageExtensionHTTPException,
+    InvalidCursorHTTPException,
 )
 from src.routers.http_exceptions.conflict import (
+    UnitCodeAlreadyExistsHTTPException,
     UnitHaveTransactionsHTTPException,
     UnitImagesLimitHTTPException,
     UnitImageIsMainHTTPException,
 )
 from src.routers.http_exceptions.forbidden import (
+    ActionAccessForbiddenHTTPException,
     UnitModificationInStoreForbiddenHTTPException,
     AccessForbiddenHTTPException,
     UnitReadInStoreForbiddenHTTPException,
@@ -48,22 +60,36 @@ from src.routers.http_exceptions.not_found import (
 )
 from src.routers.openapi_exemples import openapi_add_unit_examples
 from src.schemas.base import StandardResponse, NullDataResponse
-from src.schemas.types import IDInt, UnitField
+from src.schemas.types import IDInt, UnitField, UnitCodeStr
 from src.schemas.units import (
     UnitWithFieldsResponse,
     AddUnitDTO,
     EditUnitDTO,
     UnitResponse,
     UnitsWithMainImageResponse,
+    UnitsImportResponse,
+    UnitTransactionsResponse,
+    UnitsBatchResponse,
+    EditUnitsBulkDTO,
+    UnitsResponse,
+    UnitsAutocompleteResponse,
+)
+from src.schemas.query import (
+    UnitsQuery,
+    UnitTransactionsQuery,
+    UnitsBatchQuery,
+    UnitByCodeQuery,
+    UnitsAutocompleteQuery,
 )
-from src.schemas.query import UnitsQuery
 from src.services.helpers.access_roles import (
     roles_is_administrations,
     roles_can_write_unit_in_store,
     roles_can_read_unit_in_store,
+    roles_can_add_stock,
 )
 from src.services.units import UnitsService
 from src.utils.files import get_md
+from src.utils.http_cache import make_etag, is_etag_match
 from src.utils.swagger_exceptions import exceptions_to_openapi
 
 units_router = APIRouter(prefix="/units", tags=["Товары"])
@@ -77,15 +103,20 @@ units_router = APIRouter(prefix="/units", tags=["Товары"])
         can_add_unit=", ".join(role.value for role in roles_can_write_unit_in_store),
     ),
     response_model=StandardResponse[UnitResponse],
-    responses=exceptions_to_openapi(StoreNotFoundHTTPException, StoreNotFoundHTTPException),
+    responses=exceptions_to_openapi(
+        StoreNotFoundHTTPException,
+        UnitModificationInStoreForbiddenHTTPException,
+        UnitCodeAlreadyExistsHTTPException,
+    ),
 )
 async def add_unit(
     db: DepDB,
+    cache: DepCache,
     payload: DepAccess,
     data: AddUnitDTO = Body(openapi_examples=openapi_add_unit_examples),
 ) -> StandardResponse[UnitResponse]:
     try:
-        unit = await UnitsService(db).add_unit(
+        unit = await UnitsService(db=db, cache=cache).add_unit(
             dto=data,
             user_roles_in_stores=payload.stores_roles,
             user_role_in_company=payload.company_role,
@@ -94,9 +125,66 @@ async def add_unit(
         raise StoreNotFoundHTTPException
     except UnitModificationInStoreForbiddenException:
         raise UnitModificationInStoreForbiddenHTTPException
+    except UnitCodeAlreadyExistsException:
+        raise UnitCodeAlreadyExistsHTTPException
     return StandardResponse(data=UnitResponse(unit=unit))
 
 
+@units_router.post(
+    "/import",
+    description=get_md(
+        "docs/import_units_description.md",
+        admin_roles=", ".join(role.value for role in roles_is_administrations),
+        can_add_unit=", ".join(role.value for role in roles_can_write_unit_in_store),
+        can_add_stock=", ".join(role.value for role in roles_can_add_stock),
+        max_rows=str(settings.UNITS_IMPORT_MAX_ROWS),
+        max_errors=str(settings.UNITS_IMPORT_MAX_ERRORS),
+    ),
+    response_model=StandardResponse[UnitsImportResponse],
+    responses=exceptions_to_openapi(
+        StoreNotFoundHTTPException,
+        UnitModificationInStoreForbiddenHTTPException,
+        ActionAccessForbiddenHTTPException,
+        UnitsImportFileHTTPException,
+        UnitsImportLimitHTTPException,
+    ),
+)
+async def import_units(
+    db: DepDB,
+    cache: DepCache,
+    payload: DepAccess,
+    response: Response,
+    store_id: Annotated[IDInt, Query(description="Магазин, в котором создаются товары")],
+    file: UploadFile = File(..., description="CSV с заголовком"),
+) -> StandardResponse[UnitsImportResponse]:
+    try:
+        result = await UnitsService(db=db, cache=cache).import_units(
+            user_id=payload.user_id,
+            store_id=store_id,
+            source=file.file,
+            user_roles_in_stores=payload.stores_roles,
+            user_role_in_company=payload.company_role,
+        )
+    except StoreNotFoundException:
+        raise StoreNotFoundHTTPException
+    except UnitModificationInStoreForbiddenException:
+        raise UnitModificationInStoreForbiddenHTTPException
+    except ActionAccessForbiddenException:
+        raise ActionAccessForbiddenHTTPException
+    except UnitsImportFileException as exc:
+        raise UnitsImportFileHTTPException(detail=exc.details)
+    except UnitsImportLimitException:
+        raise UnitsImportLimitHTTPException
+    if result.errors:
+        response.status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+        return StandardResponse(
+            data=UnitsImportResponse(result=result), message="Импорт не выполнен: ошибки в строках"
+        )
+    return StandardResponse(
+        data=UnitsImportResponse(result=result), message=f"Импортировано товаров: {result.imported}"
+    )
+
+
 @units_router.get(
     "",
     description=get_md(
@@ -110,6 +198,7 @@ async def add_unit(
         StoreNotFoundHTTPException,
         UnitReadInStoreForbiddenHTTPException,
         UnitReadInAllStoresForbiddenHTTPException,
+        InvalidCursorHTTPException,
     ),
 )
 async def get_units(
@@ -119,7 +208,7 @@ async def get_units(
     pag: Annotated[UnitsQuery, Query()],
 ) -> StandardResponse[UnitsWithMainImageResponse]:
     try:
-        units = await UnitsService(db=db, cache=cache).get_units(
+        units, next_cursor = await UnitsService(db=db, cache=cache).get_units(
             offset=pag.offset,
             limit=pag.limit,
             search_term=pag.search_term,
@@ -128,7 +217,12 @@ async def get_units(
             user_roles_in_stores=payload.stores_roles,
             sort_order=pag.sort_order,
             sort_by=pag.sort_by,
+            search_mode=pag.search_mode,
+            cursor=pag.cursor,
+            sparse_fields=tuple(pag.fields) if pag.fields else None,
         )
+    except InvalidCursorException:
+        raise InvalidCursorHTTPException
     except UnitNotFoundException:
         raise UnitNotFoundHTTPException
     except StoreNotFoundException:
@@ -137,7 +231,110 @@ async def get_units(
         raise UnitReadInStoreForbiddenHTTPException
     except UnitReadInAllStoresForbiddenException:
         raise UnitReadInAllStoresForbiddenHTTPException
-    return StandardResponse(data=UnitsWithMainImageResponse(units=units))
+    return StandardResponse(data=UnitsWithMainImageResponse(units=units, next_cursor=next_cursor))
+
+
+@units_router.get(
+    "/batch",
+    description=get_md(
+        path_to_md_file="docs/get_units_batch_description.md",
+        admin_roles=", ".join(role.value for role in roles_is_administrations),
+        can_get_units=", ".join(role.value for role in roles_can_read_unit_in_store),
+    ),
+    response_model=StandardResponse[UnitsBatchResponse],
+    responses=exceptions_to_openapi(AccessForbiddenHTTPException),
+)
+async def get_units_batch(
+    db: DepDB,
+    payload: DepAccess,
+    query: Annotated[UnitsBatchQuery, Query()],
+) -> StandardResponse[UnitsBatchResponse]:
+    try:
+        units, not_found_ids = await UnitsService(db).get_units_batch(
+            unit_ids=tuple(query.ids),
+            user_roles_in_stores=payload.stores_roles,
+            user_role_in_company=payload.company_role,
+        )
+    except UnitReadInStoreForbiddenException:
+        raise AccessForbiddenHTTPException
+    return StandardResponse(data=UnitsBatchResponse(units=units, not_found_ids=not_found_ids))
+
+
+@units_router.get(
+    "/autocomplete",
+    description=get_md(
+        path_to_md_file="docs/get_units_autocomplete_description.md",
+        admin_roles=", ".join(role.value for role in roles_is_administrations),
+        can_get_units=", ".join(role.value for role in roles_can_read_unit_in_store),
+        cache_ttl=str(settings.UNITS_AUTOCOMPLETE_CACHE_TTL),
+        max_age=str(settings.UNITS_AUTOCOMPLETE_HTTP_MAX_AGE),
+    ),
+    response_model=StandardResponse[UnitsAutocompleteResponse],
+    responses=exceptions_to_openapi(AccessForbiddenHTTPException),
+)
+async def get_units_autocomplete(
+    db: DepDB,
+    cache: DepCache,
+    payload: DepAccess,
+    response: Response,
+    query: Annotated[UnitsAutocompleteQuery, Query()],
+    if_none_match: Annotated[
+        str | None,
+        Header(alias="If-None-Match", description="ETag из прошлого ответа"),
+    ] = None,
+) -> StandardResponse[UnitsAutocompleteResponse] | Response:
+    try:
+        autocomplete = await UnitsService(db=db, cache=cache).get_units_autocomplete(
+            store_id=query.store_id,
+            prefix=query.prefix,
+            limit=query.limit,
+            user_roles_in_stores=payload.stores_roles,
+            user_role_in_company=payload.company_role,
+        )
+    except UnitReadInStoreForbiddenException:
+        raise AccessForbiddenHTTPException
+
+    # meta ответа меняется при каждом запросе, поэтому ETag считается только по подсказкам
+    etag = make_etag(autocomplete.model_dump_json())
+    cache_headers = {
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={settings.UNITS_AUTOCOMPLETE_HTTP_MAX_AGE}",
+    }
+    if is_etag_match(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+    response.headers.update(cache_headers)
+    return StandardResponse(data=UnitsAutocompleteResponse(units=autocomplete.units))
+
+
+@units_router.get(
+    "/by-code/{code}",
+    description=get_md(
+        path_to_md_file="docs/get_unit_by_code_description.md",
+        admin_roles=", ".join(role.value for role in roles_is_administrations),
+        can_get_unit=", ".join(role.value for role in roles_can_read_unit_in_store),
+    ),
+    response_model=StandardResponse[UnitResponse],
+    responses=exceptions_to_openapi(UnitNotFoundHTTPException, AccessForbiddenHTTPException),
+)
+async def get_unit_by_code(
+    db: DepDB,
+    cache: DepCache,
+    payload: DepAccess,
+    code: Annotated[UnitCodeStr, Path()],
+    query: Annotated[UnitByCodeQuery, Query()],
+) -> StandardResponse[UnitResponse]:
+    try:
+        unit = await UnitsService(db=db, cache=cache).get_unit_by_code(
+            store_id=query.store_id,
+            code=code,
+            user_roles_in_stores=payload.stores_roles,
+            user_role_in_company=payload.company_role,
+        )
+    except UnitReadInStoreForbiddenException:
+        raise AccessForbiddenHTTPException
+    except UnitNotFoundException:
+        raise UnitNotFoundHTTPException
+    return StandardResponse(data=UnitResponse(unit=unit))
 
 
 @units_router.get(
@@ -161,6 +358,7 @@ async def get_unit(
             user_roles_in_stores=payload.stores_roles,
             user_role_in_company=payload.company_role,
             fields=fields,
+            sparse_fields=tuple(query.fields) if query.fields else None,
         )
     except UnitReadInStoreForbiddenException:
         raise AccessForbiddenHTTPException
@@ -169,6 +367,83 @@ async def get_unit(
     return StandardResponse(data=UnitWithFieldsResponse(unit=unit_with_fields))
 
 
+@units_router.get(
+    "/{unit_id}/transactions",
+    description=get_md(
+        path_to_md_file="docs/get_unit_transactions_description.md",
+        admin_roles=", ".join(role.value for role in roles_is_administrations),
+        can_get_unit=", ".join(role.value for role in roles_can_read_unit_in_store),
+    ),
+    response_model=StandardResponse[UnitTransactionsResponse],
+    responses=exceptions_to_openapi(
+        UnitNotFoundHTTPException, AccessForbiddenHTTPException, InvalidCursorHTTPException
+    ),
+)
+async def get_unit_transactions(
+    db: DepDB,
+    cache: DepCache,
+    payload: DepAccess,
+    unit_id: Annotated[IDInt, Path()],
+    query: Annotated[UnitTransactionsQuery, Query()],
+) -> StandardResponse[UnitTransactionsResponse]:
+    try:
+        unit_transactions = await UnitsService(db=db, cache=cache).get_unit_transactions(
+            unit_id=unit_id,
+            limit=query.limit,
+            cursor=query.cursor,
+            action=query.action,
+            created_from=query.created_from,
+            created_to=query.created_to,
+            user_roles_in_stores=payload.stores_roles,
+            user_role_in_company=payload.company_role,
+        )
+    except InvalidCursorException:
+        raise InvalidCursorHTTPException
+    except UnitReadInStoreForbiddenException:
+        raise AccessForbiddenHTTPException
+    except UnitNotFoundException:
+        raise UnitNotFoundHTTPException
+    return StandardResponse(data=UnitTransactionsResponse(unit_transactions=unit_transactions))
+
+
+@units_router.patch(
+    "",
+    description=get_md(
+        "docs/edit_units_bulk_description.md",
+        admin_roles=", ".join(role.value for role in roles_is_administrations),
+        can_edit_unit=", ".join(role.value for role in roles_can_write_unit_in_store),
+    ),
+    response_model=StandardResponse[UnitsResponse],
+    responses=exceptions_to_openapi(
+        UnitNotFoundHTTPException,
+        UnitModificationForbiddenHTTPException,
+        UnitImageNotFoundHTTPException,
+        UnitCodeAlreadyExistsHTTPException,
+    ),
+)
+async def edit_units_bulk(
+    db: DepDB,
+    cache: DepCache,
+    payload: DepAccess,
+    dto: EditUnitsBulkDTO,
+) -> StandardResponse[UnitsResponse]:
+    try:
+        units = await UnitsService(db=db, cache=cache).edit_units_bulk(
+            dto=dto,
+            user_roles_in_stores=payload.stores_roles,
+            user_role_in_company=payload.company_role,
+        )
+    except UnitModificationInStoreForbiddenException:
+        raise UnitModificationForbiddenHTTPException
+    except UnitNotFoundException as exc:
+        raise UnitNotFoundHTTPException(exc)
+    except UnitImageNotFoundException:
+        raise UnitImageNotFoundHTTPException
+    except UnitCodeAlreadyExistsException:
+        raise UnitCodeAlreadyExistsHTTPException
+    return StandardResponse(data=UnitsResponse(units=units))
+
+
 @units_router.patch(
     "/{unit_id}",
     description=get_md(
@@ -181,13 +456,18 @@ async def get_unit(
         UnitNotFoundHTTPException,
         UnitModificationForbiddenHTTPException,
         UnitImageNotFoundHTTPException,
+        UnitCodeAlreadyExistsHTTPException,
     ),
 )
 async def edit_unit(
-    db: DepDB, payload: DepAccess, dto: EditUnitDTO, unit_id: Annotated[IDInt, Path()]
+    db: DepDB,
+    cache: DepCache,
+    payload: DepAccess,
+    dto: EditUnitDTO,
+    unit_id: Annotated[IDInt, Path()],
 ) -> StandardResponse[UnitResponse]:
     try:
-        unit = await UnitsService(db).edit_unit(
+        unit = await UnitsService(db=db, cache=cache).edit_unit(
             dto=dto,
             unit_id=unit_id,
             user_roles_in_stores=payload.stores_roles,
@@ -199,6 +479,8 @@ async def edit_unit(
         raise UnitNotFoundHTTPException
     except UnitImageNotFoundException:
         raise UnitImageNotFoundHTTPException
+    except UnitCodeAlreadyExistsException:
+        raise UnitCodeAlreadyExistsHTTPException
     return StandardResponse(data=UnitResponse(unit=unit))
 
 
@@ -215,10 +497,14 @@ async def edit_unit(
     ),
 )
 async def delete_unit(
-    db: DepDB, s3: DepS3, payload: DepAccess, unit_id: Annotated[IDInt, Path()]
+    db: DepDB,
+    s3: DepS3,
+    cache: DepCache,
+    payload: DepAccess,
+    unit_id: Annotated[IDInt, Path()],
 ) -> NullDataResponse:
     try:
-        await UnitsService(db=db, s3=s3).delete_unit(
+        await UnitsService(db=db, s3=s3, cache=cache).delete_unit(
             unit_id=unit_id,
             user_roles_in_stores=payload.stores_roles,
             user_role_in_company=payload.company_role,
@@ -250,10 +536,14 @@ async def delete_unit(
     ),
 )
 async def upload_images(
-    db: DepDB, payload: DepAccess, result: DepUploadImages, unit_id: Annotated[IDInt, Path()]
+    db: DepDB,
+    cache: DepCache,
+    payload: DepAccess,
+    result: DepUploadImages,
+    unit_id: Annotated[IDInt, Path()],
 ) -> NullDataResponse:
     try:
-        await UnitsService(db=db).create_task_upload_images(
+        await UnitsService(db=db, cache=cache).create_task_upload_images(
             path_to_folder_with_images=result.path_to_folder_with_images,
             total_images=result.total_images,
             unit_id=unit_id,
@@ -288,12 +578,13 @@ async def upload_images(
 async def delete_unit_image(
     db: DepDB,
     s3: DepS3,
+    cache: DepCache,
     payload: DepAccess,
     unit_id: Annotated[IDInt, Path()],
     image_id: Annotated[IDInt, Path()],
 ) -> NullDataResponse:
     try:
-        await UnitsService(db=db, s3=s3).delete_unit_image(
+        await UnitsService(db=db, s3=s3, cache=cache).delete_unit_image(
             unit_id=unit_id,
             image_id=image_id,
             user_roles_in_stores=payload.stores_roles,
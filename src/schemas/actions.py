@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import date, datetime
 from typing import Annotated, Union, Self
 
 from pydantic import Field, model_validator
@@ -6,11 +6,17 @@ from pydantic import Field, model_validator
 from src.models.actions import ActionEnum
 from src.routers.http_exceptions.base import (
     UnitIdsDuplicateHTTPException,
+    ActionsStoreMismatchHTTPException,
+    AnalyticsRangeHTTPException,
+    CreatedRangeHTTPException,
+    SalesUnitIdOrCodeHTTPException,
+    SalesUnitIdCodeMixHTTPException,
 )
-from src.schemas.base import BaseSchema, PaginationItems
+from src.schemas.base import BaseSchema, PaginationItems, BaseSchemaOrigin
 from src.schemas.query import PaginationQuery
-from src.schemas.types import IDInt
+from src.schemas.types import IDInt, QueuedSaleStatus, AnalyticsBucket, ExportFormat, UnitCodeStr
 from src.schemas.unit_images import UnitImageDTO
+from src.utils.time_manager import get_utc_now
 
 ActionFilter = Annotated[
     ActionEnum | None,
@@ -27,6 +33,68 @@ class ActionsQuery(PaginationQuery):
             description="Получить транзакции конкретного магазина по id. Если не указано то всех.",
         ),
     ]
+    created_from: Annotated[
+        datetime | None, Field(None, description="Действия созданные не раньше, включительно")
+    ]
+    created_to: Annotated[
+        datetime | None, Field(None, description="Действия созданные не позже, включительно")
+    ]
+    cursor: Annotated[
+        str | None,
+        Field(
+            None,
+            max_length=200,
+            description="Курсор из pagination.nextCursor предыдущей страницы, offset игнорируется",
+        ),
+    ]
+
+    @model_validator(mode="after")
+    def validate_created_range(self) -> Self:
+        if self.created_from and self.created_to and self.created_from > self.created_to:
+            raise CreatedRangeHTTPException
+        return self
+
+
+class ActionsCursorDTO(BaseSchema):
+    """Последнее действие страницы, следующая страница начинается после него"""
+
+    created_at: datetime
+    id: int
+
+
+class ActionsExportQuery(BaseSchemaOrigin):
+    store_id: Annotated[
+        IDInt | None,
+        Field(None, description="Транзакции конкретного магазина. Если не указано то всех."),
+    ]
+    created_from: Annotated[datetime | None, Field(None, description="Создана не раньше")]
+    created_to: Annotated[datetime | None, Field(None, description="Создана не позже")]
+    format: Annotated[ExportFormat, Field(ExportFormat.ndjson, description="Формат файла")]
+
+    @model_validator(mode="after")
+    def validate_created_range(self) -> Self:
+        if self.created_from and self.created_to and self.created_from > self.created_to:
+            raise CreatedRangeHTTPException
+        return self
+
+
+ANALYTICS_MAX_RANGE_DAYS = 366 * 2
+
+
+class SalesAnalyticsQuery(BaseSchemaOrigin):
+    store_id: Annotated[IDInt, Field(description="Магазин")]
+    date_from: Annotated[date, Field(description="Первый день (UTC), включительно")]
+    date_to: Annotated[date, Field(description="Последний день (UTC), включительно")]
+    bucket: Annotated[
+        AnalyticsBucket, Field(AnalyticsBucket.week, description="Период группировки")
+    ]
+    by_unit: Annotated[bool, Field(False, description="Разбить каждый период по товарам")]
+
+    @model_validator(mode="after")
+    def validate_range(self) -> Self:
+        if not 0 <= (self.date_to - self.date_from).days <= ANALYTICS_MAX_RANGE_DAYS:
+            raise AnalyticsRangeHTTPException
+        return self
 
 
 class SalesTransaction(BaseSchema):
@@ -35,6 +103,21 @@ class SalesTransaction(BaseSchema):
     discount_price: Annotated[float, Field(ge=0.01)]
 
 
+class SalesRequestTransaction(BaseSchema):
+    """Товар продажи в запросе передается unit_id или code (артикул, штрихкод)"""
+
+    unit_id: Annotated[int | None, Field(None, ge=1)]
+    code: UnitCodeStr | None = None
+    quantity_delta: Annotated[float, Field(ge=0.01)]
+    discount_price: Annotated[float, Field(ge=0.01)]
+
+    @model_validator(mode="after")
+    def validate_unit_id_or_code(self) -> Self:
+        if (self.unit_id is None) == (self.code is None):
+            raise SalesUnitIdOrCodeHTTPException
+        return self
+
+
 class AddStockTransaction(BaseSchema):
     unit_id: Annotated[int, Field(ge=1)]
     quantity_delta: Annotated[float, Field(ge=0.01)]
@@ -83,8 +166,20 @@ TransactionUnion = Union[
 ]
 
 
+TRANSACTION_MODEL_MAP: dict[ActionEnum, type[TransactionUnion]] = {
+    ActionEnum.sales: SalesTransaction,
+    ActionEnum.addStock: AddStockTransaction,
+    ActionEnum.salesReturn: SalesReturnTransaction,
+    ActionEnum.writeOff: WriteOffTransaction,
+    ActionEnum.newPrice: NewPriceTransaction,
+    ActionEnum.stockReturn: StockReturnTransaction,
+}
+
+
 class AddActionDTO(BaseSchema):
-    transactions: list[TransactionUnion]
+    """Действие, у всех товаров которого известен unit_id"""
+
+    transactions: Annotated[list[TransactionUnion], Field(min_length=1)]
     store_id: IDInt
     action: ActionEnum
 
@@ -94,16 +189,7 @@ class AddActionDTO(BaseSchema):
         if len(unit_ids) != len(self.transactions):
             raise UnitIdsDuplicateHTTPException
 
-        transaction_model_map = {
-            "sales": SalesTransaction,
-            "addStock": AddStockTransaction,
-            "salesReturn": SalesReturnTransaction,
-            "writeOff": WriteOffTransaction,
-            "newPrice": NewPriceTransaction,
-            "stockReturn": StockReturnTransaction,
-        }
-
-        schema = transaction_model_map[self.action]
+        schema = TRANSACTION_MODEL_MAP[self.action]
 
         self.transactions = [
             schema.model_validate(tx, from_attributes=True) for tx in self.transactions
@@ -112,6 +198,50 @@ class AddActionDTO(BaseSchema):
         return self
 
 
+class AddActionRequestDTO(BaseSchema):
+    """
+    Тело запроса действия: товары продажи можно передать по code, сервис заменяет code
+    на unit_id и дальше работает с `AddActionDTO`.
+    Внутри одной продажи товары передаются либо все по unitId, либо все по code, поэтому
+    товар, переданный и по unitId, и по своему code, ловится проверкой дубликатов.
+    """
+
+    transactions: Annotated[list[SalesRequestTransaction | TransactionUnion], Field(min_length=1)]
+    store_id: IDInt
+    action: ActionEnum
+
+    @model_validator(mode="after")
+    def validate_transaction_fields(self) -> Self:
+        if self.action != ActionEnum.sales:
+            self.transactions = list(
+                AddActionDTO.model_validate(self, from_attributes=True).transactions
+            )
+            return self
+
+        transactions = [
+            SalesRequestTransaction.model_validate(tx, from_attributes=True)
+            for tx in self.transactions
+        ]
+        if len({transaction.code is None for transaction in transactions}) != 1:
+            raise SalesUnitIdCodeMixHTTPException
+        unit_keys = {transaction.unit_id or transaction.code for transaction in transactions}
+        if len(unit_keys) != len(transactions):
+            raise UnitIdsDuplicateHTTPException
+
+        self.transactions = list(transactions)
+        return self
+
+
+class AddActionsBulkDTO(BaseSchema):
+    actions: Annotated[list[AddActionRequestDTO], Field(min_length=1, max_length=500)]
+
+    @model_validator(mode="after")
+    def validate_same_store(self) -> Self:
+        if len({action.store_id for action in self.actions}) != 1:
+            raise ActionsStoreMismatchHTTPException
+        return self
+
+
 class AddActionTransactionToDbDTO(BaseSchema):
     quantity_delta: float | None
     cost_price: float | None
@@ -153,12 +283,159 @@ class ActionIdDTO(BaseSchema):
     id: int
 
 
+class BulkActionResultDTO(BaseSchema):
+    """Результат одного действия из пакета: action при успехе, error при ошибке"""
+
+    index: int
+    action: ActionIdDTO | None = None
+    error: str | None = None
+
+
+class ActionsBulkResponse(BaseSchema):
+    actions: list[BulkActionResultDTO]
+
+
+class ActionUnitCheckDTO(BaseSchema):
+    """Результат проверки товара при совершении действия"""
+
+    unit_id: int
+    store_id: int | None  # None если товар не найден
+    is_applied: bool  # False если товар не обновлен, например не хватило количества
+
+
+class AddActionResultDTO(ActionIdDTO):
+    units: list[ActionUnitCheckDTO]
+
+
 class ActionDTO(ActionIdDTO):
     title: ActionEnum
     created_at: datetime
     store_id: int
 
 
+class ActionTransactionExportDTO(BaseSchema):
+    """Строка выгрузки транзакций, порядок полей - порядок колонок csv"""
+
+    id: int
+    action_id: int
+    action: str
+    created_at: datetime
+    store_id: int
+    store_title: str
+    unit_id: int
+    unit_title: str
+    user_id: int
+    quantity_delta: float | None
+    cost_price: float | None
+    retail_price: float | None
+    previous_retail_price: float | None
+    discount_price: float | None
+
+
+class UnitDailyStatsDTO(BaseSchema):
+    """Итоги товара за день (UTC)"""
+
+    id: int
+    store_id: int
+    unit_id: int
+    day: date
+    sold_quantity: float
+    revenue: float
+    retail_revenue: float
+    cogs: float
+    returned_quantity: float
+    returned_revenue: float
+    returned_cost: float
+    written_off_quantity: float
+    written_off_cost: float
+
+
+class ActionsCounterDTO(BaseSchema):
+    """Часть счетчика действий магазина по типу, итог - сумма по slot"""
+
+    id: int
+    store_id: int
+    title: ActionEnum
+    slot: int
+    total: int
+
+
+class SalesAnalyticsRowDTO(BaseSchema):
+    """
+    Итоги периода магазина (unit_id = None) или товара за период.
+    revenue и cogs - за вычетом возвратов, discount - разница розничной цены и цены продажи.
+    cumulative_* - нарастающий итог с начала диапазона.
+    """
+
+    bucket: date
+    unit_id: int | None = None
+    sold_quantity: float
+    returned_quantity: float
+    revenue: float
+    returns: float
+    cogs: float
+    gross_margin: float
+    retail_revenue: float
+    discount: float
+    discount_depth: float | None
+    written_off_cost: float
+    cumulative_revenue: float
+    cumulative_gross_margin: float
+
+
+class SalesAnalyticsDTO(BaseSchema):
+    """date_from, date_to - диапазон, выровненный по границам периодов"""
+
+    store_id: int
+    bucket: AnalyticsBucket
+    date_from: date
+    date_to: date
+    rows: list[SalesAnalyticsRowDTO]
+
+
+class SalesAnalyticsResponse(BaseSchema):
+    analytics: SalesAnalyticsDTO
+
+
+class QueuedSaleEntryDTO(BaseSchema):
+    """
+    Продажа в очереди redis, ждет записи в базу воркером.
+    created_at - время постановки в очередь, с ним продажа записывается в базу и в итоги дня.
+    """
+
+    queue_id: str
+    user_id: int
+    action: AddActionDTO
+    created_at: datetime = Field(default_factory=get_utc_now)
+
+
+class QueuedSaleDTO(BaseSchema):
+    """
+    Статус продажи из очереди.
+    action заполняется после записи в базу, error - если продажа отклонена.
+    """
+
+    queue_id: str
+    store_id: int
+    status: QueuedSaleStatus
+    action: ActionIdDTO | None = None
+    error: str | None = None
+
+
+class QueuedSaleResponse(BaseSchema):
+    queued_sale: QueuedSaleDTO
+
+
+class IdempotentActionDTO(BaseSchema):
+    """
+    Запись ключа идемпотентности действия в кэше.
+    fingerprint - хэш тела запроса, action - None пока действие выполняется.
+    """
+
+    fingerprint: str
+    action: ActionIdDTO | QueuedSaleDTO | None = None
+
+
 class ActionResponse(BaseSchema):
     action: ActionIdDTO
 
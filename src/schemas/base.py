@@ -63,6 +63,9 @@ class Pagination(BaseSchema):
     total: Annotated[IDInt, Field(examples=[100])]
     offset: Annotated[int, Field(ge=0, le=2147483647, examples=[1])]
     limit: Annotated[int, Field(ge=1, le=50, examples=[50])]
+    next_cursor: Annotated[
+        str | None, Field(None, description="Курсор следующей страницы, если она может быть")
+    ]
 
 
 class PaginationItems(BaseSchema, Generic[ResponseType]):
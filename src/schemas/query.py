@@ -1,9 +1,23 @@
-from typing import Annotated
+from datetime import datetime
+from typing import Annotated, Self
 
-from pydantic import Field
+from pydantic import Field, model_validator
 
+from src.models.actions import ActionEnum
+from src.routers.http_exceptions.base import (
+    CreatedRangeHTTPException,
+    UnitsCursorSearchModeHTTPException,
+)
 from src.schemas.base import BaseSchemaOrigin
-from src.schemas.types import UnitField, SortOrder, SortUnitBy, IDInt, SortNotificationBy
+from src.schemas.types import (
+    UnitField,
+    SortOrder,
+    SortUnitBy,
+    IDInt,
+    SortNotificationBy,
+    UnitSearchMode,
+    UnitSparseField,
+)
 
 
 class PaginationQuery(BaseSchemaOrigin):
@@ -18,6 +32,32 @@ class PaginationQuery(BaseSchemaOrigin):
 
 class GetUnitQuery(BaseSchemaOrigin):
     field: Annotated[set[UnitField] | None, Field(None, description="Получить дополнительные поля")]
+    fields: Annotated[
+        set[UnitSparseField] | None,
+        Field(None, description="Получить только эти поля товара, по умолчанию все"),
+    ]
+
+
+class UnitsBatchQuery(BaseSchemaOrigin):
+    ids: Annotated[
+        set[IDInt],
+        Field(min_length=1, max_length=100, description="id товаров, например ids=1&ids=2"),
+    ]
+
+
+class UnitsAutocompleteQuery(BaseSchemaOrigin):
+    store_id: Annotated[IDInt, Field(description="Id магазина товаров")]
+    prefix: Annotated[
+        str,
+        Field(
+            min_length=1, max_length=100, description="Начало названия товара, без учета регистра"
+        ),
+    ]
+    limit: Annotated[int, Field(10, ge=1, le=20, description="Сколько подсказок вернуть")]
+
+
+class UnitByCodeQuery(BaseSchemaOrigin):
+    store_id: Annotated[IDInt, Field(description="Id магазина товара")]
 
 
 class UnitsQuery(PaginationQuery):
@@ -30,12 +70,58 @@ class UnitsQuery(PaginationQuery):
             description='Фильтр при запросе, любая строка например: "новый"',
         ),
     ]
+    search_mode: Annotated[
+        UnitSearchMode,
+        Field(
+            UnitSearchMode.contains,
+            description="contains - подстрока, similar - похожие слова с учетом опечаток",
+        ),
+    ]
     store_id: Annotated[IDInt | None, Field(None, description="Товары только одного магазина")]
     sort_order: Annotated[
         SortOrder,
         Field(SortOrder.desc, description="Порядок сортировки: desk по убываю, asc по возрастанию"),
     ]
     sort_by: Annotated[SortUnitBy, Field(SortUnitBy.id, description="Поле сортировки")]
+    fields: Annotated[
+        set[UnitSparseField] | None,
+        Field(None, description="Получить только эти поля товара, по умолчанию все"),
+    ]
+    cursor: Annotated[
+        str | None,
+        Field(
+            None,
+            max_length=500,
+            description="Курсор из nextCursor предыдущей страницы, offset игнорируется",
+        ),
+    ]
+
+    @model_validator(mode="after")
+    def validate_cursor_search_mode(self) -> Self:
+        if self.cursor and self.search_term and self.search_mode == UnitSearchMode.similar:
+            raise UnitsCursorSearchModeHTTPException
+        return self
+
+
+class UnitTransactionsQuery(BaseSchemaOrigin):
+    limit: Annotated[int, Field(50, ge=1, le=50, examples=[50])]
+    cursor: Annotated[
+        str | None,
+        Field(None, max_length=200, description="Курсор из nextCursor предыдущей страницы"),
+    ]
+    action: Annotated[ActionEnum | None, Field(None, description="Только транзакции этого типа")]
+    created_from: Annotated[
+        datetime | None, Field(None, description="Транзакции созданные не раньше, включительно")
+    ]
+    created_to: Annotated[
+        datetime | None, Field(None, description="Транзакции созданные не позже, включительно")
+    ]
+
+    @model_validator(mode="after")
+    def validate_created_range(self) -> Self:
+        if self.created_from and self.created_to and self.created_from > self.created_to:
+            raise CreatedRangeHTTPException
+        return self
 
 
 class NotificationsQuery(PaginationQuery):
@@ -34,6 +34,38 @@ class SortUnitBy(str, Enum):
     average_cost_price = "average_cost_price"
     retail_price = "retail_price"
     created_at = "created_at"
+    total_sold = "total_sold"
+    total_revenue = "total_revenue"
+    images_count = "images_count"
+
+
+class UnitSearchMode(str, Enum):
+    """
+    contains - подстрока в названии или описании
+    similar - похожие слова с опечатками, результат по убыванию похожести
+    """
+
+    contains = "contains"
+    similar = "similar"
+
+
+class QueuedSaleStatus(str, Enum):
+    pending = "pending"  # ждет записи в базу
+    applied = "applied"  # записана в базу
+    rejected = "rejected"  # отклонена при записи в базу
+
+
+class AnalyticsBucket(str, Enum):
+    """Период группировки аналитики, значение передается в date_trunc"""
+
+    day = "day"
+    week = "week"
+    month = "month"
+
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
 
 
 class UnitField(str, Enum):
@@ -42,9 +74,40 @@ class UnitField(str, Enum):
     main_image = "main_image"
 
 
+class UnitSparseField(str, Enum):
+    """Поля товара, которые можно запросить через fields: колонки товара и main_image"""
+
+    id = "id"
+    title_ = "title"
+    description = "description"
+    measurement = "measurement"
+    store_id = "store_id"
+    quantity = "quantity"
+    average_cost_price = "average_cost_price"
+    retail_price = "retail_price"
+    main_image_id = "main_image_id"
+    created_at = "created_at"
+    code = "code"
+    total_sold = "total_sold"
+    total_revenue = "total_revenue"
+    last_sold_at = "last_sold_at"
+    images_count = "images_count"
+    main_image = "main_image"
+
+
 TitleStr = Annotated[str, Field(min_length=3, max_length=100)]
 DescriptionStr = Annotated[str, Field(min_length=3, max_length=100)]
 IDInt = Annotated[int, Field(ge=1, le=2147483647)]
+UnitCodeStr = Annotated[
+    str,
+    Field(
+        min_length=1,
+        max_length=64,
+        pattern=r"^[\w.\-]+$",
+        description="Артикул или штрихкод товара, уникален в магазине",
+        examples=["4601234567890"],
+    ),
+]
 S3Key = Annotated[str, Field(min_length=0, max_length=255, description="Ключ для s3 хранилища")]
 
 
@@ -1,16 +1,17 @@
 from datetime import datetime
-from typing import Annotated
+from typing import Annotated, Any, Self
 
-from pydantic import Field, model_validator
+from pydantic import Field, model_validator, model_serializer, SerializerFunctionWrapHandler
 
 from src.models.actions import ActionEnum
 from src.models.units import UnitOfMeasurementEnum
 from src.routers.http_exceptions.base import (
     PatchFieldValidationHTTPException,
     PatchUnitFieldValidationHTTPException,
+    UnitsIdsDuplicateHTTPException,
 )
 from src.schemas.base import BaseSchema
-from src.schemas.types import IDInt, TitleStr, DescriptionStr
+from src.schemas.types import IDInt, TitleStr, DescriptionStr, SortUnitBy, SortOrder, UnitCodeStr
 from src.schemas.unit_images import UnitImageDTO
 
 # MeasurementLiteral = Literal[*[e.value for e in UnitOfMeasurement]]
@@ -30,15 +31,17 @@ class AddUnitDTO(BaseSchema):
             ge=1, description="Id магазина в котором будет создан товар, привязка товара к магазину"
         ),
     ]
+    code: UnitCodeStr | None = None
 
 
 class EditUnitDTO(BaseSchema):
-    """main_image_id может быть None"""
+    """main_image_id и code могут быть None"""
 
     title: TitleStr | None = None
     description: DescriptionStr | None = None
     main_image_id: IDInt | None = None
     measurement: Measurement | None = None
+    code: UnitCodeStr | None = None
 
     @model_validator(mode="after")
     def at_least_one_non_null(self):
@@ -48,11 +51,31 @@ class EditUnitDTO(BaseSchema):
             raise PatchFieldValidationHTTPException
 
         for key, value in data.items():
-            if not value and key != "main_image_id":
+            if not value and key not in ("main_image_id", "code"):
                 raise PatchUnitFieldValidationHTTPException
         return self
 
 
+class EditUnitBulkItemDTO(EditUnitDTO):
+    id: IDInt
+
+    @model_validator(mode="after")
+    def at_least_one_field_besides_id(self) -> Self:
+        if self.model_fields_set == {"id"}:
+            raise PatchFieldValidationHTTPException
+        return self
+
+
+class EditUnitsBulkDTO(BaseSchema):
+    units: Annotated[list[EditUnitBulkItemDTO], Field(min_length=1, max_length=100)]
+
+    @model_validator(mode="after")
+    def validate_unique_ids(self) -> Self:
+        if len({unit.id for unit in self.units}) != len(self.units):
+            raise UnitsIdsDuplicateHTTPException
+        return self
+
+
 class Action(BaseSchema):
     id: int
     quantity_delta: float | None
@@ -63,6 +86,38 @@ class Action(BaseSchema):
     created_at: datetime
 
 
+class UnitTransactionDTO(Action):
+    action_id: int
+
+
+class UnitTransactionsCursorDTO(BaseSchema):
+    """Последняя транзакция страницы, следующая страница начинается после нее"""
+
+    created_at: datetime
+    id: int
+
+
+class UnitTransactionsSummaryDTO(BaseSchema):
+    """Итоги по всем транзакциям товара с учетом фильтров, не только по странице"""
+
+    transactions_count: int
+    total_sold: float
+    total_returned: float
+    last_sold_at: datetime | None
+
+
+class UnitTransactionsDTO(BaseSchema):
+    transactions: list[UnitTransactionDTO]
+    summary: UnitTransactionsSummaryDTO
+    next_cursor: Annotated[
+        str | None, Field(None, description="Курсор следующей страницы, если она может быть")
+    ]
+
+
+class UnitTransactionsResponse(BaseSchema):
+    unit_transactions: UnitTransactionsDTO
+
+
 class UnitDTO(BaseSchema):
     id: int
     title: str
@@ -74,12 +129,50 @@ class UnitDTO(BaseSchema):
     retail_price: float
     main_image_id: int | None
     created_at: datetime
+    code: str | None = None
+    total_sold: float = 0
+    total_revenue: float = 0
+    last_sold_at: datetime | None = None
+    images_count: int = 0
 
 
 class UnitWithMainImageDTO(UnitDTO):
     main_image: UnitImageDTO | None
 
 
+class UnitPartialDTO(BaseSchema):
+    """
+    Товар только с запрошенными полями (query параметр fields).
+    В ответ попадают только заполненные поля, а не все поля схемы со значением null.
+    """
+
+    id: int
+    title: str | None = None
+    description: str | None = None
+    measurement: UnitOfMeasurementEnum | None = None
+    store_id: int | None = None
+    quantity: float | None = None
+    average_cost_price: float | None = None
+    retail_price: float | None = None
+    main_image_id: int | None = None
+    created_at: datetime | None = None
+    code: str | None = None
+    total_sold: float | None = None
+    total_revenue: float | None = None
+    last_sold_at: datetime | None = None
+    images_count: int | None = None
+    main_image: UnitImageDTO | None = None
+
+    @model_serializer(mode="wrap")
+    def serialize_selected(self, handler: SerializerFunctionWrapHandler) -> dict[str, Any]:
+        data: dict[str, Any] = handler(self)
+        model_fields = type(self).model_fields
+        selected = {
+            key for name in self.model_fields_set for key in (name, model_fields[name].alias)
+        }
+        return {key: value for key, value in data.items() if key in selected}
+
+
 class UnitResponse(BaseSchema):
     unit: UnitDTO
 
@@ -90,13 +183,79 @@ class UnitWithFieldsDTO(UnitDTO):
     main_image: UnitImageDTO | None = None
 
 
+class UnitWithFieldsPartialDTO(UnitPartialDTO):
+    # читается всегда, по нему проверяется доступ к товару
+    store_id: int  # type: ignore reportIncompatibleVariableOverride
+    transactions: list[Action] | None = None
+    images: list[UnitImageDTO] | None = None
+
+
 class UnitWithFieldsResponse(BaseSchema):
-    unit: UnitWithFieldsDTO
+    unit: UnitWithFieldsDTO | UnitWithFieldsPartialDTO
 
 
 class UnitsResponse(BaseSchema):
     units: list[UnitDTO]
 
 
-class UnitsWithMainImageResponse(BaseSchema):
+class UnitsBatchResponse(BaseSchema):
     units: list[UnitWithMainImageDTO]
+    not_found_ids: Annotated[list[int], Field(description="id товаров, которых нет")]
+
+
+class UnitsWithMainImageResponse(BaseSchema):
+    units: list[UnitWithMainImageDTO | UnitPartialDTO]
+    next_cursor: Annotated[
+        str | None, Field(None, description="Курсор следующей страницы, если она может быть")
+    ]
+
+
+class UnitsPageDTO(BaseSchema):
+    """Страница списка товаров магазина в кэше"""
+
+    units: list[UnitWithMainImageDTO | UnitPartialDTO]
+    next_cursor: str | None = None
+
+
+class UnitTitleDTO(BaseSchema):
+    id: int
+    title: str
+
+
+class UnitsAutocompleteDTO(BaseSchema):
+    """Подсказки названий товаров по префиксу, так же хранятся в кэше"""
+
+    units: list[UnitTitleDTO]
+
+
+class UnitsAutocompleteResponse(BaseSchema):
+    units: list[UnitTitleDTO]
+
+
+class UnitsCursorDTO(BaseSchema):
+    """
+    Последний товар страницы, следующая страница начинается после него.
+    value - значение поля сортировки строкой, в запросе приводится к типу колонки.
+    """
+
+    sort_by: SortUnitBy
+    sort_order: SortOrder
+    value: str
+    id: int
+
+
+class UnitsImportErrorDTO(BaseSchema):
+    line: Annotated[int, Field(description="Номер строки файла, заголовок - строка 1")]
+    error: str
+
+
+class UnitsImportResultDTO(BaseSchema):
+    """Если есть ошибки, ни один товар не импортирован"""
+
+    imported: int
+    action_id: int | None = None
+    errors: list[UnitsImportErrorDTO] = []
+
+
+class UnitsImportResponse(BaseSchema):
+    result: UnitsImportResultDTO
@@ -1,193 +1,654 @@
-from collections import defaultdict, Counter
-from typing import cast
+import asyncio
+import csv
+import hashlib
+import io
+import json
+from collections import Counter, defaultdict
+from contextlib import asynccontextmanager, suppress
+from datetime import date, datetime, timedelta, timezone
+from typing import AsyncGenerator, AsyncIterator, cast
+from uuid import uuid4
 
-from src.exceptions.base import UnitOutOfStockException
-from src.exceptions.conflict import IdDuplicateException, UnitBelongAnotherStoreException
+from src.config import settings
+from src.exceptions.base import UnitOutOfStockException, ObjectAlreadyExistsException
+from src.exceptions.conflict import (
+    IdDuplicateException,
+    UnitBelongAnotherStoreException,
+    IdempotencyKeyInProgressException,
+    IdempotencyKeyReusedException,
+)
 from src.exceptions.forbidden import (
     ActionAccessForbiddenException,
     StoreAccessForbiddenException,
     AllStoresAccessForbiddenException,
 )
 from src.exceptions.not_found import (
+    ForeignKeyNotFoundException,
+    StoreNotFoundException,
     UnitNotFoundException,
     ObjectNotFoundException,
     ActionNotFoundException,
+    QueuedSaleNotFoundException,
 )
+from src.logging_config import logger
 from src.models.actions import ActionEnum
 from src.models.users import RoleUserInStoreEnum, RoleUserInCompanyEnum
 from src.schemas.actions import (
     ActionWithTransactionsDTO,
     ActionWithUnitsTransactionsDTO,
     AddActionDTO,
+    AddActionRequestDTO,
     ActionIdDTO,
+    AddActionResultDTO,
+    AddActionsBulkDTO,
+    BulkActionResultDTO,
+    IdempotentActionDTO,
+    QueuedSaleDTO,
+    QueuedSaleEntryDTO,
     ActionFilter,
     ActionDTO,
     SalesTransaction,
-    WriteOffTransaction,
-    StockReturnTransaction,
+    SalesRequestTransaction,
+    SalesAnalyticsDTO,
+    ActionTransactionExportDTO,
+    ActionsCursorDTO,
 )
 from src.schemas.base import Pagination
-from src.schemas.units import UnitDTO
+from src.schemas.types import QueuedSaleStatus, AnalyticsBucket, ExportFormat
 from src.services.base import BaseService
 from src.services.helpers.access_roles import (
-    roles_can_sales,
-    roles_can_add_stock,
-    roles_can_sales_return,
-    roles_can_write_off,
-    roles_can_new_price,
-    roles_can_stock_return,
+    roles_can_action,
     roles_can_read_action_in_store,
     roles_is_administrations,
 )
 from src.services.stores import StoresService
 from src.utils.cache.decorators import cache_service_method_by_id
+from src.utils.cursor import encode_cursor, decode_cursor
+from src.utils.time_manager import get_utc_now, get_bucket_bounds
+
+IDEMPOTENCY_POLL_INTERVAL = 0.05  # как часто дубликат запроса проверяет результат, секунды
+# действия, которые меняют итоги unit_daily_stats
+DAILY_STATS_ACTIONS = (ActionEnum.sales, ActionEnum.salesReturn, ActionEnum.writeOff)
 
 
 class ActionsService(BaseService):
+    def check_user_role_action_in_store(
+        self,
+        action: ActionEnum,
+        store_id: int,
+        user_roles_in_stores: dict[int, RoleUserInStoreEnum],
+        user_role_in_company: RoleUserInCompanyEnum,
+    ) -> None:
+        """
+        Проверка роли доступа к действию в конкретном store
+        :raise ActionAccessForbiddenException: Если нет прав на совершение действия.
+        """
+        if user_role_in_company not in roles_is_administrations:
+            if user_roles_in_stores.get(store_id) not in roles_can_action[action]:
+                raise ActionAccessForbiddenException(action)
+
     async def add_action(
         self,
         user_id: int,
-        dto: AddActionDTO,
+        dto: AddActionRequestDTO,
         user_roles_in_stores: dict[int, RoleUserInStoreEnum],
         user_role_in_company: RoleUserInCompanyEnum,
-    ) -> ActionIdDTO:
+    ) -> ActionIdDTO | QueuedSaleDTO:
         """
+        При settings.SALES_WRITE_BEHIND продажа ставится в очередь redis и возвращается ее статус,
+        см. `enqueue_sales`. Остальные действия сразу записываются в базу.
+        Товары продажи, переданные по code, заменяются на unit_id, см. `_resolve_unit_codes`.
         :raise StoreNotFoundException: Если магазин с указанным ID не найден.
         :raise ActionAccessForbiddenException: Если нет прав на совершение действия.
-        :raise UnitReadInStoreForbiddenException: Если передан хотя бы один товар принадлежащий другому store.
         :raise IdDuplicateException: Если переданы дубликаты `unit_id`
-        :raise UnitNotFoundException: Если хотя бы один товар с указанными ID не найдены.
+        :raise UnitNotFoundException: Если хотя бы один товар с указанными ID или code не найдены.
         :raise UnitBelongAnotherStoreException: Если передан хотя бы один товар принадлежащий другому store.
         :raise UnitOutOfStockException: Если *вычитаемое* количество товара больше доступного.
         """
+        result, action = await self._add_action_and_commit(
+            user_id=user_id,
+            dto=dto,
+            user_roles_in_stores=user_roles_in_stores,
+            user_role_in_company=user_role_in_company,
+        )
+        if isinstance(result, ActionIdDTO):
+            await self._after_action_commit(action)
+        return result
 
-        def check_role_in_store(roles_can: set[RoleUserInStoreEnum]):
-            """Проверка роли доступа к действию"""
-            if user_role_in_company not in roles_is_administrations:
-                role_in_store = user_roles_in_stores.get(dto.store_id)
-                if role_in_store not in roles_can:
-                    raise ActionAccessForbiddenException(dto.action)
+    async def add_action_with_idempotency_key(
+        self,
+        idempotency_key: str,
+        user_id: int,
+        dto: AddActionRequestDTO,
+        user_roles_in_stores: dict[int, RoleUserInStoreEnum],
+        user_role_in_company: RoleUserInCompanyEnum,
+    ) -> ActionIdDTO | QueuedSaleDTO:
+        """
+        Совершает действие один раз для пары (user_id, idempotency_key).
+        - Первый запрос занимает ключ в кэше и сохраняет результат после commit.
+        - Повтор возвращает сохраненный результат без обращения к базе данных.
+        - Дубликаты, пришедшие во время выполнения первого запроса, ждут его результат.
+        - Пока действие выполняется, ключ продлевается, см. `_keep_idempotency_lock`.
+        - Если действие завершилось ошибкой до commit, ключ освобождается и запрос можно повторить.
+          Результат сохраняется до инвалидации кэшей после commit: их ошибка не освобождает ключ
+          и повтор не запишет действие второй раз.
+        :raise IdempotencyKeyReusedException: Если ключ использован с другим телом запроса.
+        :raise IdempotencyKeyInProgressException: Если результат первого запроса не дождались.
+        Остальные исключения как у `add_action`.
+        """
+        fingerprint = hashlib.sha256(dto.model_dump_json().encode()).hexdigest()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.ACTION_IDEMPOTENCY_WAIT_SECONDS
+        lock = IdempotentActionDTO(fingerprint=fingerprint)
 
-        async def check_units_exist_and_belong_store(
-            check_ids: tuple[int, ...], store_id: int
-        ) -> list[UnitDTO]:
-            """
-            Проверяет:
-                - что переданы только уникальные `unit_id`
-                - все `unit_id` существуют
-                - принадлежат переданному `store_id`
-            :raise IdDuplicateException: Если переданы дубликаты `unit_id`
-            :raise UnitNotFoundException: Если хотя бы один товар с указанными ID не найдены.
-            :raise UnitBelongAnotherStoreException: Если передан хотя бы один товар принадлежащий другому store.
-            """
+        while not await self.cache.actions.lock_idempotent_action(
+            user_id=user_id,
+            idempotency_key=idempotency_key,
+            dto=lock,
+            ttl=settings.ACTION_IDEMPOTENCY_LOCK_TTL,
+        ):
+            stored = await self.cache.actions.get_idempotent_action_or_none(
+                user_id=user_id, idempotency_key=idempotency_key
+            )
+            if stored is not None:
+                if stored.fingerprint != fingerprint:
+                    raise IdempotencyKeyReusedException
+                if stored.action is not None:
+                    return stored.action
+            if loop.time() >= deadline:
+                raise IdempotencyKeyInProgressException
+            await asyncio.sleep(IDEMPOTENCY_POLL_INTERVAL)
 
-            # проверка на дубликаты
-            unique_ids = set(check_ids)
-            if len(check_ids) != len(unique_ids):
-                duplicates = [i for i, count in Counter(check_ids).items() if count > 1]
-                raise IdDuplicateException(", ".join(map(str, duplicates)))
+        try:
+            async with self._keep_idempotency_lock(
+                user_id=user_id, idempotency_key=idempotency_key, dto=lock
+            ):
+                result, action = await self._add_action_and_commit(
+                    user_id=user_id,
+                    dto=dto,
+                    user_roles_in_stores=user_roles_in_stores,
+                    user_role_in_company=user_role_in_company,
+                )
+        except Exception:
+            await self.cache.actions.delete_idempotent_action(
+                user_id=user_id, idempotency_key=idempotency_key
+            )
+            await self.cache.commit()
+            raise
 
-            units = await self.db.units.get_all_by_ids(*unique_ids)
+        await self.cache.actions.add_idempotent_action(
+            user_id=user_id,
+            idempotency_key=idempotency_key,
+            dto=IdempotentActionDTO(fingerprint=fingerprint, action=result),
+            ttl=settings.ACTION_IDEMPOTENCY_KEY_TTL,
+        )
+        await self.cache.commit()
+        if isinstance(result, ActionIdDTO):
+            await self._after_action_commit(action)
+        return result
 
-            existing_ids: set[int] = set()
-            foreign_ids: set[int] = set()
-            for unit in units:
-                existing_ids.add(unit.id)
-                if unit.store_id != store_id:
-                    foreign_ids.add(unit.id)
+    async def _add_action_and_commit(
+        self,
+        user_id: int,
+        dto: AddActionRequestDTO,
+        user_roles_in_stores: dict[int, RoleUserInStoreEnum],
+        user_role_in_company: RoleUserInCompanyEnum,
+    ) -> tuple[ActionIdDTO | QueuedSaleDTO, AddActionDTO]:
+        """
+        Проверяет права, ставит продажу в очередь или записывает действие в базу с commit.
+        Кэши не инвалидируются: после записи в базу (ActionIdDTO) вызвать `_after_action_commit`.
+        :return: результат и действие с unit_id вместо code
+        Исключения как у `add_action`.
+        """
+        self.check_user_role_action_in_store(
+            action=dto.action,
+            store_id=dto.store_id,
+            user_roles_in_stores=user_roles_in_stores,
+            user_role_in_company=user_role_in_company,
+        )
+        action = await self._resolve_unit_codes(dto)
+        if settings.SALES_WRITE_BEHIND and action.action == ActionEnum.sales:
+            return await self.enqueue_sales(user_id=user_id, dto=action), action
 
-            missing_ids = unique_ids - existing_ids
-            if missing_ids:
-                raise UnitNotFoundException(", ".join(map(str, missing_ids)))
+        action_id = await self._add_action(user_id=user_id, dto=action)
+        await self.db.commit()
+        return action_id, action
 
+    async def _after_action_commit(self, action: AddActionDTO) -> None:
+        """Инвалидирует кэши товаров, остатков очереди, аналитики и списков после commit действия"""
+        await self._delete_cached_units(action)
+        await self._reset_sales_queue_stock(action)
+        await self._bump_sales_analytics_version(action)
+        await self.cache.units.bump_list_version(action.store_id)
+
+    @asynccontextmanager
+    async def _keep_idempotency_lock(
+        self, user_id: int, idempotency_key: str, dto: IdempotentActionDTO
+    ) -> AsyncGenerator[None, None]:
+        """
+        Продлевает занятый ключ идемпотентности на settings.ACTION_IDEMPOTENCY_LOCK_TTL каждую
+        треть ttl, пока выполняется действие: медленное действие не отпустит ключ по ttl и
+        дубликат запроса не выполнит его второй раз.
+        """
+
+        async def extend() -> None:
+            while True:
+                await asyncio.sleep(settings.ACTION_IDEMPOTENCY_LOCK_TTL / 3)
+                try:
+                    await self.cache.actions.extend_idempotent_action_lock(
+                        user_id=user_id,
+                        idempotency_key=idempotency_key,
+                        dto=dto,
+                        ttl=settings.ACTION_IDEMPOTENCY_LOCK_TTL,
+                    )
+                except Exception as exc:
+                    logger.warning(f"Ключ идемпотентности не продлен: {exc}")
+
+        task = asyncio.create_task(extend())
+        try:
+            yield
+        finally:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+
+    async def add_actions_bulk(
+        self,
+        user_id: int,
+        dto: AddActionsBulkDTO,
+        user_roles_in_stores: dict[int, RoleUserInStoreEnum],
+        user_role_in_company: RoleUserInCompanyEnum,
+    ) -> list[BulkActionResultDTO]:
+        """
+        Совершает несколько действий одного магазина в одной транзакции базы данных.
+        Права проверяются для всех действий до записи. Каждое действие выполняется в своем
+        savepoint: ошибка по товарам откатывает только это действие и попадает в его результат.
+        :raise StoreNotFoundException: Если магазин с указанным ID не найден.
+        :raise ActionAccessForbiddenException: Если нет прав хотя бы на одно действие.
+        """
+        for action in dto.actions:
+            self.check_user_role_action_in_store(
+                action=action.action,
+                store_id=action.store_id,
+                user_roles_in_stores=user_roles_in_stores,
+                user_role_in_company=user_role_in_company,
+            )
+
+        results: list[BulkActionResultDTO] = []
+        actions: list[AddActionDTO] = []
+        for index, request_action in enumerate(dto.actions):
+            try:
+                action = await self._resolve_unit_codes(request_action)
+                actions.append(action)
+                async with self.db.savepoint():
+                    action_id = await self._add_action(user_id=user_id, dto=action)
+            except (
+                IdDuplicateException,
+                UnitNotFoundException,
+                UnitBelongAnotherStoreException,
+                UnitOutOfStockException,
+            ) as exc:
+                results.append(BulkActionResultDTO(index=index, error=exc.details))
+            else:
+                results.append(BulkActionResultDTO(index=index, action=action_id))
+
+        await self.db.commit()
+        await self._delete_cached_units(*actions)
+        for action in actions:
+            await self._reset_sales_queue_stock(action)
+        await self._bump_sales_analytics_version(*actions)
+        await self.cache.units.bump_list_version(*(action.store_id for action in dto.actions))
+        return results
+
+    async def enqueue_sales(self, user_id: int, dto: AddActionDTO) -> QueuedSaleDTO:
+        """
+        Ставит продажу в очередь redis (write-behind), права доступа должны быть проверены до вызова.
+        Остатки проверяются и уменьшаются в redis, база нужна только если остатка товара еще нет в redis.
+        В базу продажу записывает воркер `flush_sales_queue`, статус читается через `get_queued_sale`.
+        :raise UnitNotFoundException: Если хотя бы один товар с указанными ID не найдены.
+        :raise UnitBelongAnotherStoreException: Если передан хотя бы один товар принадлежащий другому store.
+        :raise UnitOutOfStockException: Если *вычитаемое* количество товара больше доступного.
+        """
+        status = QueuedSaleDTO(
+            queue_id=uuid4().hex, store_id=dto.store_id, status=QueuedSaleStatus.pending
+        )
+        entry = QueuedSaleEntryDTO(queue_id=status.queue_id, user_id=user_id, action=dto)
+
+        # остаток может удалиться другим действием между заведением и постановкой, тогда повторяем
+        while missing_ids := await self.cache.sales_queue.enqueue_sale(
+            entry=entry, status=status, status_ttl=settings.SALES_QUEUE_STATUS_TTL
+        ):
+            units = await self.db.units.get_all_by_ids(*missing_ids)
+            found_ids = {unit.id for unit in units}
+            not_found_ids = [unit_id for unit_id in missing_ids if unit_id not in found_ids]
+            if not_found_ids:
+                raise UnitNotFoundException(", ".join(map(str, not_found_ids)))
+
+            foreign_ids = [unit.id for unit in units if unit.store_id != dto.store_id]
             if foreign_ids:
                 raise UnitBelongAnotherStoreException(", ".join(map(str, foreign_ids)))
 
-            return units
+            await self.cache.sales_queue.seed_stock(
+                store_id=dto.store_id, quantities={unit.id: unit.quantity for unit in units}
+            )
 
-        def check_quantity_positive(
-            check_units: list[UnitDTO],
-            transactions: tuple[
-                SalesTransaction | WriteOffTransaction | StockReturnTransaction, ...
-            ],
-        ):
-            """проверяет что количество товара не становится меньше 0"""
-            quantity_delta_map: defaultdict[int, float] = defaultdict(float)
-            for _transaction in transactions:
-                quantity_delta_map[_transaction.unit_id] += _transaction.quantity_delta
-            for _unit in check_units:
-                remaining_quantity = _unit.quantity - quantity_delta_map[_unit.id]
-                if remaining_quantity < 0:
-                    raise UnitOutOfStockException
+        return status
 
-        unit_ids = tuple(transaction.unit_id for transaction in dto.transactions)
+    async def get_queued_sale(
+        self,
+        queue_id: str,
+        user_roles_in_stores: dict[int, RoleUserInStoreEnum],
+        user_role_in_company: RoleUserInCompanyEnum,
+    ) -> QueuedSaleDTO:
+        """
+        :raise QueuedSaleNotFoundException: Если продажи нет в очереди или статус истек.
+        :raise StoreAccessForbiddenException: Если нет прав чтения действий в store.
+        """
+        status = await self.cache.sales_queue.get_status_or_none(queue_id=queue_id)
+        if status is None:
+            raise QueuedSaleNotFoundException(queue_id)
+        if user_role_in_company not in roles_is_administrations:
+            if user_roles_in_stores.get(status.store_id) not in roles_can_read_action_in_store:
+                raise StoreAccessForbiddenException
+        return status
 
-        match dto.action:
-            case ActionEnum.addStock:
-                check_role_in_store(roles_can_add_stock)
-                await check_units_exist_and_belong_store(check_ids=unit_ids, store_id=dto.store_id)
-                action_id = await self.db.actions_transactions.add_stock(user_id=user_id, data=dto)
+    async def flush_sales_queue(self, batch_size: int) -> int:
+        """
+        Записывает продажи из очереди redis в базу, по batch_size продаж в одной транзакции.
+        Каждая продажа выполняется в своем savepoint: ошибка отклоняет только эту продажу.
+        Продажи, уже записанные в базу (по queue_id), повторно не записываются.
+        Продажа записывается со временем постановки в очередь, а не временем записи.
+        :return: количество разобранных продаж, 0 если очередь разбирает другой воркер.
+        """
+        token = uuid4().hex
+        if not await self.cache.sales_queue.lock(token=token, ttl=settings.SALES_QUEUE_LOCK_TTL):
+            return 0
 
-            case ActionEnum.sales:
-                check_role_in_store(roles_can_sales)
-                units = await check_units_exist_and_belong_store(
-                    check_ids=unit_ids, store_id=dto.store_id
-                )
-                sales_transactions: list[SalesTransaction] = cast(
-                    list[SalesTransaction], dto.transactions
-                )
-                check_quantity_positive(check_units=units, transactions=tuple(sales_transactions))
-                action_id = await self.db.actions_transactions.sales(
-                    user_id=user_id,
-                    store_id=dto.store_id,
-                    action=dto.action,
-                    sales_transactions=sales_transactions,
+        flushed = 0
+        try:
+            while entries := await self.cache.sales_queue.get_entries(count=batch_size):
+                applied = await self.db.actions.get_action_ids_by_queue_ids(
+                    *(entry.queue_id for _, entry in entries)
                 )
+                completed: list[tuple[str, QueuedSaleEntryDTO, QueuedSaleDTO]] = []
+                for stream_id, entry in entries:
+                    status = QueuedSaleDTO(
+                        queue_id=entry.queue_id,
+                        store_id=entry.action.store_id,
+                        status=QueuedSaleStatus.applied,
+                    )
+                    if entry.queue_id in applied:
+                        status.action = ActionIdDTO(id=applied[entry.queue_id])
+                    else:
+                        try:
+                            async with self.db.savepoint():
+                                status.action = await self._add_action(
+                                    user_id=entry.user_id,
+                                    dto=entry.action,
+                                    queue_id=entry.queue_id,
+                                    created_at=entry.created_at,
+                                )
+                        except ObjectAlreadyExistsException:
+                            # записана другим воркером после проверки applied
+                            applied.update(
+                                await self.db.actions.get_action_ids_by_queue_ids(entry.queue_id)
+                            )
+                            status.action = ActionIdDTO(id=applied[entry.queue_id])
+                        except (
+                            StoreNotFoundException,
+                            IdDuplicateException,
+                            UnitNotFoundException,
+                            UnitBelongAnotherStoreException,
+                            UnitOutOfStockException,
+                        ) as exc:
+                            status.status = QueuedSaleStatus.rejected
+                            status.error = exc.details
+                    completed.append((stream_id, entry, status))
 
-            case ActionEnum.salesReturn:
-                check_role_in_store(roles_can_sales_return)
-                await check_units_exist_and_belong_store(check_ids=unit_ids, store_id=dto.store_id)
-                action_id = await self.db.actions_transactions.sales_return(
-                    user_id=user_id, data=dto
+                await self.db.commit()
+                await self._delete_cached_units(
+                    *(
+                        entry.action
+                        for _, entry, status in completed
+                        if status.status == QueuedSaleStatus.applied
+                    )
                 )
-
-            case ActionEnum.writeOff:
-                check_role_in_store(roles_can_write_off)
-                units = await check_units_exist_and_belong_store(
-                    check_ids=unit_ids, store_id=dto.store_id
+                await self.cache.sales_queue.complete_entries(
+                    completed=completed, status_ttl=settings.SALES_QUEUE_STATUS_TTL
                 )
-                write_off_transactions: list[WriteOffTransaction] = cast(
-                    list[WriteOffTransaction], dto.transactions
+                await self._bump_sales_analytics_version(
+                    *(
+                        entry.action
+                        for _, entry, status in completed
+                        if status.status == QueuedSaleStatus.applied
+                    )
                 )
-                check_quantity_positive(
-                    check_units=units, transactions=tuple(write_off_transactions)
+                # продажа, поставленная в очередь до полуночи, меняет уже закрытый день
+                today = get_utc_now().date()
+                if any(
+                    entry.created_at.astimezone(timezone.utc).date() < today
+                    for _, entry, status in completed
+                    if status.status == QueuedSaleStatus.applied
+                ):
+                    await self.cache.analytics.bump_rebuild_version()
+                await self.cache.units.bump_list_version(
+                    *(
+                        entry.action.store_id
+                        for _, entry, status in completed
+                        if status.status == QueuedSaleStatus.applied
+                    )
                 )
-                action_id = await self.db.actions_transactions.write_off(user_id=user_id, data=dto)
+                flushed += len(entries)
+                if not await self.cache.sales_queue.extend_lock(
+                    token=token, ttl=settings.SALES_QUEUE_LOCK_TTL
+                ):
+                    break  # блокировка истекла, очередь мог взять другой воркер
+        finally:
+            await self.cache.sales_queue.unlock(token=token)
+        return flushed
 
-            case ActionEnum.newPrice:
-                check_role_in_store(roles_can_new_price)
-                await check_units_exist_and_belong_store(check_ids=unit_ids, store_id=dto.store_id)
-                action_id = await self.db.actions_transactions.new_price(user_id=user_id, data=dto)
+    async def reconcile_sales_queue_stock(self) -> dict[int, float]:
+        """
+        Сверяет остатки в redis с базой: остаток = units.quantity - продажи в очереди.
+        Выполняется под блокировкой воркера очереди, пока продажи не записываются в базу.
+        Остатки удаленных товаров удаляются.
+        :return: {unit_id: расхождение} исправленных остатков, пусто если очередь занята.
+        """
+        token = uuid4().hex
+        if not await self.cache.sales_queue.lock(token=token, ttl=settings.SALES_QUEUE_LOCK_TTL):
+            return {}
+
+        drifts: dict[int, float] = {}
+        try:
+            stores_units: dict[int, list[int]] = defaultdict(list)
+            for store_id, unit_id in await self.cache.sales_queue.get_stock_keys():
+                stores_units[store_id].append(unit_id)
 
-            case ActionEnum.stockReturn:
-                check_role_in_store(roles_can_stock_return)
-                units = await check_units_exist_and_belong_store(
-                    check_ids=unit_ids, store_id=dto.store_id
+            for store_id, unit_ids in stores_units.items():
+                units = await self.db.units.get_all_by_ids(*unit_ids, store_id=store_id)
+                quantities = {unit.id: unit.quantity for unit in units}
+                await self.cache.sales_queue.delete_stock(
+                    store_id, *(unit_id for unit_id in unit_ids if unit_id not in quantities)
                 )
-                stock_return_transactions: list[StockReturnTransaction] = cast(
-                    list[StockReturnTransaction], dto.transactions
+                drifts.update(
+                    await self.cache.sales_queue.reconcile_stock(
+                        store_id=store_id, quantities=quantities
+                    )
                 )
-                check_quantity_positive(
-                    check_units=units, transactions=tuple(stock_return_transactions)
+            await self.cache.commit()
+        finally:
+            await self.cache.sales_queue.unlock(token=token)
+
+        if drifts:
+            logger.warning(f"Очередь продаж: исправлены остатки в redis {drifts}")
+        return drifts
+
+    async def _resolve_unit_codes(self, dto: AddActionRequestDTO) -> AddActionDTO:
+        """
+        Заменяет code товаров продажи на unit_id одним запросом к базе по (store_id, code).
+        Кэш кодов не используется: устаревшая запись не должна продать другой товар.
+        Схема запроса не смешивает unit_id и code в одной продаже, а code уникален в магазине,
+        поэтому после замены дубликатов unit_id не появляется.
+        :raise UnitNotFoundException: Если товара с code нет в магазине.
+        """
+        transactions_by_code = [
+            (transaction.code, transaction)
+            for transaction in dto.transactions
+            if isinstance(transaction, SalesRequestTransaction) and transaction.code is not None
+        ]
+        if not transactions_by_code:
+            return AddActionDTO.model_validate(dto, from_attributes=True)
+
+        unit_ids = await self.db.units.get_ids_by_codes(
+            dto.store_id, *(code for code, _ in transactions_by_code)
+        )
+        not_found_codes = [code for code, _ in transactions_by_code if code not in unit_ids]
+        if not_found_codes:
+            raise UnitNotFoundException(", ".join(not_found_codes))
+        return AddActionDTO(
+            store_id=dto.store_id,
+            action=dto.action,
+            transactions=[
+                SalesTransaction(
+                    unit_id=unit_ids[code],
+                    quantity_delta=transaction.quantity_delta,
+                    discount_price=transaction.discount_price,
                 )
-                action_id = await self.db.actions_transactions.stock_return(
-                    user_id=user_id, data=dto
+                for code, transaction in transactions_by_code
+            ],
+        )
+
+    async def _delete_cached_units(self, *dtos: AddActionDTO) -> None:
+        """
+        Удаляет товары действий из кэша UnitsService.check_get_unit_by_id: действия меняют
+        остатки и цены товаров. Вызывать после commit.
+        """
+        await self.cache.units.delete_cached_units(
+            *(transaction.unit_id for dto in dtos for transaction in dto.transactions),
+            ttl=settings.UNIT_CACHE_TTL,
+        )
+
+    async def _reset_sales_queue_stock(self, dto: AddActionDTO) -> None:
+        """
+        При settings.SALES_WRITE_BEHIND удаляет остатки товаров в redis после записи действия
+        в базу мимо очереди, они заведутся заново из базы. Вызывать после commit.
+        """
+        if not settings.SALES_WRITE_BEHIND or dto.action == ActionEnum.newPrice:
+            return
+        await self.cache.sales_queue.delete_stock(
+            dto.store_id, *(transaction.unit_id for transaction in dto.transactions)
+        )
+        await self.cache.commit()
+
+    async def _bump_sales_analytics_version(self, *dtos: AddActionDTO) -> None:
+        """
+        Устаревает кэш аналитики магазинов, в которых действия изменили итоги текущего дня.
+        Вызывать после commit.
+        """
+        store_ids = [dto.store_id for dto in dtos if dto.action in DAILY_STATS_ACTIONS]
+        if store_ids:
+            await self.cache.analytics.bump_sales_version(*store_ids)
+
+    async def _add_action(
+        self,
+        user_id: int,
+        dto: AddActionDTO,
+        queue_id: str | None = None,
+        created_at: datetime | None = None,
+    ) -> ActionIdDTO:
+        """
+        Совершает действие без commit, права доступа должны быть проверены до вызова.
+        queue_id, created_at - id и время постановки продажи в очередь redis,
+        если продажу записывает воркер.
+        :raise StoreNotFoundException: Если магазин с указанным ID не найден.
+        :raise IdDuplicateException: Если переданы дубликаты `unit_id`
+        :raise UnitNotFoundException: Если хотя бы один товар с указанными ID не найдены.
+        :raise UnitBelongAnotherStoreException: Если передан хотя бы один товар принадлежащий другому store.
+        :raise UnitOutOfStockException: Если *вычитаемое* количество товара больше доступного.
+        """
+
+        def check_unique_units(check_ids: tuple[int, ...]) -> None:
+            """
+            Проверяет что переданы только уникальные `unit_id`
+            :raise IdDuplicateException: Если переданы дубликаты `unit_id`
+            """
+            if len(check_ids) != len(set(check_ids)):
+                duplicates = [i for i, count in Counter(check_ids).items() if count > 1]
+                raise IdDuplicateException(", ".join(map(str, duplicates)))
+
+        def check_action_result(result: AddActionResultDTO, store_id: int) -> ActionIdDTO:
+            """
+            Проверяет результат действия, который вернул запрос:
+                - все `unit_id` существуют
+                - принадлежат переданному `store_id`
+                - все товары обновлены (для вычитающих действий: количество не стало меньше 0)
+            Проверки выполнены в том же запросе, что и изменения, при ошибке действие не коммитится.
+            :raise UnitNotFoundException: Если хотя бы один товар с указанными ID не найдены.
+            :raise UnitBelongAnotherStoreException: Если передан хотя бы один товар принадлежащий другому store.
+            :raise UnitOutOfStockException: Если *вычитаемое* количество товара больше доступного.
+            """
+            missing_ids = [unit.unit_id for unit in result.units if unit.store_id is None]
+            if missing_ids:
+                raise UnitNotFoundException(", ".join(map(str, missing_ids)))
+
+            foreign_ids = [
+                unit.unit_id
+                for unit in result.units
+                if unit.store_id is not None and unit.store_id != store_id
+            ]
+            if foreign_ids:
+                raise UnitBelongAnotherStoreException(", ".join(map(str, foreign_ids)))
+
+            out_of_stock_ids = [unit.unit_id for unit in result.units if not unit.is_applied]
+            if out_of_stock_ids:
+                raise UnitOutOfStockException(
+                    f"{UnitOutOfStockException.details}(ids: {', '.join(map(str, out_of_stock_ids))})"
                 )
-            case _:
-                raise ValueError(f"Unknown action: {dto.action}")
 
-        await self.db.commit()
-        return action_id
+            return ActionIdDTO(id=result.id)
+
+        unit_ids = tuple(transaction.unit_id for transaction in dto.transactions)
+        check_unique_units(check_ids=unit_ids)
+
+        try:
+            match dto.action:
+                case ActionEnum.addStock:
+                    result = await self.db.actions_transactions.add_stock(user_id=user_id, data=dto)
+
+                case ActionEnum.sales:
+                    sales_transactions: list[SalesTransaction] = cast(
+                        list[SalesTransaction], dto.transactions
+                    )
+                    result = await self.db.actions_transactions.sales(
+                        user_id=user_id,
+                        store_id=dto.store_id,
+                        action=dto.action,
+                        sales_transactions=sales_transactions,
+                        queue_id=queue_id,
+                        created_at=created_at,
+                    )
+
+                case ActionEnum.salesReturn:
+                    result = await self.db.actions_transactions.sales_return(
+                        user_id=user_id, data=dto
+                    )
+
+                case ActionEnum.writeOff:
+                    result = await self.db.actions_transactions.write_off(user_id=user_id, data=dto)
+
+                case ActionEnum.newPrice:
+                    result = await self.db.actions_transactions.new_price(user_id=user_id, data=dto)
+
+                case ActionEnum.stockReturn:
+                    result = await self.db.actions_transactions.stock_return(
+                        user_id=user_id, data=dto
+                    )
+                case _:
+                    raise ValueError(f"Unknown action: {dto.action}")
+        except ForeignKeyNotFoundException as exc:
+            raise StoreNotFoundException from exc
+
+        return check_action_result(result=result, store_id=dto.store_id)
 
     async def get_actions(
         self,
@@ -198,13 +659,73 @@ class ActionsService(BaseService):
         store_id: int | None,
         user_role_in_company: RoleUserInCompanyEnum,
         user_roles_in_stores: dict[int, RoleUserInStoreEnum],
+        cursor: str | None = None,
+        created_from: datetime | None = None,
+        created_to: datetime | None = None,
     ) -> tuple[list[ActionWithUnitsTransactionsDTO], Pagination]:
         """
+        :param cursor: pagination.next_cursor предыдущей страницы, offset тогда не применяется.
+        :param created_from: действия созданные не раньше, включительно.
+        :param created_to: действия созданные не позже, включительно.
+        :raise InvalidCursorException: Если курсор поврежден.
         :raise StoreNotFoundException: Если магазин с указанным ID не найден.
+        :raise AllStoresAccessForbiddenException: Если не админ и store_id не указан.
         :raise StoreAccessForbiddenException: Если нет прав чтения действий в store.
         :raise ActionNotFoundException: Если не найдено ни одного `действия` с учетом пагинации и фильтров.
         """
         # todo популярный ендпоинт желательно в один запрос или использовать кэш для проверок
+        await self.check_read_actions_access(
+            store_id=store_id,
+            user_role_in_company=user_role_in_company,
+            user_roles_in_stores=user_roles_in_stores,
+        )
+
+        actions_cursor = decode_cursor(cursor, ActionsCursorDTO) if cursor else None
+        actions_with_units = await self.db.actions.get_actions_with_units(
+            offset=offset,
+            limit=limit,
+            search_term=search_term,
+            store_id=store_id,
+            created_from=created_from,
+            created_to=created_to,
+            cursor=actions_cursor,
+        )
+        if not actions_with_units:
+            raise ActionNotFoundException
+
+        if created_from or created_to:  # счетчики ведутся без разбивки по датам
+            total = await self.db.actions.get_actions_total(
+                store_id=store_id,
+                title=search_term,
+                created_from=created_from,
+                created_to=created_to,
+            )
+        else:
+            total = await self.db.actions_counters.get_actions_total(
+                store_id=store_id, title=search_term
+            )
+        next_cursor = None
+        if len(actions_with_units) == limit:
+            last_action = actions_with_units[-1]
+            next_cursor = encode_cursor(
+                ActionsCursorDTO(created_at=last_action.created_at, id=last_action.id)
+            )
+        pagination = Pagination(
+            offset=0 if cursor else offset, limit=limit, total=total, next_cursor=next_cursor
+        )
+        return actions_with_units, pagination
+
+    async def check_read_actions_access(
+        self,
+        store_id: int | None,
+        user_role_in_company: RoleUserInCompanyEnum,
+        user_roles_in_stores: dict[int, RoleUserInStoreEnum],
+    ) -> None:
+        """
+        :raise StoreNotFoundException: Если магазин с указанным ID не найден.
+        :raise AllStoresAccessForbiddenException: Если не админ и store_id не указан.
+        :raise StoreAccessForbiddenException: Если нет прав чтения действий в store.
+        """
         if user_role_in_company in roles_is_administrations:
             # Админ — можно всё, только проверяем, если store_id указан, что магазин существует
             if store_id:
@@ -222,18 +743,38 @@ class ActionsService(BaseService):
                 if user_roles_in_stores.get(store_id) not in roles_can_read_action_in_store:
                     raise StoreAccessForbiddenException
 
-        actions_with_units = await self.db.actions.get_actions_with_units(
-            offset=offset,
-            limit=limit,
-            search_term=search_term,
-            store_id=store_id,
-        )
-        if not actions_with_units:
-            raise ActionNotFoundException
+    async def export_transactions(
+        self,
+        export_format: ExportFormat,
+        store_id: int | None,
+        created_from: datetime | None,
+        created_to: datetime | None,
+    ) -> AsyncIterator[str]:
+        """
+        Генератор выгрузки транзакций в NDJSON или CSV для StreamingResponse, по пачке строк
+        за шаг. Открывает сессию self.db сам, доступ должен быть проверен до вызова,
+        см. `check_read_actions_access`.
+        """
+        fields = list(ActionTransactionExportDTO.model_fields)
+        if export_format == ExportFormat.csv:
+            yield ",".join(fields) + "\r\n"
 
-        total = await self.db.actions.get_total()
-        pagination = Pagination(offset=offset, limit=limit, total=total)
-        return actions_with_units, pagination
+        async with self.db:
+            async for rows in self.db.actions_transactions.stream_transactions_for_export(
+                store_id=store_id,
+                created_from=created_from,
+                created_to=created_to,
+                batch_size=settings.ACTIONS_EXPORT_BATCH_SIZE,
+            ):
+                if export_format == ExportFormat.csv:
+                    buffer = io.StringIO()
+                    csv.writer(buffer).writerows(rows)
+                    yield buffer.getvalue()
+                else:
+                    yield "".join(
+                        json.dumps(dict(zip(fields, row)), default=datetime.isoformat) + "\n"
+                        for row in rows
+                    )
 
     async def get_action(
         self,
@@ -242,6 +783,9 @@ class ActionsService(BaseService):
         user_role_in_company: RoleUserInCompanyEnum,
     ) -> ActionWithTransactionsDTO:
         """
+        Действия не меняются после создания: результат кэшируется, см. cache.action_details.
+        Версии товаров читаются до чтения транзакций: изменение товара во время чтения
+        не даст записать в кэш действие со старым товаром.
         :raise ActionNotFoundException: если action не найден
         :raise StoreAccessForbiddenException: Если нет прав чтения действий в store.
         """
@@ -250,11 +794,148 @@ class ActionsService(BaseService):
             if user_roles_in_stores.get(action.store_id) not in roles_can_read_action_in_store:
                 raise StoreAccessForbiddenException
 
+        cached = await self.cache.action_details.get_action_or_none(action_id=action_id)
+        if cached is not None:
+            return cached
+
+        unit_ids = await self.db.actions_transactions.get_transactions_unit_ids(
+            action_id=action_id, created_at=action.created_at
+        )
+        versions = await self.cache.action_details.get_units_versions(*unit_ids)
         transactions = await self.db.actions_transactions.get_transactions_with_units(
-            action_id=action_id
+            action_id=action_id, created_at=action.created_at
         )
+        action_with_transactions = ActionWithTransactionsDTO(
+            **action.model_dump(), transactions=transactions
+        )
+        await self.cache.action_details.add_action(
+            dto=action_with_transactions,
+            unit_ids=unit_ids,
+            versions=versions,
+            ttl=settings.ACTION_DETAILS_CACHE_TTL,
+        )
+        return action_with_transactions
+
+    async def create_partitions(self, months_ahead: int) -> list[str]:
+        """
+        Создает помесячные партиции действий и транзакций на текущий месяц и months_ahead вперед.
+        Существующие партиции не меняются.
+        :return: названия партиций
+        """
+        current_month = get_utc_now().date().replace(day=1)
+        partitions = await self.db.actions.create_month_partitions(
+            first_month=current_month, months=months_ahead + 1
+        )
+        await self.db.commit()
+        return partitions
 
-        return ActionWithTransactionsDTO(**action.model_dump(), transactions=transactions)
+    async def reconcile_actions_counters(self) -> dict[int, dict[ActionEnum, int]]:
+        """
+        Сверяет счетчики действий с actions и исправляет неверные, каждый магазин своей транзакцией.
+        :return: {store_id: {тип действия: расхождение}} исправленных счетчиков
+        """
+        drifts: dict[int, dict[ActionEnum, int]] = {}
+        for store_id in await self.db.actions_counters.get_store_ids():
+            store_drifts = await self.db.actions_counters.reconcile(store_id=store_id)
+            await self.db.commit()
+            if store_drifts:
+                logger.warning(f"Счетчики действий магазина {store_id} исправлены: {store_drifts}")
+                drifts[store_id] = store_drifts
+        return drifts
+
+    async def get_daily_stats_chunks(
+        self, chunk_days: int, day_from: date | None = None, day_to: date | None = None
+    ) -> list[tuple[date, date]]:
+        """
+        Делит дни для пересборки unit_daily_stats на части по chunk_days дней.
+        Без границ берется весь период транзакций.
+        :param day_to: последний день включительно
+        :return: [(первый день, день после последнего)]
+        """
+        if day_from is None or day_to is None:
+            days_range = await self.db.unit_daily_stats.get_transactions_days_range()
+            if days_range is None:
+                return []
+            day_from = day_from or days_range[0]
+            day_to = day_to or days_range[1]
+
+        chunks: list[tuple[date, date]] = []
+        chunk_from = day_from
+        while chunk_from <= day_to:
+            chunk_to = min(chunk_from + timedelta(days=chunk_days), day_to + timedelta(days=1))
+            chunks.append((chunk_from, chunk_to))
+            chunk_from = chunk_to
+        return chunks
+
+    async def rebuild_daily_stats(self, day_from: date, day_to: date) -> int:
+        """
+        Пересобирает unit_daily_stats за дни [day_from, day_to) одной транзакцией,
+        затем увеличивает версию пересборки: устаревает весь кэш аналитики продаж,
+        в том числе закрытые диапазоны.
+        :return: количество строк итогов
+        """
+        rows = await self.db.unit_daily_stats.rebuild(day_from=day_from, day_to=day_to)
+        await self.db.commit()
+        await self.cache.analytics.bump_rebuild_version()
+        return rows
+
+    async def get_sales_analytics(
+        self,
+        store_id: int,
+        bucket: AnalyticsBucket,
+        date_from: date,
+        date_to: date,
+        by_unit: bool,
+        user_roles_in_stores: dict[int, RoleUserInStoreEnum],
+        user_role_in_company: RoleUserInCompanyEnum,
+    ) -> SalesAnalyticsDTO:
+        """
+        Выручка, себестоимость, валовая прибыль и скидки магазина по периодам из unit_daily_stats.
+        Диапазон расширяется до границ периодов. Результат кэшируется, см. cache.analytics.
+        :raise StoreNotFoundException: Если магазин с указанным ID не найден.
+        :raise StoreAccessForbiddenException: Если нет прав чтения действий в store.
+        """
+        await StoresService(db=self.db, cache=self.cache).check_get_store_by_id(store_id=store_id)
+        if user_role_in_company not in roles_is_administrations:
+            if user_roles_in_stores.get(store_id) not in roles_can_read_action_in_store:
+                raise StoreAccessForbiddenException
+
+        date_from = get_bucket_bounds(date_from, bucket.value)[0]
+        date_to = get_bucket_bounds(date_to, bucket.value)[1]
+        # версия пересборки читается до чтения итогов: пересборка во время чтения
+        # оставит результат под старой версией, которую уже никто не прочитает
+        rebuild_version = await self.cache.analytics.get_rebuild_version()
+        version = 0  # закрытые диапазоны меняет только пересборка
+        if date_to >= get_utc_now().date():
+            version = await self.cache.analytics.get_sales_version(store_id)
+
+        analytics = await self.cache.analytics.get_sales_or_none(
+            store_id=store_id,
+            bucket=bucket.value,
+            date_from=date_from,
+            date_to=date_to,
+            by_unit=by_unit,
+            rebuild_version=rebuild_version,
+            version=version,
+        )
+        if analytics is not None:
+            return analytics
+
+        rows = await self.db.unit_daily_stats.get_sales_analytics(
+            store_id=store_id, bucket=bucket, day_from=date_from, day_to=date_to, by_unit=by_unit
+        )
+        analytics = SalesAnalyticsDTO(
+            store_id=store_id, bucket=bucket, date_from=date_from, date_to=date_to, rows=rows
+        )
+        await self.cache.analytics.add_sales(
+            dto=analytics,
+            by_unit=by_unit,
+            rebuild_version=rebuild_version,
+            version=version,
+            ttl=settings.SALES_ANALYTICS_CACHE_TTL,
+        )
+        await self.cache.commit()
+        return analytics
 
     @cache_service_method_by_id(return_type=ActionDTO, ttl=60 * 60 * 24)
     async def check_get_action_by_id(self, action_id: int) -> ActionDTO:
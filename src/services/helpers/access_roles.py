@@ -1,3 +1,4 @@
+from src.models.actions import ActionEnum
 from src.models.users import RoleUserInStoreEnum, RoleUserInCompanyEnum
 
 "Роли доступа"
@@ -31,3 +32,12 @@ roles_can_sales_return = {RoleUserInStoreEnum.manager, RoleUserInStoreEnum.selle
 roles_can_write_off = {RoleUserInStoreEnum.manager}
 roles_can_new_price = {RoleUserInStoreEnum.manager}
 roles_can_stock_return = {RoleUserInStoreEnum.manager}
+
+roles_can_action: dict[ActionEnum, set[RoleUserInStoreEnum]] = {
+    ActionEnum.sales: roles_can_sales,
+    ActionEnum.addStock: roles_can_add_stock,
+    ActionEnum.salesReturn: roles_can_sales_return,
+    ActionEnum.writeOff: roles_can_write_off,
+    ActionEnum.newPrice: roles_can_new_price,
+    ActionEnum.stockReturn: roles_can_stock_return,
+}
@@ -1,13 +1,21 @@
+import hashlib
+import json
 import uuid
+from datetime import datetime
 from pathlib import Path
+from typing import BinaryIO
 
 from src.config import settings
 from src.exceptions.base import (
+    ObjectAlreadyExistsException,
     ObjectUseAsForeignKeyException,
     UnitHaveTransactionsException,
     UnitImagesLimitException,
     UnitImageIsMainException,
+    UnitsImportLimitException,
+    InvalidCursorException,
 )
+from src.exceptions.conflict import UnitCodeAlreadyExistsException
 from src.exceptions.forbidden import (
     UnitModificationInStoreForbiddenException,
     UnitReadInStoreForbiddenException,
@@ -20,15 +28,27 @@ from src.exceptions.not_found import (
     ForeignKeyNotFoundException,
 )
 from src.logging_config import logger
+from src.models.actions import ActionEnum
 from src.models.units import UnitImageStatusEnum
 from src.models.users import RoleUserInStoreEnum, RoleUserInCompanyEnum
-from src.schemas.types import SortOrder, SortUnitBy, UnitField
+from src.repositories.cache.space_name import space_name_cached_unit
+from src.schemas.types import SortOrder, SortUnitBy, UnitField, UnitSearchMode, UnitSparseField
 from src.schemas.units import (
     AddUnitDTO,
     EditUnitDTO,
     UnitWithFieldsDTO,
     UnitDTO,
     UnitWithMainImageDTO,
+    UnitsImportResultDTO,
+    UnitTransactionsDTO,
+    UnitTransactionsCursorDTO,
+    UnitsCursorDTO,
+    UnitsPageDTO,
+    UnitPartialDTO,
+    UnitWithFieldsPartialDTO,
+    Action,
+    EditUnitsBulkDTO,
+    UnitsAutocompleteDTO,
 )
 from src.schemas.unit_images import AddUnitImageDTO, EditUnitImageDTO, UnitImageDTO
 from src.services.base import BaseService
@@ -37,9 +57,19 @@ from src.services.helpers.access_roles import (
     roles_can_read_unit_in_store,
     roles_is_administrations,
 )
+from src.services.actions import ActionsService
 from src.services.images import UnitImagesService
 from src.services.stores import StoresService
 from src.tasks.manager import task_manager
+from src.utils.cache.decorators import cache_service_method_by_id
+from src.utils.cache.local import LocalTTLCache
+from src.utils.cursor import encode_cursor, decode_cursor
+from src.utils.files import LinesLimitReader
+
+# id товара по (store_id, code) в памяти процесса, перед кэшем в redis
+units_code_local_cache: LocalTTLCache[int] = LocalTTLCache(
+    maxsize=settings.UNITS_CODE_LOCAL_CACHE_SIZE, ttl=settings.UNITS_CODE_LOCAL_CACHE_TTL
+)
 
 
 # todo добавить docs что None нужен так как роли может не быть по ключу
@@ -77,6 +107,7 @@ class UnitsService(BaseService):
 
         :raise StoreNotFoundException: Если магазин с указанным ID не найден.
         :raise UnitModificationForbidden: Если доступ к созданию, изменению, удалению товара запрещен.
+        :raise UnitCodeAlreadyExistsException: Если товар с таким кодом уже есть в магазине.
         """
         if user_role_in_company not in roles_is_administrations:
             self.check_user_role_write_unit_in_store(user_roles_in_stores.get(dto.store_id))
@@ -84,9 +115,64 @@ class UnitsService(BaseService):
             unit = await self.db.units.add(dto)
         except ForeignKeyNotFoundException as exc:
             raise StoreNotFoundException from exc
+        except ObjectAlreadyExistsException as exc:
+            raise UnitCodeAlreadyExistsException(dto.code) from exc
         await self.db.commit()
+        await self.cache.units.bump_list_version(unit.store_id)
         return unit
 
+    async def import_units(
+        self,
+        user_id: int,
+        store_id: int,
+        source: BinaryIO,
+        user_roles_in_stores: dict[int, RoleUserInStoreEnum],
+        user_role_in_company: RoleUserInCompanyEnum,
+    ) -> UnitsImportResultDTO:
+        """
+        Импортирует товары магазина из CSV с начальным остатком: COPY во временную таблицу,
+        проверка всех строк одним запросом, вставка товаров и одного действия addStock.
+        Если хотя бы одна строка с ошибкой, ничего не импортируется.
+        :param source: CSV с заголовком: title, description, measurement, quantity, cost_price, retail_price
+        :raise StoreNotFoundException: Если магазин с указанным ID не найден.
+        :raise UnitModificationInStoreForbiddenException: Если доступ к созданию товара запрещен.
+        :raise ActionAccessForbiddenException: Если нет прав на addStock.
+        :raise UnitsImportFileException: Если файл не разбирается как CSV импорта.
+        :raise UnitsImportLimitException: Если строк больше settings.UNITS_IMPORT_MAX_ROWS.
+        """
+        if user_role_in_company not in roles_is_administrations:
+            self.check_user_role_write_unit_in_store(user_roles_in_stores.get(store_id))
+        ActionsService().check_user_role_action_in_store(
+            action=ActionEnum.addStock,
+            store_id=store_id,
+            user_roles_in_stores=user_roles_in_stores,
+            user_role_in_company=user_role_in_company,
+        )
+        await StoresService(db=self.db, cache=self.cache).check_get_store_by_id(store_id=store_id)
+
+        await self.db.units.create_import_table()
+        # COPY прерывается, как только в файле больше строк, чем заголовок и лимит
+        rows = await self.db.units.copy_import_rows(
+            LinesLimitReader(
+                source,
+                max_lines=settings.UNITS_IMPORT_MAX_ROWS + 1,
+                exception=UnitsImportLimitException,
+            )
+        )
+        if rows > settings.UNITS_IMPORT_MAX_ROWS:
+            raise UnitsImportLimitException
+        if rows == 0:
+            return UnitsImportResultDTO(imported=0)
+
+        errors = await self.db.units.get_import_errors(limit=settings.UNITS_IMPORT_MAX_ERRORS)
+        if errors:
+            return UnitsImportResultDTO(imported=0, errors=errors)
+
+        action_id = await self.db.units.insert_imported_units(store_id=store_id, user_id=user_id)
+        await self.db.commit()
+        await self.cache.units.bump_list_version(store_id)
+        return UnitsImportResultDTO(imported=rows, action_id=action_id)
+
     async def get_units(
         self,
         offset: int,
@@ -97,7 +183,10 @@ class UnitsService(BaseService):
         sort_by: SortUnitBy,
         search_term: str | None = None,
         store_id: int | None = None,
-    ) -> list[UnitWithMainImageDTO]:
+        search_mode: UnitSearchMode = UnitSearchMode.contains,
+        cursor: str | None = None,
+        sparse_fields: tuple[UnitSparseField, ...] | None = None,
+    ) -> tuple[list[UnitWithMainImageDTO | UnitPartialDTO], str | None]:
         """
         :param offset: Смещение, получить от какого элемента в запросе.
         :param limit: Сколько получить элементов из запроса.
@@ -106,8 +195,14 @@ class UnitsService(BaseService):
         :param sort_order: Порядок по возрастанию или убываю
         :param sort_by: Сортировка по определенному полю
         :param search_term: Поисковая строка ищет по title и description одновременно
+        :param search_mode: contains - подстрока, similar - похожие слова с учетом опечаток
         :param store_id: ID магазина. Если None тогда получает товары из всех магазинам
-        :return: Список товаров с главной картинкой
+        :param cursor: next_cursor предыдущей страницы, offset тогда не применяется.
+        :param sparse_fields: Только эти поля товаров, id и поле sort_by возвращаются всегда.
+        :return: Список товаров с главной картинкой и курсор следующей страницы.
+        Страницы одного магазина кэшируются до изменения его товаров, см. cache.units.
+        :raise InvalidCursorException: Если курсор поврежден, получен с другой сортировкой
+        или передан вместе с поиском похожих.
         :raise StoreNotFoundException: Если магазин с указанным ID не найден.
         :raise UnitNotFoundException: Если ни одного товара не найдено.
         :raise UnitReadInAllStoresForbiddenException: Если доступ к просмотру товаров во всех магазинах запрещен.
@@ -130,18 +225,94 @@ class UnitsService(BaseService):
                 )
                 self.check_user_role_read_unit_in_store(user_roles_in_stores.get(store_id))
 
-        units_with_main_image = await self.db.units.get_units(
-            offset=offset,
-            limit=limit,
-            search_term=search_term,
-            store_id=store_id,
-            sort_unit_by=sort_by,
-            sort_order=sort_order,
-        )
+        # при поиске похожих порядок задает похожесть, по ней курсор не строится и не применяется
+        is_similar_search = bool(search_term) and search_mode == UnitSearchMode.similar
+        units_cursor = decode_cursor(cursor, UnitsCursorDTO) if cursor else None
+        if units_cursor and (
+            units_cursor.sort_by != sort_by
+            or units_cursor.sort_order != sort_order
+            or is_similar_search
+        ):
+            raise InvalidCursorException
+
+        version = 0
+        params_hash = ""
+        if store_id:
+            version = await self.cache.units.get_list_version(store_id)
+            params_hash = hashlib.sha256(
+                json.dumps(
+                    [
+                        offset,
+                        limit,
+                        search_term,
+                        search_mode,
+                        sort_order,
+                        sort_by,
+                        cursor,
+                        sorted(sparse_fields) if sparse_fields else None,
+                    ]
+                ).encode()
+            ).hexdigest()
+            page = await self.cache.units.get_page_or_none(
+                store_id=store_id, version=version, params_hash=params_hash
+            )
+            if page is not None:
+                return page.units, page.next_cursor
+
+        units_with_main_image: list[UnitWithMainImageDTO | UnitPartialDTO]
+        if sparse_fields:
+            units_with_main_image = list(
+                await self.db.units.get_units_fields(
+                    fields=sparse_fields,
+                    offset=offset,
+                    limit=limit,
+                    search_term=search_term,
+                    store_id=store_id,
+                    sort_unit_by=sort_by,
+                    sort_order=sort_order,
+                    search_mode=search_mode,
+                    similarity_threshold=settings.UNITS_SEARCH_SIMILARITY_THRESHOLD,
+                    cursor=units_cursor,
+                )
+            )
+        else:
+            units_with_main_image = list(
+                await self.db.units.get_units(
+                    offset=offset,
+                    limit=limit,
+                    search_term=search_term,
+                    store_id=store_id,
+                    sort_unit_by=sort_by,
+                    sort_order=sort_order,
+                    search_mode=search_mode,
+                    similarity_threshold=settings.UNITS_SEARCH_SIMILARITY_THRESHOLD,
+                    cursor=units_cursor,
+                )
+            )
 
         if not units_with_main_image:
             raise UnitNotFoundException
-        return units_with_main_image
+        next_cursor = None
+        if len(units_with_main_image) == limit and not is_similar_search:
+            last_unit = units_with_main_image[-1]
+            next_cursor = encode_cursor(
+                UnitsCursorDTO(
+                    sort_by=sort_by,
+                    sort_order=sort_order,
+                    value=str(getattr(last_unit, sort_by.value)),
+                    id=last_unit.id,
+                )
+            )
+        if store_id:
+            await self.cache.units.add_page(
+                dto=UnitsPageDTO(units=units_with_main_image, next_cursor=next_cursor),
+                store_id=store_id,
+                version=version,
+                params_hash=params_hash,
+                ttl=settings.UNITS_LIST_CACHE_TTL,
+            )
+            await self.cache.commit()
+        return units_with_main_image, next_cursor
 
     async def get_unit(
         self,
@@ -149,22 +320,32 @@ class UnitsService(BaseService):
         user_role_in_company: RoleUserInCompanyEnum,
         user_roles_in_stores: dict[int, RoleUserInStoreEnum],
         fields: tuple[UnitField, ...] | None,
-    ) -> UnitWithFieldsDTO:
+        sparse_fields: tuple[UnitSparseField, ...] | None = None,
+    ) -> UnitWithFieldsDTO | UnitWithFieldsPartialDTO:
         """
 
         :param user_role_in_company: Роль пользователя в компании.
         :param unit_id:
         :param user_roles_in_stores: Для проверки прав доступа.
         :param fields: Дополнительные поля.
+        :param sparse_fields: Только эти поля товара, id и store_id возвращаются всегда.
         :return: Товар с опциональными дополнительными полями
         :raise UnitNotFoundException: Если товар не найден.
         :raise UnitReadInStoreForbiddenException: Если доступ к просмотру товара в этом магазине запрещен.
         """
 
+        unit_with_fields: UnitWithFieldsDTO | UnitWithFieldsPartialDTO
+        if sparse_fields and fields and UnitField.main_image in fields:
+            sparse_fields = (*sparse_fields, UnitSparseField.main_image)
         try:
-            unit_with_fields = await self.db.units.get_unit_with_fields(
-                unit_id=unit_id, fields=fields
-            )
+            if sparse_fields:
+                unit_with_fields = await self.db.units.get_unit_fields(
+                    unit_id=unit_id, fields=sparse_fields
+                )
+            else:
+                unit_with_fields = await self.db.units.get_unit_with_fields(
+                    unit_id=unit_id, fields=fields
+                )
         except ObjectNotFoundException as exc:
             raise UnitNotFoundException from exc
 
@@ -173,8 +354,125 @@ class UnitsService(BaseService):
                 user_roles_in_stores.get(unit_with_fields.store_id)
             )
 
+        if sparse_fields and fields:
+            # дополнительные поля отдельными запросами, без загрузки орм модели товара
+            if UnitField.images in fields:
+                unit_with_fields.images = await self.db.unit_images.get_all(unit_id=unit_id)
+            if UnitField.transactions in fields:
+                transactions = await self.db.actions_transactions.get_all(unit_id=unit_id)
+                unit_with_fields.transactions = [
+                    Action.model_validate(transaction, from_attributes=True)
+                    for transaction in transactions
+                ]
         return unit_with_fields
 
+    async def get_units_batch(
+        self,
+        unit_ids: tuple[int, ...],
+        user_roles_in_stores: dict[int, RoleUserInStoreEnum],
+        user_role_in_company: RoleUserInCompanyEnum,
+    ) -> tuple[list[UnitWithMainImageDTO], list[int]]:
+        """
+        Товары по списку id одним запросом, права проверяются один раз на каждый магазин.
+        :return: Найденные товары с главной картинкой и id ненайденных товаров.
+        :raise UnitReadInStoreForbiddenException: Если доступ к просмотру товаров хотя бы одного
+        магазина запрещен.
+        """
+        units = await self.db.units.get_units_by_ids(*unit_ids)
+        if user_role_in_company not in roles_is_administrations:
+            for store_id in {unit.store_id for unit in units}:
+                self.check_user_role_read_unit_in_store(user_roles_in_stores.get(store_id))
+
+        not_found_ids = sorted(set(unit_ids) - {unit.id for unit in units})
+        return units, not_found_ids
+
+    async def get_units_autocomplete(
+        self,
+        store_id: int,
+        prefix: str,
+        limit: int,
+        user_roles_in_stores: dict[int, RoleUserInStoreEnum],
+        user_role_in_company: RoleUserInCompanyEnum,
+    ) -> UnitsAutocompleteDTO:
+        """
+        Первые limit названий товаров магазина по префиксу для поиска на кассе.
+        Подсказки кэшируются на settings.UNITS_AUTOCOMPLETE_CACHE_TTL под версией товаров магазина,
+        поэтому изменение товаров сразу дает новые подсказки.
+        :raise UnitReadInStoreForbiddenException: Если доступ к просмотру товаров в этом магазине запрещен.
+        """
+        if user_role_in_company not in roles_is_administrations:
+            self.check_user_role_read_unit_in_store(user_roles_in_stores.get(store_id))
+
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return UnitsAutocompleteDTO(units=[])
+
+        version = await self.cache.units.get_list_version(store_id)
+        cached = await self.cache.units.get_autocomplete_or_none(
+            store_id=store_id, version=version, limit=limit, prefix=prefix
+        )
+        if cached is not None:
+            return cached
+
+        units = await self.db.units.get_titles_by_prefix(
+            store_id=store_id, prefix=prefix, limit=limit
+        )
+        result = UnitsAutocompleteDTO(units=units)
+        await self.cache.units.add_autocomplete(
+            dto=result,
+            store_id=store_id,
+            version=version,
+            limit=limit,
+            prefix=prefix,
+            ttl=settings.UNITS_AUTOCOMPLETE_CACHE_TTL,
+        )
+        await self.cache.commit()
+        return result
+
+    async def get_unit_transactions(
+        self,
+        unit_id: int,
+        limit: int,
+        user_role_in_company: RoleUserInCompanyEnum,
+        user_roles_in_stores: dict[int, RoleUserInStoreEnum],
+        cursor: str | None = None,
+        action: ActionEnum | None = None,
+        created_from: datetime | None = None,
+        created_to: datetime | None = None,
+    ) -> UnitTransactionsDTO:
+        """
+        Страница транзакций товара от новых к старым с итогами по всем его транзакциям.
+        :param cursor: next_cursor предыдущей страницы.
+        :raise InvalidCursorException: Если курсор поврежден.
+        :raise UnitNotFoundException: Если товар не найден.
+        :raise UnitReadInStoreForbiddenException: Если доступ к просмотру товара в этом магазине запрещен.
+        """
+        unit = await self.check_get_unit_by_id(unit_id=unit_id)
+        if user_role_in_company not in roles_is_administrations:
+            self.check_user_role_read_unit_in_store(user_roles_in_stores.get(unit.store_id))
+
+        transactions = await self.db.actions_transactions.get_unit_transactions(
+            unit_id=unit_id,
+            limit=limit,
+            cursor=decode_cursor(cursor, UnitTransactionsCursorDTO) if cursor else None,
+            action=action,
+            created_from=created_from,
+            created_to=created_to,
+        )
+        summary = await self.db.actions_transactions.get_unit_transactions_summary(
+            unit_id=unit_id, action=action, created_from=created_from, created_to=created_to
+        )
+        next_cursor = None
+        if len(transactions) == limit:
+            next_cursor = encode_cursor(
+                UnitTransactionsCursorDTO(
+                    created_at=transactions[-1].created_at, id=transactions[-1].id
+                )
+            )
+        return UnitTransactionsDTO(
+            transactions=transactions, summary=summary, next_cursor=next_cursor
+        )
+
     async def edit_unit(
         self,
         dto: EditUnitDTO,
@@ -191,20 +489,84 @@ class UnitsService(BaseService):
         :raise UnitNotFoundException: Если товар не найден по id.
         :raise UnitImageNotFoundException: Если картинка товара не найдена.
         :raise UnitModificationForbidden: Если доступ к созданию, изменению, удалению товара запрещен.
+        :raise UnitCodeAlreadyExistsException: Если товар с таким кодом уже есть в магазине.
         """
-        unit = await self.check_get_unit_by_id(unit_id=unit_id)
+        old_unit = await self.check_get_unit_by_id(unit_id=unit_id)
         if user_role_in_company not in roles_is_administrations:
-            self.check_user_role_write_unit_in_store(user_roles_in_stores.get(unit.store_id))
+            self.check_user_role_write_unit_in_store(user_roles_in_stores.get(old_unit.store_id))
 
         if dto.main_image_id:
             await UnitImagesService(db=self.db).check_get_unit_image(
                 unit_id=unit_id, image_id=dto.main_image_id
             )
 
-        unit = await self.db.units.edit_unit(unit_id=unit_id, dto=dto)
+        try:
+            unit = await self.db.units.edit_unit(unit_id=unit_id, dto=dto)
+        except ObjectAlreadyExistsException as exc:
+            raise UnitCodeAlreadyExistsException(dto.code) from exc
         await self.db.commit()
+        await self.cache.units.delete_cached_units(unit_id, ttl=settings.UNIT_CACHE_TTL)
+        await self.cache.action_details.delete_by_units(
+            unit_id, ttl=settings.ACTION_DETAILS_CACHE_TTL
+        )
+        await self.cache.units.bump_list_version(unit.store_id)
+        if old_unit.code and old_unit.code != unit.code:
+            await self.delete_units_codes_from_cache(old_unit)
         return unit
 
+    async def edit_units_bulk(
+        self,
+        dto: EditUnitsBulkDTO,
+        user_roles_in_stores: dict[int, RoleUserInStoreEnum],
+        user_role_in_company: RoleUserInCompanyEnum,
+    ) -> list[UnitDTO]:
+        """
+        Изменяет несколько товаров одним запросом и одним commit, как edit_unit для каждого.
+        Все проверки до записи: если хотя бы одна не прошла, ничего не изменяется.
+        :return: Измененные товары
+        :raise UnitNotFoundException: Если хотя бы один товар не найден.
+        :raise UnitModificationInStoreForbiddenException: Если изменение товаров хотя бы одного
+        магазина запрещено.
+        :raise UnitImageNotFoundException: Если main_image_id не картинка этого товара.
+        :raise UnitCodeAlreadyExistsException: Если код товара уже есть в магазине.
+        """
+        unit_ids = [unit.id for unit in dto.units]
+        units = await self.db.units.get_all_by_ids(*unit_ids)
+        not_found_ids = sorted(set(unit_ids) - {unit.id for unit in units})
+        if not_found_ids:
+            raise UnitNotFoundException(", ".join(map(str, not_found_ids)))
+
+        store_ids = {unit.store_id for unit in units}
+        if user_role_in_company not in roles_is_administrations:
+            for store_id in store_ids:
+                self.check_user_role_write_unit_in_store(user_roles_in_stores.get(store_id))
+
+        main_images = [(unit.id, unit.main_image_id) for unit in dto.units if unit.main_image_id]
+        if main_images:
+            images = await self.db.unit_images.get_all_by_ids(
+                *{image_id for _, image_id in main_images}
+            )
+            images_units = {image.id: image.unit_id for image in images}
+            if any(images_units.get(image_id) != unit_id for unit_id, image_id in main_images):
+                raise UnitImageNotFoundException
+
+        try:
+            edited_units = await self.db.units.edit_units_bulk(dto.units)
+        except ObjectAlreadyExistsException as exc:
+            codes = ", ".join(unit.code for unit in dto.units if unit.code)
+            raise UnitCodeAlreadyExistsException(codes) from exc
+        await self.db.commit()
+        await self.cache.units.delete_cached_units(*unit_ids, ttl=settings.UNIT_CACHE_TTL)
+        await self.cache.action_details.delete_by_units(
+            *unit_ids, ttl=settings.ACTION_DETAILS_CACHE_TTL
+        )
+        await self.cache.units.bump_list_version(*store_ids)
+        new_codes = {unit.id: unit.code for unit in edited_units}
+        await self.delete_units_codes_from_cache(
+            *(unit for unit in units if unit.code and unit.code != new_codes.get(unit.id))
+        )
+        return edited_units
+
     async def delete_unit(
         self,
         unit_id: int,
@@ -236,10 +598,73 @@ class UnitsService(BaseService):
 
         await self.s3.commit()
         await self.db.commit()
+        await self.cache.units.delete_cached_units(unit_id, ttl=settings.UNIT_CACHE_TTL)
+        await self.cache.units.bump_list_version(unit.store_id)
+        if unit.code:
+            await self.delete_units_codes_from_cache(unit)
+
+    async def get_unit_by_code(
+        self,
+        store_id: int,
+        code: str,
+        user_roles_in_stores: dict[int, RoleUserInStoreEnum],
+        user_role_in_company: RoleUserInCompanyEnum,
+    ) -> UnitDTO:
+        """
+        Товар по коду (артикул, штрихкод) для сканера на кассе.
+        id товара ищется в памяти процесса, затем в redis, затем в базе по уникальному индексу
+        (store_id, code). Найденный в кэше товар сверяется по store_id и code: если код уже
+        перешел к другому товару или товар удален, запись кэша удаляется и поиск идет в базе.
+        :raise UnitReadInStoreForbiddenException: Если доступ к просмотру товара в этом магазине запрещен.
+        :raise UnitNotFoundException: Если товара с таким кодом нет в магазине.
+        """
+        if user_role_in_company not in roles_is_administrations:
+            self.check_user_role_read_unit_in_store(user_roles_in_stores.get(store_id))
+
+        unit_id = units_code_local_cache.get((store_id, code))
+        if unit_id is None:
+            unit_id = await self.cache.units.get_unit_id_by_code(store_id=store_id, code=code)
+        if unit_id is not None:
+            try:
+                unit = await self.check_get_unit_by_id(unit_id=unit_id)
+            except UnitNotFoundException:
+                unit = None
+            if unit and unit.store_id == store_id and unit.code == code:
+                units_code_local_cache.set((store_id, code), unit.id)
+                return unit
+            units_code_local_cache.delete((store_id, code))
+
+        unit = await self.db.units.get_one_or_none(store_id=store_id, code=code)
+        if unit is None:
+            if unit_id is not None:
+                await self.cache.units.delete_unit_id_by_code(store_id, code)
+                await self.cache.commit()
+            raise UnitNotFoundException(code)
+
+        units_code_local_cache.set((store_id, code), unit.id)
+        await self.cache.units.add_unit_id_by_code(
+            store_id=store_id, code=code, unit_id=unit.id, ttl=settings.UNITS_CODE_CACHE_TTL
+        )
+        await self.cache.commit()
+        return unit
 
-    # todo возможно стоит за кешировать метод на 1 минутку хотя бы.
+    async def delete_units_codes_from_cache(self, *units: UnitDTO) -> None:
+        """Удаляет старые коды товаров из кэшей, вызывать после commit"""
+        codes = [(unit.store_id, unit.code) for unit in units if unit.code]
+        if not codes:
+            return
+        units_code_local_cache.delete(*codes)
+        for store_id, code in codes:
+            await self.cache.units.delete_unit_id_by_code(store_id, code)
+        await self.cache.commit()
+
+    @cache_service_method_by_id(
+        return_type=UnitDTO, ttl=settings.UNIT_CACHE_TTL, name=space_name_cached_unit
+    )
     async def check_get_unit_by_id(self, unit_id: int) -> UnitDTO:
         """
+        Cached method: settings.UNIT_CACHE_TTL. Каждое изменение товара после commit удаляет его
+        из кэша через cache.units.delete_cached_units, включая действия с остатками и ценами.
         :raise UnitNotFoundException:
         """
         try:
@@ -273,21 +698,19 @@ class UnitsService(BaseService):
         if user_role_in_company not in roles_is_administrations:
             self.check_user_role_write_unit_in_store(user_roles_in_stores.get(unit.store_id))
 
-        quantity_unit_images = await self.db.unit_images.get_total(unit_id=unit_id)
-        if (
-            quantity_unit_images >= settings.UNIT_IMAGES_LIMIT
-            or quantity_unit_images + total_images > settings.UNIT_IMAGES_LIMIT
-        ):
+        # units.images_count увеличивается с проверкой лимита одним запросом вместо подсчета картинок
+        images_count = await self.db.units.change_images_count(
+            unit_id=unit_id, delta=total_images, limit=settings.UNIT_IMAGES_LIMIT
+        )
+        if images_count is None:
             raise UnitImagesLimitException
 
-        start = quantity_unit_images + 1
-        stop = quantity_unit_images + total_images + 1
         pending_unit_images = [
             AddUnitImageDTO(
                 unit_id=unit_id,
                 status=UnitImageStatusEnum.pending,
             )
-            for _ in range(start, stop)
+            for _ in range(total_images)
         ]
 
         unit_images: list[UnitImageDTO] = await self.db.unit_images.add_bulk(*pending_unit_images)
@@ -303,6 +726,12 @@ class UnitsService(BaseService):
         )
 
         await self.db.commit()
+        await self.cache.units.delete_cached_units(unit_id, ttl=settings.UNIT_CACHE_TTL)
+        await self.cache.units.bump_list_version(unit.store_id)
+        if unit.main_image_id is None:
+            await self.cache.action_details.delete_by_units(
+                unit_id, ttl=settings.ACTION_DETAILS_CACHE_TTL
+            )
 
     async def upload_unit_images_in_s3(
         self,
@@ -365,6 +794,14 @@ class UnitsService(BaseService):
         except Exception as exc:
             logger.warning(exc, exc_info=True)
 
+        # главная картинка товара могла стать загруженной или ошибочной
+        await self.cache.action_details.delete_by_units(
+            unit_id, ttl=settings.ACTION_DETAILS_CACHE_TTL
+        )
+        unit = await self.db.units.get_one_or_none(id=unit_id)
+        if unit is not None:
+            await self.cache.units.bump_list_version(unit.store_id)
+
     async def delete_unit_image(
         self,
         unit_id: int,
@@ -392,8 +829,11 @@ class UnitsService(BaseService):
             await self.db.unit_images.delete(id=image_id, unit_id=unit_id)
         except ObjectUseAsForeignKeyException as exc:
             raise UnitImageIsMainException from exc
+        await self.db.units.change_images_count(unit_id=unit_id, delta=-1)
 
         await self.s3.unit_images.delete_unit_image(dto=unit_image)
 
         await self.s3.commit()
         await self.db.commit()
+        await self.cache.units.delete_cached_units(unit_id, ttl=settings.UNIT_CACHE_TTL)
+        await self.cache.units.bump_list_version(unit.store_id)
@@ -28,6 +28,31 @@ celery_app = Celery(
     broker_connection_timeout=30,
 )
 
+"""
+Периодические задачи, запуск
+celery --app=src.tasks.celery_adapter:celery_app beat --loglevel INFO
+"""
+beat_schedule: dict[str, dict[str, Any]] = {
+    "create_actions_partitions": {
+        "task": "create_actions_partitions",
+        "schedule": settings.ACTIONS_PARTITIONS_INTERVAL,
+    },
+    "reconcile_actions_counters": {
+        "task": "reconcile_actions_counters",
+        "schedule": settings.ACTIONS_COUNTERS_RECONCILE_INTERVAL,
+    },
+}
+if settings.SALES_WRITE_BEHIND:
+    beat_schedule["flush_sales_queue"] = {
+        "task": "flush_sales_queue",
+        "schedule": settings.SALES_QUEUE_FLUSH_INTERVAL,
+    }
+    beat_schedule["reconcile_sales_queue_stock"] = {
+        "task": "reconcile_sales_queue_stock",
+        "schedule": settings.SALES_QUEUE_RECONCILE_INTERVAL,
+    }
+celery_app.conf.update(beat_schedule=beat_schedule)  # type: ignore
+
 
 def create_celery_task(task_name: str, *args: Any, **kwargs: Any) -> AsyncResult:
     return celery_app.send_task(name=task_name, args=args, kwargs=kwargs)  # type: ignore
@@ -38,6 +38,47 @@ class TaskManager:
     ):
         return create_celery_task("saving_resized_unit_images_in_s3", **locals())
 
+    @staticmethod
+    def flush_sales_queue(batch_size: int):
+        """
+        :param batch_size: сколько продаж записывается в одной транзакции
+        """
+        return create_celery_task("flush_sales_queue", **locals())
+
+    @staticmethod
+    def reconcile_sales_queue_stock():
+        return create_celery_task("reconcile_sales_queue_stock")
+
+    @staticmethod
+    def create_actions_partitions(months_ahead: int):
+        """
+        :param months_ahead: на сколько месяцев вперед создать партиции
+        """
+        return create_celery_task("create_actions_partitions", **locals())
+
+    @staticmethod
+    def reconcile_actions_counters():
+        return create_celery_task("reconcile_actions_counters")
+
+    @staticmethod
+    def backfill_unit_daily_stats(
+        chunk_days: int, day_from: str | None = None, day_to: str | None = None
+    ):
+        """
+        :param chunk_days: сколько дней пересобирает одна задача
+        :param day_from: первый день (YYYY-MM-DD)
+        :param day_to: последний день включительно (YYYY-MM-DD)
+        """
+        return create_celery_task("backfill_unit_daily_stats", **locals())
+
+    @staticmethod
+    def rebuild_unit_daily_stats(day_from: str, day_to: str):
+        """
+        :param day_from: первый день (YYYY-MM-DD)
+        :param day_to: день после последнего (YYYY-MM-DD)
+        """
+        return create_celery_task("rebuild_unit_daily_stats", **locals())
+
 
 task_manager = TaskManager
 # test = task_manager.celery_test(1, "we")
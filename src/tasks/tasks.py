@@ -1,4 +1,6 @@
 import asyncio
+from contextlib import asynccontextmanager
+from datetime import date
 from pathlib import Path
 from time import sleep
 
@@ -6,13 +8,16 @@ from jinja2 import UndefinedError
 from email.message import EmailMessage
 import smtplib
 
+from src.adapters.redis_adapter import RedisAdapter, create_redis_client
 from src.database import new_async_session_null_pool
+from src.services.actions import ActionsService
 from src.services.units import UnitsService
-from src.tasks.celery_adapter import celery_app
+from src.tasks.celery_adapter import celery_app, create_celery_task
 from src.config import settings
 from src.logging_config import logger
 
 from src.templates import template_factory
+from src.utils.cache.manager import CacheManager
 from src.utils.db_manager import DBAsyncManager
 from src.utils.files import remove_tree
 from src.utils.images import resized_images
@@ -72,9 +77,9 @@ def saving_resized_unit_images_in_s3(
         )
 
     async def main():
-        async with get_s3_manager_fabric() as s3:
+        async with get_s3_manager_fabric() as s3, get_cache_manager_for_task() as cache:
             async with DBAsyncManager(new_async_session_null_pool) as db:
-                await UnitsService(db=db, s3=s3).upload_unit_images_in_s3(
+                await UnitsService(db=db, s3=s3, cache=cache).upload_unit_images_in_s3(
                     unit_images_ids=unit_images_ids,
                     resized_files_path=resized_paths,
                     unit_id=unit_id,
@@ -149,6 +154,139 @@ def send_msg_to_email(
         smtp.send_message(msg=message)
 
 
+@asynccontextmanager
+async def get_cache_manager_for_task():
+    """
+    Отдельное соединение redis на каждый asyncio.run: общий клиент привязан к циклу событий приложения
+    """
+    adapter = RedisAdapter(create_redis_client(host=settings.REDIS_HOST, port=settings.REDIS_PORT))
+    try:
+        async with CacheManager(adapter) as cache:
+            yield cache
+    finally:
+        await adapter.close()
+
+
+@celery_app.task(name="flush_sales_queue")  # type: ignore
+def flush_sales_queue(batch_size: int = settings.SALES_QUEUE_BATCH_SIZE) -> int:
+    """
+    Записывает продажи из очереди redis в базу, по batch_size продаж в одной транзакции.
+    :return: количество разобранных продаж
+    """
+
+    async def main() -> int:
+        async with get_cache_manager_for_task() as cache:
+            async with DBAsyncManager(new_async_session_null_pool) as db:
+                return await ActionsService(db=db, cache=cache).flush_sales_queue(
+                    batch_size=batch_size
+                )
+
+    return asyncio.run(main())
+
+
+@celery_app.task(name="reconcile_sales_queue_stock")  # type: ignore
+def reconcile_sales_queue_stock() -> dict[int, float]:
+    """
+    Сверяет остатки очереди продаж в redis с units.quantity.
+    :return: {unit_id: расхождение} исправленных остатков
+    """
+
+    async def main() -> dict[int, float]:
+        async with get_cache_manager_for_task() as cache:
+            async with DBAsyncManager(new_async_session_null_pool) as db:
+                return await ActionsService(db=db, cache=cache).reconcile_sales_queue_stock()
+
+    return asyncio.run(main())
+
+
+@celery_app.task(name="create_actions_partitions")  # type: ignore
+def create_actions_partitions(
+    months_ahead: int = settings.ACTIONS_PARTITIONS_AHEAD_MONTHS,
+) -> list[str]:
+    """
+    Создает помесячные партиции actions и actions_transactions заранее.
+    :param months_ahead: на сколько месяцев вперед
+    :return: названия партиций
+    """
+
+    async def main() -> list[str]:
+        async with DBAsyncManager(new_async_session_null_pool) as db:
+            return await ActionsService(db=db).create_partitions(months_ahead=months_ahead)
+
+    return asyncio.run(main())
+
+
+@celery_app.task(name="reconcile_actions_counters")  # type: ignore
+def reconcile_actions_counters() -> dict[int, dict[str, int]]:
+    """
+    Сверяет счетчики действий (total пагинации GET /actions) с таблицей actions.
+    :return: {store_id: {тип действия: расхождение}} исправленных счетчиков
+    """
+
+    async def main() -> dict[int, dict[str, int]]:
+        async with DBAsyncManager(new_async_session_null_pool) as db:
+            drifts = await ActionsService(db=db).reconcile_actions_counters()
+        return {
+            store_id: {title.value: drift for title, drift in store_drifts.items()}
+            for store_id, store_drifts in drifts.items()
+        }
+
+    return asyncio.run(main())
+
+
+@celery_app.task(name="backfill_unit_daily_stats")  # type: ignore
+def backfill_unit_daily_stats(
+    chunk_days: int = settings.UNIT_DAILY_STATS_BACKFILL_CHUNK_DAYS,
+    day_from: str | None = None,
+    day_to: str | None = None,
+) -> int:
+    """
+    Пересобирает unit_daily_stats из истории транзакций: делит период на части по chunk_days
+    дней и ставит каждую часть отдельной задачей rebuild_unit_daily_stats, воркеры выполняют
+    их параллельно.
+    Запуск:
+    celery --app=src.tasks.celery_adapter:celery_app call backfill_unit_daily_stats
+    :param day_from: первый день (YYYY-MM-DD), по умолчанию первый день транзакций
+    :param day_to: последний день включительно (YYYY-MM-DD), по умолчанию последний день транзакций
+    :return: количество поставленных частей
+    """
+
+    async def main() -> list[tuple[date, date]]:
+        async with DBAsyncManager(new_async_session_null_pool) as db:
+            return await ActionsService(db=db).get_daily_stats_chunks(
+                chunk_days=chunk_days,
+                day_from=date.fromisoformat(day_from) if day_from else None,
+                day_to=date.fromisoformat(day_to) if day_to else None,
+            )
+
+    chunks = asyncio.run(main())
+    for chunk_from, chunk_to in chunks:
+        create_celery_task(
+            "rebuild_unit_daily_stats",
+            day_from=chunk_from.isoformat(),
+            day_to=chunk_to.isoformat(),
+        )
+    logger.info(f"Пересборка unit_daily_stats: поставлено {len(chunks)} частей")
+    return len(chunks)
+
+
+@celery_app.task(name="rebuild_unit_daily_stats")  # type: ignore
+def rebuild_unit_daily_stats(day_from: str, day_to: str) -> int:
+    """
+    Пересобирает unit_daily_stats за дни [day_from, day_to).
+    :return: количество строк итогов
+    """
+
+    async def main() -> int:
+        async with get_cache_manager_for_task() as cache:
+            async with DBAsyncManager(new_async_session_null_pool) as db:
+                return await ActionsService(db=db, cache=cache).rebuild_daily_stats(
+                    day_from=date.fromisoformat(day_from), day_to=date.fromisoformat(day_to)
+                )
+
+    return asyncio.run(main())
+
+
 @celery_app.task(name="celery_test")  # type: ignore
 def celery_test(arg1: int, arg2: str) -> None:
     sleep(1)
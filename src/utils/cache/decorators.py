@@ -1,17 +1,33 @@
-import asyncio
+import inspect
 from functools import wraps
 from typing import Any, Callable, TypeVar
 
 from src.logging_config import logger
+from src.repositories.cache.space_name import (
+    space_name_cached_method,
+    space_name_cached_method_version,
+)
 from src.schemas.base import BaseSchema
 from src.services.base import BaseService
 
 DTOType = TypeVar("DTOType", bound=BaseSchema)
 
+# Записывает значение, только если версия не изменилась с момента чтения из базы данных:
+# инвалидация между чтением и записью увеличивает версию, устаревшее значение не попадет в кэш.
+# KEYS: value, version ; ARGV: value, ttl, версия до чтения из базы ('' - ключа версии не было)
+SET_IF_VERSION_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '') ~= ARGV[3] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return 1
+"""
+
 
 def cache_service_method_by_id(
     return_type: type[DTOType],
     ttl: int = 60,
+    name: str | None = None,
 ) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
     """Decorator for caching service methods that return DTOs by ID.
 
@@ -19,28 +35,38 @@ def cache_service_method_by_id(
     based on an ID parameter. It stores the serialized DTO in a cache using a key pattern:
     'cached_method:{service_class}:{method_name}:{id}'
 
+    The value is written only if the version key 'cached_method_version:{name}:{id}' did not
+    change while the method was reading the database, so an invalidation that happens in between
+    (see UnitsRepository.delete_cached_units) is never overwritten with a stale DTO.
+
     :param return_type: The DTO class type that will be returned by the decorated method
     :param ttl: Time to live in seconds for the cached value (default: 60 seconds)
+    :param name: Name used in the cache key instead of '{service_class}.{method_name}'
     :return: Decorated function that will check cache before executing the original method
     """
 
     def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
-        if not asyncio.iscoroutinefunction(func):
+        if not inspect.iscoroutinefunction(func):
             raise TypeError("cached supports async functions only")
 
         @wraps(func)
         async def wrapper(self: BaseService, *args: int, **kwargs: int) -> DTOType:
             id_ = args[0] if args else next(iter(kwargs.values()))
-            key = f"cached_method:{func.__qualname__}:{id_}"
+            key = space_name_cached_method(name or func.__qualname__, id_)
             result = await self.cache.adapter.get_one_or_none(key=key)
             if result:
                 dto = return_type.model_validate_json(result)
                 logger.debug(f"dto из кеша: {return_type.__name__}")
                 return dto
             else:
+                version_key = space_name_cached_method_version(name or func.__qualname__, id_)
+                version = await self.cache.adapter.get_one_or_none(key=version_key)
                 dto: DTOType = await func(self, id_)
-                await self.cache.adapter.set(key=key, value=dto.model_dump_json(), ttl=ttl)
-                await self.cache.adapter.commit()
+                await self.cache.adapter.run_script(
+                    SET_IF_VERSION_SCRIPT,
+                    keys=[key, version_key],
+                    args=[dto.model_dump_json(), ttl, version or ""],
+                )
                 logger.debug(f"dto из базы данных: {return_type.__name__}")
                 return dto
 
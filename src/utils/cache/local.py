@@ -0,0 +1,37 @@
+import time
+from collections import OrderedDict
+from typing import Generic, Hashable, TypeVar
+
+ValueType = TypeVar("ValueType")
+
+
+class LocalTTLCache(Generic[ValueType]):
+    """
+    Кэш в памяти процесса: значения живут ttl секунд, при переполнении вытесняются самые старые.
+    Не разделяется между процессами, поэтому значения из него нужно проверять или держать короткий ttl.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, ValueType]] = OrderedDict()
+
+    def get(self, key: Hashable) -> ValueType | None:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            self._data.pop(key, None)
+            return None
+        return value
+
+    def set(self, key: Hashable, value: ValueType) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, *keys: Hashable) -> None:
+        for key in keys:
+            self._data.pop(key, None)
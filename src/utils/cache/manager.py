@@ -1,5 +1,10 @@
 from src.adapters.redis_adapter import RedisAdapter
+from src.repositories.cache.action_details import ActionDetailsRepository
+from src.repositories.cache.actions import ActionsRepository
+from src.repositories.cache.analytics import AnalyticsRepository
 from src.repositories.cache.auths import AuthsRepository
+from src.repositories.cache.sales_queue import SalesQueueRepository
+from src.repositories.cache.units import UnitsRepository
 from src.repositories.cache.users import UsersRepository
 from types import TracebackType
 
@@ -11,6 +16,11 @@ class CacheManager:
     async def __aenter__(self):
         self.auths = AuthsRepository(self.adapter)
         self.users = UsersRepository(self.adapter)
+        self.actions = ActionsRepository(self.adapter)
+        self.action_details = ActionDetailsRepository(self.adapter)
+        self.sales_queue = SalesQueueRepository(self.adapter)
+        self.analytics = AnalyticsRepository(self.adapter)
+        self.units = UnitsRepository(self.adapter)
 
         return self
 
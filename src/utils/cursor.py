@@ -0,0 +1,31 @@
+import base64
+import binascii
+from typing import TypeVar
+
+from pydantic import ValidationError
+
+from src.exceptions.base import InvalidCursorException
+from src.schemas.base import BaseSchema
+
+CursorType = TypeVar("CursorType", bound=BaseSchema)
+
+
+def encode_cursor(cursor: BaseSchema) -> str:
+    """
+    :param cursor: значения последней записи страницы
+    :return: непрозрачный курсор для query параметра cursor
+    """
+    return base64.urlsafe_b64encode(cursor.model_dump_json().encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, schema: type[CursorType]) -> CursorType:
+    """
+    :param cursor: курсор, полученный из encode_cursor
+    :param schema: схема значений курсора
+    :raise InvalidCursorException: Если курсор поврежден или от другого списка.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        return schema.model_validate_json(raw)
+    except (binascii.Error, ValueError, ValidationError):
+        raise InvalidCursorException
@@ -1,6 +1,11 @@
-from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
-
-from src.repositories.db.actions import ActionsTransactionsRepository, ActionsRepository
+from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession, AsyncSessionTransaction
+
+from src.repositories.db.actions import (
+    ActionsTransactionsRepository,
+    ActionsRepository,
+    UnitDailyStatsRepository,
+    ActionsCountersRepository,
+)
 from src.repositories.db.notifications import NotificationsRepository
 from src.repositories.db.stores import StoresRepository, RoleUserInStoreRepository
 from src.repositories.db.units import UnitsRepository
@@ -24,6 +29,8 @@ class DBAsyncManager:
         self.units = UnitsRepository(self.session)
         self.actions = ActionsRepository(self.session)
         self.actions_transactions = ActionsTransactionsRepository(self.session)
+        self.unit_daily_stats = UnitDailyStatsRepository(self.session)
+        self.actions_counters = ActionsCountersRepository(self.session)
         self.unit_images = UnitImagesRepository(self.session)
         self.notifications = NotificationsRepository(self.session)
 
@@ -43,3 +50,10 @@ class DBAsyncManager:
 
     async def rollback(self):
         await self.session.rollback()
+
+    def savepoint(self) -> AsyncSessionTransaction:
+        """
+        SAVEPOINT внутри текущей транзакции: `async with db.savepoint(): ...`
+        При исключении внутри блока откатывается только savepoint.
+        """
+        return self.session.begin_nested()
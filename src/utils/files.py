@@ -1,8 +1,36 @@
 from pathlib import Path
+from typing import BinaryIO, Protocol
 
 from jinja2 import Template
 
 
+class BytesReader(Protocol):
+    """Файл для чтения байтов, например BinaryIO"""
+
+    def read(self, size: int = -1, /) -> bytes: ...
+
+
+class LinesLimitReader:
+    """
+    Читает source и считает строки по переводам строк: как только их больше max_lines,
+    read бросает exception, файл не дочитывается.
+    Строка CSV с переводами строк внутри кавычек считается за несколько.
+    """
+
+    def __init__(self, source: BinaryIO, max_lines: int, exception: type[Exception]):
+        self.source = source
+        self.max_lines = max_lines
+        self.exception = exception
+        self.lines = 0
+
+    def read(self, size: int = -1, /) -> bytes:
+        data = self.source.read(size)
+        self.lines += data.count(b"\n")
+        if self.lines > self.max_lines:
+            raise self.exception
+        return data
+
+
 def remove_tree(path: Path):
     """
     Удаляет рекурсивно папку
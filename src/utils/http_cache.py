@@ -0,0 +1,21 @@
+import hashlib
+
+
+def make_etag(body: str) -> str:
+    """
+    :param body: сериализованный ответ
+    :return: сильный ETag содержимого в кавычках
+    """
+    return f'"{hashlib.sha256(body.encode()).hexdigest()[:32]}"'
+
+
+def is_etag_match(if_none_match: str | None, etag: str) -> bool:
+    """
+    Сравнение If-None-Match для GET: слабое, W/ префикс не учитывается.
+    :param if_none_match: значение заголовка, может быть списком через запятую или *
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
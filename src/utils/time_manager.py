@@ -1,4 +1,4 @@
-from datetime import datetime, timezone, timedelta
+from datetime import date, datetime, timezone, timedelta
 
 from src.config import settings
 
@@ -8,6 +8,30 @@ def get_utc_now() -> datetime:
     return datetime.now(timezone.utc)
 
 
+def add_months(month_start: date, months: int) -> date:
+    """
+    :param month_start: первое число месяца
+    :param months: сколько месяцев прибавить
+    :return: первое число месяца через months месяцев
+    """
+    month_index = month_start.year * 12 + month_start.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def get_bucket_bounds(day: date, bucket: str) -> tuple[date, date]:
+    """
+    :param bucket: day, week или month - как в date_trunc
+    :return: первый и последний день периода, в который входит day. Неделя начинается с понедельника.
+    """
+    if bucket == "week":
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+    if bucket == "month":
+        start = day.replace(day=1)
+        return start, add_months(start, 1) - timedelta(days=1)
+    return day, day
+
+
 def get_expiration_refresh_token() -> datetime:
     """
     Возвращает дату и время истечения срока действия refresh токена.
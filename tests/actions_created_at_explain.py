@@ -0,0 +1,137 @@
+"""
+Проверка планов выборок действий и транзакций за период по created_at.
+Нужна настоящая база данных из настроек приложения с примененными миграциями:
+
+    python -m tests.actions_created_at_explain
+
+Запросы берутся у самих репозиториев: get_actions_total и stream_transactions_for_export
+выполняются за первые два дня текущего месяца, их sql перехватывается и выполняется с EXPLAIN.
+Проверяется, что:
+- читается только партиция текущего месяца (партиции отсекаются по диапазону);
+- партиция читается через свою часть brin индекса ix_actions_created_at
+  или ix_actions_transactions_created_at.
+Последовательное чтение для EXPLAIN выключено: на маленькой тестовой базе планировщик
+выбирает его вместо любого индекса, проверяется, что brin индекс подходит для фильтра.
+"""
+
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection
+
+from src.database import new_async_session_null_pool
+from src.models.actions import ActionOrm, ActionTransactionOrm
+from src.utils.db_manager import DBAsyncManager
+
+
+async def capture_query(call: Callable[[DBAsyncManager], Awaitable[object]]) -> tuple[str, Any]:
+    """Выполняет call и возвращает sql и параметры первого запроса к базе данных"""
+    queries: list[tuple[str, Any]] = []
+
+    def before_cursor_execute(
+        conn: Connection,
+        cursor: Any,
+        statement: str,
+        parameters: Any,
+        context: Any,
+        executemany: bool,
+    ) -> None:
+        queries.append((statement, parameters))
+
+    async with DBAsyncManager(new_async_session_null_pool) as db:
+        connection = await db.session.connection()
+        event.listen(connection.sync_connection, "before_cursor_execute", before_cursor_execute)
+        await call(db)
+    return queries[0]
+
+
+async def explain(statement: str, parameters: Any) -> dict[str, Any]:
+    async with DBAsyncManager(new_async_session_null_pool) as db:
+        await db.session.execute(text("SET LOCAL enable_seqscan = off"))
+        connection = await db.session.connection()
+        result = await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+        plan = result.scalar_one()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]["Plan"]
+
+
+async def get_partition_indexes(index: str) -> set[str]:
+    """Индексы партиций, созданные по индексу партиционированной таблицы"""
+    async with DBAsyncManager(new_async_session_null_pool) as db:
+        result = await db.session.execute(
+            text(
+                "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = CAST(:index AS regclass)"
+            ),
+            {"index": index},
+        )
+        return set(result.scalars().all())
+
+
+def walk_plan(plan: dict[str, Any]) -> list[dict[str, Any]]:
+    nodes = [plan]
+    for child in plan.get("Plans", []):
+        nodes.extend(walk_plan(child))
+    return nodes
+
+
+async def check_plan(name: str, table: str, index: str, statement: str, parameters: Any) -> None:
+    month_start = datetime.now(timezone.utc).replace(day=1)
+    partition = f"{table}_y{month_start.year}m{month_start.month:02d}"
+    partition_indexes = await get_partition_indexes(index)
+    nodes = walk_plan(await explain(statement, parameters))
+
+    relations = {
+        node["Relation Name"]
+        for node in nodes
+        if node.get("Relation Name", "").startswith(f"{table}_")
+    }
+    assert relations == {partition}, f"{name}: читаются партиции {relations}, ожидалась {partition}"
+    used_indexes = {
+        node["Index Name"] for node in nodes if node.get("Index Name") in partition_indexes
+    }
+    assert used_indexes, f"{name}: {index} не используется, план: {nodes}"
+    print(f"{name}: партиция {partition}, индекс {', '.join(used_indexes)}")
+
+
+async def main() -> None:
+    created_from = datetime.now(timezone.utc).replace(
+        day=1, hour=0, minute=0, second=0, microsecond=0
+    )
+    created_to = created_from + timedelta(days=2)
+
+    async def get_actions_total(db: DBAsyncManager) -> int:
+        return await db.actions.get_actions_total(
+            store_id=None, title=None, created_from=created_from, created_to=created_to
+        )
+
+    async def stream_transactions(db: DBAsyncManager) -> None:
+        async for _ in db.actions_transactions.stream_transactions_for_export(
+            store_id=None, created_from=created_from, created_to=created_to, batch_size=100
+        ):
+            pass
+
+    statement, parameters = await capture_query(get_actions_total)
+    await check_plan(
+        "get_actions_total",
+        ActionOrm.__tablename__,
+        "ix_actions_created_at",
+        statement,
+        parameters,
+    )
+    statement, parameters = await capture_query(stream_transactions)
+    await check_plan(
+        "stream_transactions_for_export",
+        ActionTransactionOrm.__tablename__,
+        "ix_actions_transactions_created_at",
+        statement,
+        parameters,
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
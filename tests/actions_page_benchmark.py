@@ -0,0 +1,156 @@
+"""
+Сравнение страницы GET /actions: одним json запросом (ActionsRepository.get_actions_with_units)
+и прежней реализацией двумя запросами с группировкой транзакций по действиям в python.
+Нужна настоящая база данных из настроек приложения с действиями магазина,
+например страницы по 50 действий с 1-100 транзакциями в каждом:
+
+    python -m tests.actions_page_benchmark <store_id> [--limit 50] [--repeat 200]
+
+Перед замерами проверяется, что обе реализации возвращают одни и те же действия и товары.
+Реализации вызываются по очереди в одной сессии, печатаются медиана и p95 времени страницы.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy import join, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database import new_async_session_null_pool
+from src.models.actions import ActionOrm, ActionTransactionOrm
+from src.models.units import StoreORM, UnitORM
+from src.repositories.db.mappers.mappers import ActionWithUnitsTransactionsDataMapper
+from src.schemas.actions import ActionWithUnitsTransactionsDTO
+from src.utils.db_manager import DBAsyncManager
+
+
+async def get_actions_with_units_two_queries(
+    session: AsyncSession, store_id: int, limit: int
+) -> list[ActionWithUnitsTransactionsDTO]:
+    """Реализация get_actions_with_units до сборки страницы в json, первая страница без фильтров"""
+    actions_query = (
+        select(
+            ActionOrm.id,
+            ActionOrm.title,
+            ActionOrm.created_at,
+            ActionOrm.store_id,
+            StoreORM.title.label("store_title"),
+        )
+        .select_from(
+            join(left=ActionOrm, right=StoreORM, onclause=ActionOrm.store_id == StoreORM.id)
+        )
+        .filter(ActionOrm.store_id == store_id)
+        .order_by(ActionOrm.created_at.desc(), ActionOrm.id.desc())
+        .limit(limit)
+    )
+    actions_result = await session.execute(actions_query)
+    actions_map: defaultdict[int, Any] = defaultdict(dict)
+    actions_ids: list[int] = list()
+    actions_created_at: list[datetime] = list()
+    for row in actions_result.mappings().all():
+        action_dict = dict(row)
+        action_dict["transactions"] = []
+        actions_map[action_dict["id"]] = action_dict
+        actions_ids.append(action_dict["id"])
+        actions_created_at.append(action_dict["created_at"])
+    if not actions_ids:
+        return []
+
+    transactions_query = (
+        select(
+            ActionTransactionOrm.id.label("transaction_id"),
+            ActionTransactionOrm.action_id,
+            UnitORM.id.label("unit_id"),
+            UnitORM.title,
+        )
+        .select_from(
+            join(
+                left=ActionTransactionOrm,
+                right=UnitORM,
+                onclause=ActionTransactionOrm.unit_id == UnitORM.id,
+            )
+        )
+        .filter(
+            ActionTransactionOrm.action_id.in_(actions_ids),
+            ActionTransactionOrm.created_at.between(
+                min(actions_created_at), max(actions_created_at)
+            ),
+        )
+    )
+    transactions_result = await session.execute(transactions_query)
+    for row in transactions_result.mappings().all():
+        transaction_dict = dict(row)
+        actions_map[transaction_dict["action_id"]]["transactions"].append(transaction_dict)
+
+    return [
+        ActionWithUnitsTransactionsDataMapper.to_domain(action) for action in actions_map.values()
+    ]
+
+
+def normalize(actions: list[ActionWithUnitsTransactionsDTO]) -> list[tuple[Any, ...]]:
+    """Прежняя реализация не сортировала транзакции действия, сравниваются отсортированные"""
+    return [
+        (
+            action.id,
+            action.title,
+            action.created_at,
+            action.store_title,
+            sorted((unit.unit_id, unit.title) for unit in action.transactions),
+        )
+        for action in actions
+    ]
+
+
+async def measure(call: Callable[[], Awaitable[object]]) -> float:
+    started = time.perf_counter()
+    await call()
+    return time.perf_counter() - started
+
+
+def report(name: str, timings: list[float]) -> None:
+    median = statistics.median(timings) * 1000
+    p95 = statistics.quantiles(timings, n=20)[-1] * 1000
+    print(f"{name}: медиана {median:.2f} мс, p95 {p95:.2f} мс")
+
+
+async def main(store_id: int, limit: int, repeat: int) -> None:
+    async with DBAsyncManager(new_async_session_null_pool) as db:
+
+        async def json_query() -> list[ActionWithUnitsTransactionsDTO]:
+            return await db.actions.get_actions_with_units(
+                store_id=store_id, offset=0, limit=limit, search_term=None
+            )
+
+        async def two_queries() -> list[ActionWithUnitsTransactionsDTO]:
+            return await get_actions_with_units_two_queries(db.session, store_id, limit)
+
+        page = await json_query()
+        assert page, f"у магазина {store_id} нет действий"
+        assert normalize(page) == normalize(await two_queries()), "страницы не совпадают"
+        transactions = [len(action.transactions) for action in page]
+        print(
+            f"действий на странице {len(page)}, "
+            f"транзакций в действии {min(transactions)}-{max(transactions)}"
+        )
+
+        json_timings: list[float] = []
+        two_queries_timings: list[float] = []
+        for _ in range(repeat):
+            two_queries_timings.append(await measure(two_queries))
+            json_timings.append(await measure(json_query))
+        report("два запроса", two_queries_timings)
+        report("один json запрос", json_timings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("store_id", type=int)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=200)
+    arguments = parser.parse_args()
+    asyncio.run(main(arguments.store_id, arguments.limit, arguments.repeat))
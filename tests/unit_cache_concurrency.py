@@ -0,0 +1,202 @@
+"""
+Проверка кэша check_get_unit_by_id при одновременных изменениях товара.
+Нужны настоящие postgres и redis из настроек приложения, существующий товар и пользователь,
+от которого совершаются действия:
+
+    python -m tests.unit_cache_concurrency <unit_id> <user_id> [--rounds 20] [--readers 8]
+
+Пока идет изменение, readers читателей в цикле вызывают check_get_unit_by_id.
+У каждой задачи свои сессия базы данных и соединение redis, как у разных запросов.
+Раунды изменений:
+- edit_unit с новым title;
+- одновременные add_action addStock и newPrice, которые меняют quantity и retail_price CTE действий.
+После изменения каждое чтение, начатое после его завершения, и товар из кэша в конце раунда
+должны совпадать с товаром из базы данных: если читатель записал в кэш версию до изменения,
+проверка падает.
+В конце возвращаются исходные title, retail_price и quantity товара (writeOff),
+average_cost_price остается измененным поступлениями.
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from src.database import new_async_session_null_pool
+from src.models.actions import ActionEnum
+from src.models.users import RoleUserInCompanyEnum
+from src.schemas.actions import (
+    AddActionRequestDTO,
+    AddStockTransaction,
+    NewPriceTransaction,
+    TransactionUnion,
+    WriteOffTransaction,
+)
+from src.schemas.units import EditUnitDTO, UnitDTO
+from src.services.actions import ActionsService
+from src.services.units import UnitsService
+from src.tasks.tasks import get_cache_manager_for_task
+from src.utils.db_manager import DBAsyncManager
+
+# сколько читатели продолжают читать после изменения, чтобы проверить чтения после него
+READ_AFTER_CHANGE_SECONDS = 0.2
+
+
+async def get_unit_from_db(unit_id: int) -> UnitDTO:
+    async with DBAsyncManager(new_async_session_null_pool) as db:
+        return await db.units.get_one(id=unit_id)
+
+
+async def get_unit_from_service(unit_id: int) -> UnitDTO:
+    async with get_cache_manager_for_task() as cache:
+        async with DBAsyncManager(new_async_session_null_pool) as db:
+            return await UnitsService(db=db, cache=cache).check_get_unit_by_id(unit_id)
+
+
+async def edit_title(unit_id: int, title: str) -> None:
+    async with get_cache_manager_for_task() as cache:
+        async with DBAsyncManager(new_async_session_null_pool) as db:
+            await UnitsService(db=db, cache=cache).edit_unit(
+                dto=EditUnitDTO(title=title),
+                unit_id=unit_id,
+                user_roles_in_stores={},
+                user_role_in_company=RoleUserInCompanyEnum.admin,
+            )
+
+
+async def add_action(
+    user_id: int, store_id: int, action: ActionEnum, transaction: TransactionUnion
+) -> None:
+    async with get_cache_manager_for_task() as cache:
+        async with DBAsyncManager(new_async_session_null_pool) as db:
+            await ActionsService(db=db, cache=cache).add_action(
+                user_id=user_id,
+                dto=AddActionRequestDTO(
+                    transactions=[transaction], store_id=store_id, action=action
+                ),
+                user_roles_in_stores={},
+                user_role_in_company=RoleUserInCompanyEnum.admin,
+            )
+
+
+async def read_until(unit_id: int, done: asyncio.Event) -> list[tuple[float, UnitDTO]]:
+    """:return: [(время начала чтения, товар)]"""
+    reads: list[tuple[float, UnitDTO]] = []
+    while not done.is_set():
+        started_at = time.monotonic()
+        reads.append((started_at, await get_unit_from_service(unit_id)))
+    return reads
+
+
+async def run_round(unit_id: int, change: Callable[[], Awaitable[object]], readers: int) -> UnitDTO:
+    """
+    Выполняет change, пока читатели читают товар, и проверяет, что после изменения
+    ни одно чтение не вернуло устаревший товар.
+    :return: товар из базы данных после изменения
+    """
+    done = asyncio.Event()
+    reading = [asyncio.create_task(read_until(unit_id, done)) for _ in range(readers)]
+    try:
+        await change()
+        changed_at = time.monotonic()
+        await asyncio.sleep(READ_AFTER_CHANGE_SECONDS)
+    finally:
+        done.set()
+    reads = [read for reader in await asyncio.gather(*reading) for read in reader]
+
+    from_db = await get_unit_from_db(unit_id)
+    stale = [unit for started_at, unit in reads if started_at > changed_at and unit != from_db]
+    assert not stale, f"после изменения прочитан устаревший товар: {stale[0]!r} != {from_db!r}"
+    from_cache = await get_unit_from_service(unit_id)
+    assert from_cache == from_db, f"в кэше устаревший товар: {from_cache!r} != {from_db!r}"
+    after_change = sum(started_at > changed_at for started_at, _ in reads)
+    print(f"чтений {len(reads)}, после изменения {after_change}, кэш совпадает с базой данных")
+    return from_db
+
+
+async def main(unit_id: int, user_id: int, rounds: int, readers: int) -> None:
+    original = await get_unit_from_db(unit_id)
+    store_id = original.store_id
+    try:
+        for round_number in range(rounds):
+            title = f"{original.title[:80]} #{round_number}"
+            print(f"раунд {round_number}, edit_unit: ", end="")
+            unit = await run_round(unit_id, lambda: edit_title(unit_id, title), readers)
+            assert unit.title == title, f"в базе данных {unit.title!r}, ожидался {title!r}"
+
+        for round_number in range(rounds):
+            before = await get_unit_from_db(unit_id)
+            prices = [original.retail_price + round_number + step for step in (1, 2, 3, 4)]
+            actions = [
+                add_action(
+                    user_id,
+                    store_id,
+                    ActionEnum.addStock,
+                    AddStockTransaction(
+                        unit_id=unit_id,
+                        quantity_delta=1,
+                        cost_price=original.average_cost_price or 1,
+                        retail_price=prices[0],
+                    ),
+                ),
+                add_action(
+                    user_id,
+                    store_id,
+                    ActionEnum.newPrice,
+                    NewPriceTransaction(unit_id=unit_id, retail_price=prices[1]),
+                ),
+                add_action(
+                    user_id,
+                    store_id,
+                    ActionEnum.addStock,
+                    AddStockTransaction(
+                        unit_id=unit_id,
+                        quantity_delta=2,
+                        cost_price=original.average_cost_price or 1,
+                        retail_price=prices[2],
+                    ),
+                ),
+                add_action(
+                    user_id,
+                    store_id,
+                    ActionEnum.newPrice,
+                    NewPriceTransaction(unit_id=unit_id, retail_price=prices[3]),
+                ),
+            ]
+            print(f"раунд {round_number}, addStock и newPrice: ", end="")
+            unit = await run_round(unit_id, lambda: asyncio.gather(*actions), readers)
+            assert unit.quantity == before.quantity + 3, f"quantity в базе данных {unit.quantity}"
+            assert unit.retail_price in prices, f"retail_price в базе данных {unit.retail_price}"
+            cached = await get_unit_from_service(unit_id)
+            assert (cached.quantity, cached.retail_price) == (unit.quantity, unit.retail_price), (
+                f"в кэше quantity {cached.quantity}, retail_price {cached.retail_price}"
+            )
+    finally:
+        await edit_title(unit_id, original.title)
+        current = await get_unit_from_db(unit_id)
+        if current.retail_price != original.retail_price:
+            await add_action(
+                user_id,
+                store_id,
+                ActionEnum.newPrice,
+                NewPriceTransaction(unit_id=unit_id, retail_price=original.retail_price),
+            )
+        if current.quantity > original.quantity:
+            await add_action(
+                user_id,
+                store_id,
+                ActionEnum.writeOff,
+                WriteOffTransaction(
+                    unit_id=unit_id, quantity_delta=current.quantity - original.quantity
+                ),
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("unit_id", type=int)
+    parser.add_argument("user_id", type=int)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--readers", type=int, default=8)
+    arguments = parser.parse_args()
+    asyncio.run(main(arguments.unit_id, arguments.user_id, arguments.rounds, arguments.readers))
@@ -0,0 +1,109 @@
+"""
+Сравнение виртуальной таблицы unit_ops действий: unnest типизированных массивов
+(ActionsTransactionsRepository._unit_ops_cte) и прежний union_all из select литералов
+на каждую транзакцию. Нужна настоящая база данных из настроек приложения, товары не нужны:
+
+    python -m tests.unit_ops_cte_benchmark [--sizes 1 10 100 1000] [--repeat 100]
+
+Для каждого размера корзины (транзакций addStock) обе реализации выполняют
+select из unit_ops. Перед замерами проверяется, что строки совпадают.
+Печатаются медиана и p95 времени построения запроса, compile и execute:
+- с кэшем компиляции SQLAlchemy, как в приложении;
+- без него (compiled_cache=None), каждый запрос компилируется заново.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Any, Sequence
+
+from sqlalchemy import CTE, Select, literal, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database import new_async_session_null_pool
+from src.repositories.db.actions import ActionsTransactionsRepository
+from src.schemas.actions import AddStockTransaction, TransactionUnion
+from src.utils.db_manager import DBAsyncManager
+
+COLUMNS = ("unit_id", "quantity_delta", "cost_price", "retail_price")
+
+
+def union_all_unit_ops_cte(transactions: Sequence[TransactionUnion], *columns: str) -> CTE:
+    """Реализация unit_ops до массивов: select литералов на каждую транзакцию"""
+    ops_values: list[Select[Any]] = [
+        select(
+            *(literal(getattr(transaction, column, None)).label(column) for column in columns),
+            literal(i).label("row_num"),
+        )
+        for i, transaction in enumerate(transactions)
+    ]
+    return union_all(*ops_values).cte("unit_ops")
+
+
+def unnest_unit_ops_cte(
+    repository: ActionsTransactionsRepository, transactions: Sequence[TransactionUnion]
+) -> CTE:
+    return repository._unit_ops_cte(transactions, *COLUMNS)  # type: ignore reportPrivateUsage
+
+
+async def select_unit_ops(
+    session: AsyncSession, unit_ops_cte: CTE, compiled_cache: bool
+) -> list[tuple[Any, ...]]:
+    query = select(*(unit_ops_cte.c[column] for column in COLUMNS)).order_by(unit_ops_cte.c.row_num)
+    execution_options: dict[str, Any] = {} if compiled_cache else {"compiled_cache": None}
+    result = await session.execute(query, execution_options=execution_options)
+    return [tuple(row) for row in result.all()]
+
+
+def report(name: str, timings: list[float]) -> str:
+    median = statistics.median(timings) * 1000
+    p95 = statistics.quantiles(timings, n=20)[-1] * 1000
+    return f"{name} медиана {median:.2f} мс, p95 {p95:.2f} мс"
+
+
+async def main(sizes: list[int], repeat: int) -> None:
+    async with DBAsyncManager(new_async_session_null_pool) as db:
+        repository = ActionsTransactionsRepository(db.session)
+        for size in sizes:
+            transactions = [
+                AddStockTransaction(
+                    unit_id=i + 1,
+                    quantity_delta=i + 1.5,
+                    cost_price=i + 10.25,
+                    retail_price=i + 20.5,
+                )
+                for i in range(size)
+            ]
+            builders = {
+                "union_all": lambda: union_all_unit_ops_cte(transactions, *COLUMNS),
+                "unnest": lambda: unnest_unit_ops_cte(repository, transactions),
+            }
+
+            rows = {
+                name: await select_unit_ops(db.session, build(), compiled_cache=True)
+                for name, build in builders.items()
+            }
+            assert rows["union_all"] == rows["unnest"], f"{size} строк: unit_ops не совпадают"
+            assert len(rows["unnest"]) == size
+
+            for compiled_cache in (True, False):
+                timings: dict[str, list[float]] = {name: [] for name in builders}
+                for _ in range(repeat):
+                    for name, build in builders.items():
+                        started = time.perf_counter()
+                        await select_unit_ops(db.session, build(), compiled_cache)
+                        timings[name].append(time.perf_counter() - started)
+                mode = "с кэшем компиляции" if compiled_cache else "без кэша компиляции"
+                print(
+                    f"{size} строк, {mode}: "
+                    + "; ".join(report(name, timings[name]) for name in builders)
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=100)
+    arguments = parser.parse_args()
+    asyncio.run(main(arguments.sizes, arguments.repeat))